@@ -7,25 +7,58 @@ Reads from shared SQLite database (wa.db) synced from Wild Apricot.
 Separate from chatbot - just shares the database.
 
 Run with: uvicorn calendar_api:app --host 0.0.0.0 --port 8001
+
+Multi-process mode (one warm cache + DB executor per worker):
+    CLUBCAL_WORKERS=4 python calendar_api.py
+Send SIGHUP to the supervisor process to restart workers gracefully.
 """
 
 import sqlite3
+import asyncio
+import base64
+import contextvars
+import gzip
+import hashlib
+import json
 import logging
-from datetime import datetime, timezone
+import os
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, AsyncIterator, Callable, List, Optional, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 
-from fastapi import FastAPI, HTTPException, Query
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
 
+# Optional - fast JSON encoding; falls back to the stdlib encoder
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Optional - brotli listing snapshots; gzip and identity are always written
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
 # ============================================================================
 # CONFIGURATION
 # ============================================================================
 
 # Database path - shared with chatbot sync
-import os
 DB_PATH = Path(os.environ.get("CLUBCAL_DB_PATH", "./wa.db"))
 
 # CORS - allow WA pages to call this API
@@ -35,255 +68,2610 @@ ALLOWED_ORIGINS = [
     "http://localhost:*",  # For local testing
 ]
 
+# Multi-club serving - each org has ORGS_DIR/<org>/config.json (its widget
+# config plus an optional "api" block) and is served under /orgs/<org>/.
+# At most ORG_MAX_OPEN orgs keep caches and DB handles; idle ones are closed.
+ORGS_DIR = Path(os.environ.get("CLUBCAL_ORGS_DIR", "./orgs"))
+ORG_MAX_OPEN = int(os.environ.get("CLUBCAL_MAX_ORGS", "32"))
+ORG_IDLE_SECONDS = float(os.environ.get("CLUBCAL_ORG_IDLE_SECONDS", "900"))
+ORG_CONFIG_CHECK_SECONDS = 2.0
+DEFAULT_ORG = "default"
+
+# Listing page sizes - defaults match the original fixed windows
+PUBLIC_PAGE_LIMIT = 200
+MEMBER_PAGE_LIMIT = 500
+MAX_PAGE_LIMIT = 1000
+
+# Concurrency - DB work runs on a dedicated bounded executor, not the
+# shared threadpool. Requests beyond DB_MAX_PENDING get a fast 503.
+DB_WORKERS = int(os.environ.get("CLUBCAL_DB_WORKERS", "4"))
+DB_MAX_PENDING = int(os.environ.get("CLUBCAL_DB_MAX_PENDING", "64"))
+
+# Per-worker result cache (entries), invalidated when wa.db changes
+QUERY_CACHE_SIZE = int(os.environ.get("CLUBCAL_CACHE_SIZE", "256"))
+
+# Serving - number of uvicorn worker processes when run as a script
+SERVER_HOST = os.environ.get("CLUBCAL_HOST", "0.0.0.0")
+SERVER_PORT = int(os.environ.get("CLUBCAL_PORT", "8001"))
+SERVER_WORKERS = int(os.environ.get("CLUBCAL_WORKERS", "1"))
+
 # Logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("clubcalendar")
 
+# Public listing projection - the only columns a public listing may carry
+PUBLIC_LISTING_COLUMNS = frozenset({
+    "Id", "Name", "StartDate", "EndDate", "BriefDescription", "Tags"
+})
+
+PUBLIC_SELECT_SQL = """
+    Id, Name, StartDate, EndDate,
+    CASE WHEN length(Details) > 200
+         THEN substr(Details, 1, 200) || '...'
+         ELSE Details END as BriefDescription,
+    Tags"""
+
+MEMBER_SELECT_SQL = """
+    Id, Name, StartDate, EndDate, Location, Details, Tags,
+    RegistrationEnabled, RegistrationsLimit, ConfirmedRegistrationsCount,
+    RegistrationUrl,
+    CASE WHEN RegistrationsLimit > 0
+              AND ConfirmedRegistrationsCount >= RegistrationsLimit
+         THEN 1 ELSE 0 END as IsFull,
+    CASE WHEN RegistrationsLimit > 0
+         THEN RegistrationsLimit - ConfirmedRegistrationsCount
+         ELSE NULL END as SpotsAvailable"""
+
+# Event detail - public detail projection and batch/caching limits
+PUBLIC_DETAIL_COLUMNS = PUBLIC_LISTING_COLUMNS
+
+PUBLIC_DETAIL_SQL = """
+    Id, Name, StartDate, EndDate,
+    substr(coalesce(Details, ''), 1, 200) as BriefDescription,
+    Tags"""
+
+MEMBER_DETAIL_SQL = """
+    Id, Name, StartDate, EndDate, Location, Details, Tags,
+    RegistrationEnabled, RegistrationUrl,
+    RegistrationsLimit, ConfirmedRegistrationsCount"""
+
+BATCH_MAX_IDS = 100
+DETAIL_MAX_AGE = 60
+
+# ICS subscription feeds
+ICS_TIMEZONE = "America/Los_Angeles"
+ICS_CALENDAR_NAME = "Santa Barbara Newcomers Club"
+ICS_UID_DOMAIN = "sbnewcomers.org"
+EVENT_URL_TEMPLATE = "https://sbnewcomers.org/event-{id}"
+ICS_PAST_DAYS = 30
+ICS_PAGE_SIZE = 500
+ICS_CACHE_SIZE = int(os.environ.get("CLUBCAL_ICS_CACHE_SIZE", "5000"))
+ICS_MAX_AGE = 900
+
+# Listing snapshots - when set, the default public and member listings are
+# rendered to files here after every wa.db change and served as files
+SNAPSHOT_DIR: Optional[Path] = (
+    Path(os.environ["CLUBCAL_SNAPSHOT_DIR"]) if os.environ.get("CLUBCAL_SNAPSHOT_DIR") else None
+)
+SNAPSHOT_POLL_SECONDS = float(os.environ.get("CLUBCAL_SNAPSHOT_POLL", "2"))
+
+# Listing day index - longest span indexed for one event
+DAY_INDEX_MAX_SPAN = 62
+
+# Change feed - how often the shared watcher checks wa.db, how many versions
+# are kept for clients catching up, and long-poll/SSE timings
+CHANGE_POLL_SECONDS = float(os.environ.get("CLUBCAL_CHANGE_POLL", "2"))
+CHANGE_HISTORY = 200
+LONG_POLL_TIMEOUT = 25
+SSE_KEEPALIVE_SECONDS = 15
+
+# Tag filters - most tags accepted in one tags=/anyTags= parameter
+MAX_TAG_FILTERS = 20
+
+# Search - results per page and bm25 weights for (Name, Details, Tags)
+SEARCH_PAGE_LIMIT = 25
+SEARCH_WEIGHTS = (10.0, 1.0, 5.0)
+
+# Metrics - Prometheus /metrics endpoint and request middleware (per process)
+METRICS_ENABLED = os.environ.get("CLUBCAL_METRICS", "0").lower() in ("1", "true", "yes")
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+# ============================================================================
+# FAST JSON RESPONSES
+# ============================================================================
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSON response rendered with orjson when it is installed.
+
+    Handlers return this directly with plain dicts/lists of str/int/None,
+    which skips FastAPI's jsonable_encoder walk over every row.
+    """
+
+    def render(self, content: Any) -> bytes:
+        if orjson is not None:
+            return orjson.dumps(content)
+        return super().render(content)
+
+
 # ============================================================================
 # FASTAPI APP
 # ============================================================================
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Warm this worker's cache on startup; drain the DB executor on shutdown."""
+    await warm_caches()
+    yield
+    org_registry.close_all()
+    default_org.change_watcher.stop()
+    default_org.snapshot_builder.stop()
+    shutdown_db_executor()
+
+
 app = FastAPI(
     title="ClubCalendar API",
     description="Calendar data API for SBNC widget",
-    version="1.03"
+    version="1.03",
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse
 )
 
-# CORS middleware
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=ALLOWED_ORIGINS,
-    allow_credentials=True,
-    allow_methods=["GET"],
-    allow_headers=["*"],
+# ============================================================================
+# METRICS
+# ============================================================================
+
+def format_labels(names: Tuple[str, ...], values: Tuple[Any, ...]) -> str:
+    if not names:
+        return ""
+    pairs = []
+    for name, value in zip(names, values):
+        text = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{name}="{text}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+class Counter:
+    """Monotonic counter per label set."""
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self._values: Dict[Tuple[Any, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values: Any, amount: float = 1) -> None:
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for values, total in sorted(self._values.items()):
+                lines.append(f"{self.name}{format_labels(self.labels, values)} {total}")
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram per label set."""
+
+    def __init__(self, name: str, help_text: str, buckets: Tuple[float, ...],
+                 labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self.labels = labels
+        # label values -> [per-bucket counts..., +Inf count, sum]
+        self._series: Dict[Tuple[Any, ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: Any) -> None:
+        # Index of the first bucket the value fits; len(buckets) means +Inf
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = i
+                break
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        names = self.labels + ("le",)
+        with self._lock:
+            for values, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), series):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(
+                        f"{self.name}_bucket{format_labels(names, values + (le,))} {cumulative}"
+                    )
+                labels = format_labels(self.labels, values)
+                lines.append(f"{self.name}_sum{labels} {series[-1]}")
+                lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+def render_samples(name: str, help_text: str, metric_type: str, labels: Tuple[str, ...],
+                   samples: List[Tuple[Tuple[Any, ...], float]]) -> List[str]:
+    """Exposition lines for values read at scrape time (e.g. cache counters)."""
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} {metric_type}"]
+    for values, value in samples:
+        lines.append(f"{name}{format_labels(labels, values)} {value}")
+    return lines
+
+
+http_requests = Counter(
+    "clubcal_http_requests_total", "HTTP requests by org, route, method and status.",
+    ("org", "route", "method", "status")
+)
+http_latency = Histogram(
+    "clubcal_http_request_duration_seconds", "Time to complete a response, by org and route.",
+    LATENCY_BUCKETS, ("org", "route")
+)
+http_response_size = Histogram(
+    "clubcal_http_response_size_bytes", "Response body size, by org and route.",
+    SIZE_BUCKETS, ("org", "route")
+)
+db_latency = Histogram(
+    "clubcal_db_query_duration_seconds", "Time spent running DB work on the executor, by org.",
+    LATENCY_BUCKETS, ("org", "operation")
 )
+db_shed = Counter(
+    "clubcal_db_shed_total", "DB calls rejected with 503 at the pending cap, by org.", ("org",)
+)
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware recording per-route counts, latency and size.
+
+    Routes are labelled with their org and path template so cardinality
+    stays bounded. A disabled flag costs one attribute check per request.
+    """
+
+    def __init__(self, app: Any):
+        self.app = app
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable, send: Callable) -> None:
+        if not METRICS_ENABLED or scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = 500
+        size = 0
+
+        async def send_wrapper(message: Dict[str, Any]) -> None:
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            org = current_org().org_id
+            route = getattr(scope.get("route"), "path", "<unmatched>")
+            http_requests.inc(org, route, scope["method"], status)
+            http_latency.observe(time.perf_counter() - started, org, route)
+            http_response_size.observe(size, org, route)
+
+
+app.add_middleware(MetricsMiddleware)
 
 # ============================================================================
 # DATABASE
 # ============================================================================
 
+_thread_local = threading.local()
+
+
 def get_db_connection() -> sqlite3.Connection:
-    """Get database connection."""
-    if not DB_PATH.exists():
+    """
+    Get this thread's connection to the current org's database.
+
+    Each DB executor thread keeps one open connection per open org and
+    reuses it across requests. It is reopened if the file is replaced;
+    connections to evicted orgs are closed on the thread's next call.
+    """
+    db_path = current_org().db_path
+    try:
+        stat = db_path.stat()
+    except FileNotFoundError:
         raise HTTPException(status_code=503, detail="Database not available")
-    conn = sqlite3.connect(str(DB_PATH))
-    conn.row_factory = sqlite3.Row
+
+    conns = getattr(_thread_local, "conns", None)
+    if conns is None:
+        conns = _thread_local.conns = {}
+        _thread_local.generation = org_registry.generation
+    if _thread_local.generation != org_registry.generation:
+        _thread_local.generation = org_registry.generation
+        open_paths = org_registry.open_paths()
+        for path in [p for p in conns if p not in open_paths]:
+            conns.pop(path)[1].close()
+
+    path = str(db_path)
+    key = (path, stat.st_ino)
+    cached = conns.get(path)
+    if cached is not None and cached[0] == key:
+        ensure_schema(cached[1], key)
+        return cached[1]
+    if cached is not None:
+        cached[1].close()
+
+    # Rows come back as plain tuples; fetch_dicts() zips them with the
+    # cursor's column names, which is cheaper than sqlite3.Row + dict().
+    conn = sqlite3.connect(path)
+    ensure_schema(conn, key)
+    conns[path] = (key, conn)
     return conn
 
 
+def data_stamp() -> Tuple[Any, ...]:
+    """
+    Cheap change marker for the current org's wa.db.
+
+    Built from stat() of the database and its WAL file, so any committed
+    write by the sync job produces a new stamp.
+    """
+    db_path = current_org().db_path
+    parts: List[Any] = [str(db_path)]
+    for path in (db_path, Path(str(db_path) + "-wal")):
+        try:
+            stat = path.stat()
+            parts.extend([stat.st_ino, stat.st_mtime_ns, stat.st_size])
+        except FileNotFoundError:
+            parts.append(None)
+    return tuple(parts)
+
+
+def data_mtime(org: Optional["OrgContext"] = None) -> Optional[datetime]:
+    """When an org's wa.db (or its WAL) was last written, or None if it is missing."""
+    db_path = (org or current_org()).db_path
+    mtimes = []
+    for path in (db_path, Path(str(db_path) + "-wal")):
+        try:
+            mtimes.append(path.stat().st_mtime)
+        except FileNotFoundError:
+            pass
+    if not mtimes:
+        return None
+    return datetime.fromtimestamp(int(max(mtimes)), tz=timezone.utc)
+
+
 # ============================================================================
-# PUBLIC EVENTS ENDPOINT
+# HTTP CACHING
 # ============================================================================
 
-@app.get("/api/calendar/events")
-def get_public_events() -> Dict[str, Any]:
+def data_etag(*key: Any) -> str:
     """
-    Return public events only.
+    Weak ETag for a response derived from wa.db's data stamp and a request key.
 
-    PII Protection - EXCLUDES:
-    - Location (venue details)
-    - Registration counts
-    - Organizer contact info
+    Weak because it tracks the underlying data, not the exact bytes (the
+    body's timestamp always differs).
     """
-    logger.info("Fetching public events")
-    conn = get_db_connection()
-    try:
-        cur = conn.cursor()
+    digest = hashlib.sha1(repr((data_stamp(), key)).encode()).hexdigest()[:20]
+    return f'W/"{digest}"'
 
-        # Check for AccessLevel column
-        cur.execute("PRAGMA table_info(events)")
-        columns = {row[1] for row in cur.fetchall()}
-        has_access_level = 'AccessLevel' in columns
 
-        where_clause = "WHERE date(StartDate) >= date('now')"
-        if has_access_level:
-            where_clause += " AND AccessLevel = 'Public'"
+def cache_headers(audience: str, etag: str, max_age: int) -> Dict[str, str]:
+    """Validator and Cache-Control headers; member data is never shared-cacheable."""
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"{'public' if audience == 'public' else 'private'}, max-age={max_age}",
+    }
+    modified = data_mtime()
+    if modified is not None:
+        headers["Last-Modified"] = format_datetime(modified, usegmt=True)
+    return headers
 
-        sql = f"""
-        SELECT
-            Id, Name, StartDate, EndDate,
-            CASE WHEN length(Details) > 200
-                 THEN substr(Details, 1, 200) || '...'
-                 ELSE Details END as BriefDescription,
-            Tags
-        FROM events
-        {where_clause}
-        ORDER BY StartDate ASC
-        LIMIT 200
-        """
 
-        cur.execute(sql)
-        events = [dict(row) for row in cur.fetchall()]
+def is_not_modified(request: Request, etag: str) -> bool:
+    """Evaluate If-None-Match, falling back to If-Modified-Since (RFC 9110)."""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return etag in if_none_match or if_none_match.strip() == "*"
 
-        # Double-check no PII leaked
-        for event in events:
-            event.pop('Location', None)
-            event.pop('ConfirmedRegistrationsCount', None)
-            event.pop('RegistrationsLimit', None)
+    if_modified_since = request.headers.get("if-modified-since")
+    modified = data_mtime()
+    if if_modified_since and modified is not None:
+        try:
+            return modified <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+# ============================================================================
+# SCHEMA (search index)
+# ============================================================================
+
+# events_fts is an FTS5 index over events, kept current by triggers so
+# whichever job writes wa.db also maintains the index. It keeps its own copy
+# of the indexed text so entries can be deleted by rowid alone: INSERT OR
+# REPLACE removes the old row without firing events_fts_ad (recursive_triggers
+# is off), and events_fts_ai then drops the stale entry itself.
+SEARCH_SCHEMA_SQL = """
+CREATE VIRTUAL TABLE IF NOT EXISTS events_fts USING fts5(
+    Name, Details, Tags,
+    tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS events_fts_ai AFTER INSERT ON events BEGIN
+    DELETE FROM events_fts WHERE rowid = new.Id;
+    INSERT INTO events_fts(rowid, Name, Details, Tags)
+    VALUES (new.Id, new.Name, new.Details, new.Tags);
+END;
+CREATE TRIGGER IF NOT EXISTS events_fts_ad AFTER DELETE ON events BEGIN
+    DELETE FROM events_fts WHERE rowid = old.Id;
+END;
+CREATE TRIGGER IF NOT EXISTS events_fts_au AFTER UPDATE ON events BEGIN
+    DELETE FROM events_fts WHERE rowid = old.Id;
+    INSERT INTO events_fts(rowid, Name, Details, Tags)
+    VALUES (new.Id, new.Name, new.Details, new.Tags);
+END;
+INSERT INTO events_fts(rowid, Name, Details, Tags)
+SELECT Id, Name, Details, Tags FROM events;
+"""
+
+# event_tags is a normalized (lowercased, trimmed) copy of the comma-separated
+# events.Tags column. Triggers split Tags with json_each; the CASE guard
+# means an unsplittable value yields no tags instead of failing the write.
+TAG_SPLIT_SQL = """json_each(CASE WHEN json_valid({json}) THEN {json} ELSE '[]' END)"""
+TAG_JSON_SQL = (
+    """'["' || replace(replace(replace(replace(replace(replace(coalesce({col}, ''), """
+    """'\\', '\\\\'), '"', '\\"'), char(9), ' '), char(10), ' '), char(13), ' '), """
+    """',', '","') || '"]'"""
+)
+
+
+def tag_split_sql(col: str) -> str:
+    """SQL table-valued expression yielding one row per tag in `col`."""
+    return TAG_SPLIT_SQL.format(json=TAG_JSON_SQL.format(col=col))
+
+
+TAG_SCHEMA_SQL = f"""
+CREATE TABLE IF NOT EXISTS event_tags (
+    event_id INTEGER NOT NULL,
+    tag TEXT NOT NULL,
+    PRIMARY KEY (tag, event_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_event_tags_event ON event_tags(event_id);
+CREATE TRIGGER IF NOT EXISTS event_tags_ai AFTER INSERT ON events BEGIN
+    -- INSERT OR REPLACE removes the old row without firing event_tags_ad
+    DELETE FROM event_tags WHERE event_id = new.Id;
+    INSERT OR IGNORE INTO event_tags(event_id, tag)
+    SELECT new.Id, lower(trim(value)) FROM {tag_split_sql('new.Tags')}
+    WHERE trim(value) != '';
+END;
+CREATE TRIGGER IF NOT EXISTS event_tags_ad AFTER DELETE ON events BEGIN
+    DELETE FROM event_tags WHERE event_id = old.Id;
+END;
+CREATE TRIGGER IF NOT EXISTS event_tags_au AFTER UPDATE OF Id, Tags ON events BEGIN
+    DELETE FROM event_tags WHERE event_id = old.Id;
+    INSERT OR IGNORE INTO event_tags(event_id, tag)
+    SELECT new.Id, lower(trim(value)) FROM {tag_split_sql('new.Tags')}
+    WHERE trim(value) != '';
+END;
+INSERT OR IGNORE INTO event_tags(event_id, tag)
+SELECT events.Id, lower(trim(value)) FROM events, {tag_split_sql('events.Tags')}
+WHERE trim(value) != '';
+"""
+
+# Derived indexes over events: (table, version, triggers, DDL + backfill).
+# An index is dropped and rebuilt when its table or any of its triggers is
+# missing (e.g. a writer recreated events) or its recorded version is older.
+SCHEMA_MIGRATIONS = [
+    ("events_fts", 2, ("events_fts_ai", "events_fts_ad", "events_fts_au"), SEARCH_SCHEMA_SQL),
+    ("event_tags", 2, ("event_tags_ai", "event_tags_ad", "event_tags_au"), TAG_SCHEMA_SQL),
+]
+
+# Versions of the indexes built in this database; indexes created before
+# this table existed are version 1
+INDEX_VERSIONS_SQL = """
+CREATE TABLE IF NOT EXISTS index_versions (
+    name TEXT PRIMARY KEY,
+    version INTEGER NOT NULL
+);
+"""
+
+# Database key -> PRAGMA schema_version when its indexes were last checked
+_schema_checked: Dict[Tuple[Any, ...], int] = {}
+_schema_lock = threading.Lock()
+
+
+def table_exists(conn: sqlite3.Connection, name: str) -> bool:
+    row = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE name = ?", (name,)
+    ).fetchone()
+    return row is not None
+
+
+def is_transient_error(error: sqlite3.Error) -> bool:
+    """True for lock contention that a later attempt can get past."""
+    message = str(error).lower()
+    return "locked" in message or "busy" in message
+
+
+def schema_version(conn: sqlite3.Connection) -> int:
+    return conn.execute("PRAGMA schema_version").fetchone()[0]
+
+
+def ensure_schema(conn: sqlite3.Connection, key: Tuple[Any, ...]) -> None:
+    """
+    Create or rebuild the search and tag indexes and their triggers.
+
+    Checked once per database file and again whenever its schema changes,
+    so a writer dropping events (and with it the triggers) is repaired on
+    the next request. A read-only database is logged and skipped; search
+    and tag filtering then answer 503 until the index exists. A locked
+    database is retried on the next request.
+    """
+    version = schema_version(conn)
+    if _schema_checked.get(key) == version:
+        return
+    with _schema_lock:
+        version = schema_version(conn)
+        if _schema_checked.get(key) == version:
+            return
+        if apply_schema_migrations(conn):
+            _schema_checked[key] = schema_version(conn)
+
+
+def index_is_current(conn: sqlite3.Connection, table: str, version: int,
+                     triggers: Tuple[str, ...]) -> bool:
+    """True if the index table, all its triggers and its current version exist."""
+    present = {row[0] for row in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'events'"
+    )}
+    if not table_exists(conn, table) or not set(triggers) <= present:
+        return False
+    built = 1
+    if table_exists(conn, "index_versions"):
+        row = conn.execute("SELECT version FROM index_versions WHERE name = ?", (table,)).fetchone()
+        built = row[0] if row else 1
+    return built >= version
+
+
+def apply_schema_migrations(conn: sqlite3.Connection) -> bool:
+    """Build missing or stale indexes; False if a transient error should be retried."""
+    if not table_exists(conn, "events"):
+        return True
+    done = True
+    for table, version, triggers, script in SCHEMA_MIGRATIONS:
+        if index_is_current(conn, table, version, triggers):
+            continue
+        drop = "".join(f"DROP TRIGGER IF EXISTS {name};" for name in triggers)
+        record = (
+            INDEX_VERSIONS_SQL +
+            f"INSERT OR REPLACE INTO index_versions(name, version) VALUES ('{table}', {version});"
+        )
+        try:
+            conn.executescript(
+                "BEGIN IMMEDIATE;" + drop + f"DROP TABLE IF EXISTS {table};" + script + record + "COMMIT;"
+            )
+            logger.info(f"Built {table} index (version {version})")
+        except sqlite3.Error as e:
+            if conn.in_transaction:
+                conn.rollback()
+            if is_transient_error(e):
+                logger.warning(f"{table} index not created, will retry: {e}")
+                done = False
+            else:
+                logger.warning(f"{table} index not created: {e}")
+    return done
+
+
+def require_table(conn: sqlite3.Connection, table: str) -> None:
+    """Answer 503 if an index table could not be created on this database."""
+    if not table_exists(conn, table):
+        raise HTTPException(status_code=503, detail=f"Index {table} not available")
 
-        return {
-            "events": events,
-            "count": len(events),
-            "audience": "public",
-            "timestamp": datetime.now(timezone.utc).isoformat()
-        }
-    finally:
-        conn.close()
+
+def public_access_condition(cur: sqlite3.Cursor) -> Optional[str]:
+    """Return the public-only filter, or None if the table has no AccessLevel."""
+    cur.execute("PRAGMA table_info(events)")
+    columns = {row[1] for row in cur.fetchall()}
+    return "AccessLevel = 'Public'" if 'AccessLevel' in columns else None
 
 
 # ============================================================================
-# MEMBER EVENTS ENDPOINT
+# DB EXECUTOR
 # ============================================================================
 
-@app.get("/api/calendar/events/member")
-def get_member_events() -> Dict[str, Any]:
+_db_executor: Optional[ThreadPoolExecutor] = None
+_db_executor_lock = threading.Lock()
+_db_pending = 0
+
+
+def get_db_executor() -> ThreadPoolExecutor:
+    """Return the process-wide DB executor, creating it on first use."""
+    global _db_executor
+    with _db_executor_lock:
+        if _db_executor is None:
+            _db_executor = ThreadPoolExecutor(
+                max_workers=DB_WORKERS, thread_name_prefix="clubcal-db"
+            )
+        return _db_executor
+
+
+def shutdown_db_executor() -> None:
+    """Wait for in-flight queries, then stop the DB executor."""
+    global _db_executor
+    with _db_executor_lock:
+        if _db_executor is not None:
+            _db_executor.shutdown(wait=True)
+            _db_executor = None
+
+
+async def run_db(fn: Callable[..., Any], *args: Any) -> Any:
     """
-    Return all events with full details for members.
+    Run a blocking DB function on the bounded DB executor.
 
-    Includes location, availability, registration info.
+    At most DB_WORKERS queries run at once; at most DB_MAX_PENDING may be
+    queued or running. Past that the request is shed with a 503 so a
+    spike cannot pile up unbounded work.
     """
-    logger.info("Fetching member events")
-    conn = get_db_connection()
+    global _db_pending
+    with _db_executor_lock:
+        if _db_pending >= DB_MAX_PENDING:
+            if METRICS_ENABLED:
+                db_shed.inc(current_org().org_id)
+            raise HTTPException(
+                status_code=503,
+                detail="Server busy",
+                headers={"Retry-After": "1"}
+            )
+        _db_pending += 1
     try:
-        cur = conn.cursor()
-
-        sql = """
-        SELECT
-            Id, Name, StartDate, EndDate, Location, Details, Tags,
-            RegistrationEnabled, RegistrationsLimit, ConfirmedRegistrationsCount,
-            RegistrationUrl,
-            CASE WHEN RegistrationsLimit > 0
-                      AND ConfirmedRegistrationsCount >= RegistrationsLimit
-                 THEN 1 ELSE 0 END as IsFull,
-            CASE WHEN RegistrationsLimit > 0
-                 THEN RegistrationsLimit - ConfirmedRegistrationsCount
-                 ELSE NULL END as SpotsAvailable
-        FROM events
-        WHERE date(StartDate) >= date('now', '-7 days')
-        ORDER BY StartDate ASC
-        LIMIT 500
-        """
+        loop = asyncio.get_running_loop()
+        # Carry the request's org over to the executor thread
+        context = contextvars.copy_context()
+        if METRICS_ENABLED:
+            return await loop.run_in_executor(
+                get_db_executor(), context.run, _timed_db_call, fn, args
+            )
+        return await loop.run_in_executor(get_db_executor(), context.run, fn, *args)
+    finally:
+        with _db_executor_lock:
+            _db_pending -= 1
 
-        cur.execute(sql)
-        events = [dict(row) for row in cur.fetchall()]
 
-        return {
-            "events": events,
-            "count": len(events),
-            "audience": "member",
-            "timestamp": datetime.now(timezone.utc).isoformat()
-        }
-    except sqlite3.Error as e:
-        logger.error(f"Database error: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+def _timed_db_call(fn: Callable[..., Any], args: Tuple[Any, ...]) -> Any:
+    # Time only the work on the executor thread, not the queue wait. Cached
+    # calls are labelled by the loader they run so hits and misses share one
+    # series per query type. Runs in the request's context, so current_org()
+    # is the org that queued the call.
+    operation = args[1].__name__ if fn is _load_through_cache else fn.__name__
+    started = time.perf_counter()
+    try:
+        return fn(*args)
     finally:
-        conn.close()
+        db_latency.observe(time.perf_counter() - started, current_org().org_id, operation)
 
 
 # ============================================================================
-# EVENT DETAIL ENDPOINT
+# QUERY CACHE
 # ============================================================================
 
-@app.get("/api/calendar/event/{event_id}")
-def get_event_detail(
-    event_id: int,
-    audience: str = Query("public", pattern="^(public|member)$")
-) -> Dict[str, Any]:
+class QueryCache:
     """
-    Get event details. Filters fields based on audience.
+    Per-process, per-org LRU of query results.
+
+    The whole cache is dropped whenever data_stamp() changes, so entries
+    never outlive the data they were read from. Cached values are shared
+    between requests and must not be mutated.
     """
-    logger.info(f"Fetching event {event_id} for {audience}")
-    conn = get_db_connection()
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Tuple[Any, ...], Any]" = OrderedDict()
+        self._stamp: Optional[Tuple[Any, ...]] = None
+        self._lock = threading.Lock()
+
+    def get_or_load(self, key: Tuple[Any, ...], loader: Callable[..., Any], *args: Any) -> Any:
+        """Return the cached value for key, calling loader(*args) on a miss."""
+        stamp = data_stamp()
+        with self._lock:
+            if stamp != self._stamp:
+                self._entries.clear()
+                self._stamp = stamp
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+
+        value = loader(*args)
+
+        with self._lock:
+            if self._stamp == stamp and self.max_entries > 0:
+                self._entries[key] = value
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._stamp = None
+
+
+query_cache = QueryCache(QUERY_CACHE_SIZE)
+
+
+def _load_through_cache(key: Tuple[Any, ...], loader: Callable[..., Any], *args: Any) -> Any:
+    # Open (and if needed migrate) the connection before the cache takes its
+    # data stamp, so creating the search index does not look like new data.
+    get_db_connection()
+    return current_org().query_cache.get_or_load(key, loader, *args)
+
+
+async def cached_query(key: Tuple[Any, ...], loader: Callable[..., Any], *args: Any) -> Any:
+    """Run loader(*args) on the DB executor through the query cache."""
+    return await run_db(_load_through_cache, key, loader, *args)
+
+
+def _etag_after_connect(key: Tuple[Any, ...]) -> str:
+    get_db_connection()
+    return data_etag(*key)
+
+
+async def current_etag(*key: Any) -> str:
+    """
+    data_etag() for a request, taken before its data is read.
+
+    Runs on the DB executor after the connection is open, so a first-time
+    schema migration is not mistaken for a data change.
+    """
+    return await run_db(_etag_after_connect, key)
+
+
+async def warm_caches() -> None:
+    """Prime the default public and member listings (and snapshots) for this worker."""
     try:
-        cur = conn.cursor()
-        cur.execute("SELECT * FROM events WHERE Id = ?", (event_id,))
-        row = cur.fetchone()
+        await fetch_listing("public", default_listing_query("public"))
+        await fetch_listing("member", default_listing_query("member"))
+        logger.info("Query cache warmed")
+        if SNAPSHOT_DIR is not None:
+            default_org.snapshot_builder.ensure_started()
+            await run_db(default_org.snapshot_builder.check_now)
+    except HTTPException as e:
+        logger.warning(f"Cache warm-up skipped: {e.detail}")
 
-        if not row:
-            raise HTTPException(status_code=404, detail="Event not found")
 
-        event = dict(row)
+# ============================================================================
+# DATE WINDOW + KEYSET PAGINATION
+# ============================================================================
 
-        if audience == "public":
-            return {
-                "event": {
-                    "Id": event.get("Id"),
-                    "Name": event.get("Name"),
-                    "StartDate": event.get("StartDate"),
-                    "EndDate": event.get("EndDate"),
-                    "BriefDescription": (event.get("Details") or "")[:200],
-                    "Tags": event.get("Tags")
-                },
-                "audience": "public",
-                "timestamp": datetime.now(timezone.utc).isoformat()
-            }
-        else:
-            limit = event.get("RegistrationsLimit") or 0
-            confirmed = event.get("ConfirmedRegistrationsCount") or 0
-            return {
-                "event": {
-                    "Id": event.get("Id"),
-                    "Name": event.get("Name"),
-                    "StartDate": event.get("StartDate"),
-                    "EndDate": event.get("EndDate"),
-                    "Location": event.get("Location"),
-                    "Details": event.get("Details"),
-                    "Tags": event.get("Tags"),
-                    "RegistrationEnabled": event.get("RegistrationEnabled"),
-                    "RegistrationUrl": event.get("RegistrationUrl"),
-                    "RegistrationsLimit": limit,
-                    "ConfirmedRegistrationsCount": confirmed,
-                    "SpotsAvailable": max(0, limit - confirmed) if limit else None,
-                    "IsFull": confirmed >= limit if limit else False
-                },
-                "audience": "member",
-                "timestamp": datetime.now(timezone.utc).isoformat()
-            }
-    finally:
-        conn.close()
+def encode_cursor(start_date: str, event_id: int) -> str:
+    """Encode the (StartDate, Id) of the last event on a page as a cursor."""
+    raw = json.dumps([start_date, event_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, int]:
+    """Decode a cursor produced by encode_cursor. Raises 400 if malformed."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        start_date, event_id = json.loads(base64.urlsafe_b64decode(padded))
+        if not isinstance(start_date, str) or not isinstance(event_id, int):
+            raise ValueError("wrong cursor types")
+        return start_date, event_id
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def build_window_clause(
+    start: date,
+    end: Optional[date],
+    cursor: Optional[str]
+) -> Tuple[List[str], List[Any]]:
+    """
+    Build WHERE conditions for a date window plus keyset position.
+
+    StartDate is compared as text against date strings so the
+    (StartDate, Id) index can be used. `end` is inclusive.
+    """
+    if end is not None and end < start:
+        raise HTTPException(status_code=400, detail="end must not be before start")
+
+    conditions = ["StartDate >= ?"]
+    params: List[Any] = [start.isoformat()]
+
+    if end is not None:
+        conditions.append("StartDate < ?")
+        params.append((end + timedelta(days=1)).isoformat())
+
+    if cursor:
+        after_start, after_id = decode_cursor(cursor)
+        conditions.append("(StartDate > ? OR (StartDate = ? AND Id > ?))")
+        params.extend([after_start, after_start, after_id])
+
+    return conditions, params
+
+
+@dataclass(frozen=True)
+class ListingQuery:
+    """Window, page and tag filters of a listing request. Doubles as a cache key."""
+    start: date
+    end: Optional[date] = None
+    limit: int = PUBLIC_PAGE_LIMIT
+    cursor: Optional[str] = None
+    all_tags: Tuple[str, ...] = ()
+    any_tags: Tuple[str, ...] = ()
+
+
+def default_listing_query(audience: str, today: Optional[date] = None) -> ListingQuery:
+    """The page a listing request with no window, paging or tag filters gets."""
+    today = today or utc_today()
+    if audience == "public":
+        return ListingQuery(today, limit=PUBLIC_PAGE_LIMIT)
+    return ListingQuery(today - timedelta(days=7), limit=MEMBER_PAGE_LIMIT)
+
+
+def parse_tags(value: Optional[str]) -> Tuple[str, ...]:
+    """Parse a comma-separated tag filter into sorted, normalized tags."""
+    if not value:
+        return ()
+    tags = tuple(sorted({t.strip().lower() for t in value.split(",") if t.strip()}))
+    if len(tags) > MAX_TAG_FILTERS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_TAG_FILTERS} tags per filter")
+    return tags
+
+
+def build_tag_clause(
+    all_tags: Tuple[str, ...],
+    any_tags: Tuple[str, ...]
+) -> Tuple[List[str], List[Any]]:
+    """Build WHERE conditions that resolve tag filters through event_tags."""
+    conditions: List[str] = []
+    params: List[Any] = []
+
+    if all_tags:
+        marks = ",".join("?" * len(all_tags))
+        conditions.append(
+            f"Id IN (SELECT event_id FROM event_tags WHERE tag IN ({marks})"
+            f" GROUP BY event_id HAVING COUNT(*) = ?)"
+        )
+        params.extend(all_tags)
+        params.append(len(all_tags))
+
+    if any_tags:
+        marks = ",".join("?" * len(any_tags))
+        conditions.append(f"Id IN (SELECT event_id FROM event_tags WHERE tag IN ({marks}))")
+        params.extend(any_tags)
+
+    return conditions, params
+
+
+def build_listing_clause(
+    conn: sqlite3.Connection,
+    audience: str,
+    query: ListingQuery
+) -> Tuple[List[str], List[Any]]:
+    """Combine window, keyset, tag and audience conditions for a listing."""
+    conditions, params = build_window_clause(query.start, query.end, query.cursor)
+
+    if query.all_tags or query.any_tags:
+        require_table(conn, "event_tags")
+        tag_conditions, tag_params = build_tag_clause(query.all_tags, query.any_tags)
+        conditions.extend(tag_conditions)
+        params.extend(tag_params)
+
+    if audience == "public":
+        access = public_access_condition(conn.cursor())
+        if access:
+            conditions.append(access)
+
+    return conditions, params
+
+
+def fetch_dicts(
+    cur: sqlite3.Cursor,
+    rows: List[tuple],
+    allowed_columns: Optional[frozenset] = None
+) -> List[Dict[str, Any]]:
+    """
+    Turn fetched row tuples into dicts keyed by the selected column names.
+
+    When allowed_columns is given the query's projection is checked once
+    against it, so a widened SELECT fails loudly instead of leaking fields.
+    """
+    columns = [d[0] for d in cur.description]
+    if allowed_columns is not None and not allowed_columns.issuperset(columns):
+        leaked = sorted(set(columns) - allowed_columns)
+        logger.error(f"Projection violation, unexpected columns: {leaked}")
+        raise HTTPException(status_code=500, detail="Projection violation")
+    return [dict(zip(columns, row)) for row in rows]
+
+
+def paginate(
+    cur: sqlite3.Cursor,
+    limit: int,
+    allowed_columns: Optional[frozenset] = None
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    Trim a limit+1 fetch to one page and compute the next cursor.
+
+    Returns (events, next_cursor); next_cursor is None on the last page.
+    """
+    rows = cur.fetchall()
+    events = fetch_dicts(cur, rows[:limit], allowed_columns)
+    next_cursor = None
+    if len(rows) > limit and events:
+        last = events[-1]
+        next_cursor = encode_cursor(last["StartDate"], last["Id"])
+    return events, next_cursor
+
+
+def utc_today() -> date:
+    """Today's date in UTC, matching SQLite's date('now')."""
+    return datetime.now(timezone.utc).date()
 
 
 # ============================================================================
-# CONFIG ENDPOINT
+# PUBLIC EVENTS ENDPOINT
 # ============================================================================
 
-@app.get("/api/calendar/config")
-def get_config() -> Dict[str, Any]:
-    """Return widget configuration for SBNC."""
-    return {
-        "organization": {
-            "waAccountId": "176353",
-            "name": "Santa Barbara Newcomers Club"
-        },
-        "server": {
-            "eventsUrl": "https://mail.sbnewcomers.org/api/calendar/events",
-            "memberEventsUrl": "https://mail.sbnewcomers.org/api/calendar/events/member",
-            "eventDetailUrl": "https://mail.sbnewcomers.org/api/calendar/event"
-        },
-        "publicConfig": {
-            "headerTitle": "SBNC Public Events",
-            "showMyEvents": False,
-            "sidePanel": True,
-            "showLocation": False,
-            "showAvailability": False
-        },
-        "memberConfig": {
-            "headerTitle": "Club Events",
-            "showMyEvents": True,
-            "sidePanel": False,
-            "showLocation": True,
-            "showAvailability": True
-        },
-        "autoTagRules": [
-            {"type": "name-prefix", "pattern": "Games!:", "tag": "committee:games"},
-            {"type": "name-prefix", "pattern": "Wellness:", "tag": "committee:wellness"},
-            {"type": "name-prefix", "pattern": "Happy Hikers:", "tag": "committee:hikers"},
-            {"type": "name-prefix", "pattern": "Wine Appreciation:", "tag": "committee:wine"},
-            {"type": "name-prefix", "pattern": "Garden:", "tag": "committee:garden"},
-            {"type": "name-prefix", "pattern": "TGIF:", "tag": "committee:tgif"},
-            {"type": "name-prefix", "pattern": "Epicurious:", "tag": "committee:epicurious"}
-        ]
-    }
+def load_events_page(
+    audience: str,
+    query: ListingQuery
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Query one page of events for an audience. Runs on the DB executor."""
+    conn = get_db_connection()
+    try:
+        conditions, params = build_listing_clause(conn, audience, query)
+        where_clause = "WHERE " + " AND ".join(conditions)
+
+        if audience == "public":
+            # No PII can leak: the projection is checked against the public columns
+            select_sql, allowed = PUBLIC_SELECT_SQL, PUBLIC_LISTING_COLUMNS
+        else:
+            select_sql, allowed = MEMBER_SELECT_SQL, None
+
+        sql = f"""
+        SELECT {select_sql}
+        FROM events
+        {where_clause}
+        ORDER BY StartDate ASC, Id ASC
+        LIMIT ?
+        """
+
+        cur = conn.cursor()
+        cur.execute(sql, params + [query.limit + 1])
+        return paginate(cur, query.limit, allowed)
+    except sqlite3.Error as e:
+        logger.error(f"Database error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def build_day_index(events: List[Dict[str, Any]], tz_name: str = ICS_TIMEZONE) -> Dict[str, List[int]]:
+    """
+    Local day ('YYYY-MM-DD', in tz_name) -> positions in `events`.
+
+    Multi-day events are listed on every day they span; an end at exactly
+    midnight does not claim the following day.
+    """
+    days: Dict[str, List[int]] = {}
+    for position, event in enumerate(events):
+        start = ics_local_time(event.get("StartDate"), tz_name)
+        if start is None:
+            continue
+        first = datetime.strptime(start, "%Y%m%dT%H%M%S")
+        end = ics_local_time(event.get("EndDate"), tz_name)
+        last = datetime.strptime(end, "%Y%m%dT%H%M%S") if end else first
+        if last > first and last.time() == datetime.min.time():
+            last -= timedelta(days=1)
+
+        span = max(0, min((last.date() - first.date()).days, DAY_INDEX_MAX_SPAN - 1))
+        for offset in range(span + 1):
+            key = (first.date() + timedelta(days=offset)).isoformat()
+            days.setdefault(key, []).append(position)
+    return dict(sorted(days.items()))
+
+
+def load_listing(
+    audience: str,
+    query: ListingQuery
+) -> Tuple[List[Dict[str, Any]], Optional[str], Dict[str, List[int]]]:
+    """One listing page plus its day index. Runs on the DB executor."""
+    events, next_cursor = load_events_page(audience, query)
+    return events, next_cursor, build_day_index(events, current_org().timezone)
+
+
+async def fetch_listing(
+    audience: str,
+    query: ListingQuery
+) -> Tuple[List[Dict[str, Any]], Optional[str], Dict[str, List[int]]]:
+    """Cached listing page with its day index, as served by the listing endpoints."""
+    return await cached_query(("listing", audience, query), load_listing, audience, query)
+
+
+async def fetch_events_page(
+    audience: str,
+    query: ListingQuery
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Cached, non-blocking wrapper around load_events_page."""
+    return await cached_query((audience, query), load_events_page, audience, query)
+
+
+def listing_payload(
+    audience: str,
+    events: List[Dict[str, Any]],
+    next_cursor: Optional[str],
+    days: Dict[str, List[int]]
+) -> Dict[str, Any]:
+    """Response body of the listing endpoints (and their snapshots)."""
+    return {
+        "events": events,
+        "days": days,
+        "count": len(events),
+        "nextCursor": next_cursor,
+        "hasMore": next_cursor is not None,
+        "audience": audience,
+        "timestamp": datetime.now(timezone.utc).isoformat()
+    }
+
+
+@app.get("/api/calendar/events")
+async def get_public_events(
+    request: Request,
+    start: Optional[date] = Query(None, description="First day to include (default: today)"),
+    end: Optional[date] = Query(None, description="Last day to include"),
+    limit: int = Query(PUBLIC_PAGE_LIMIT, ge=1, le=MAX_PAGE_LIMIT),
+    cursor: Optional[str] = Query(None, description="nextCursor from the previous page"),
+    tags: Optional[str] = Query(None, description="Comma-separated tags; events must have all"),
+    any_tags: Optional[str] = Query(None, alias="anyTags", description="Comma-separated tags; events need one")
+) -> Response:
+    """
+    Return public events only, one page at a time.
+
+    `days` maps each local calendar day to the positions of the page's
+    events on that day. The unfiltered first page is served from its
+    snapshot file when CLUBCAL_SNAPSHOT_DIR is set.
+
+    PII Protection - EXCLUDES:
+    - Location (venue details)
+    - Registration counts
+    - Organizer contact info
+    """
+    logger.info(f"Fetching public events (start={start}, end={end}, limit={limit})")
+    query = ListingQuery(
+        start or utc_today(), end, limit, cursor, parse_tags(tags), parse_tags(any_tags)
+    )
+    if start is None and query == default_listing_query("public"):
+        snapshot = snapshot_listing(request, "public")
+        if snapshot is not None:
+            return snapshot
+    events, next_cursor, days = await fetch_listing("public", query)
+
+    return FastJSONResponse(listing_payload("public", events, next_cursor, days))
+
+
+# ============================================================================
+# MEMBER EVENTS ENDPOINT
+# ============================================================================
+
+@app.get("/api/calendar/events/member")
+async def get_member_events(
+    request: Request,
+    start: Optional[date] = Query(None, description="First day to include (default: 7 days ago)"),
+    end: Optional[date] = Query(None, description="Last day to include"),
+    limit: int = Query(MEMBER_PAGE_LIMIT, ge=1, le=MAX_PAGE_LIMIT),
+    cursor: Optional[str] = Query(None, description="nextCursor from the previous page"),
+    tags: Optional[str] = Query(None, description="Comma-separated tags; events must have all"),
+    any_tags: Optional[str] = Query(None, alias="anyTags", description="Comma-separated tags; events need one")
+) -> Response:
+    """
+    Return all events with full details for members, one page at a time.
+
+    Includes location, availability, registration info, and the same
+    `days` index as the public listing. Snapshot-served like the public
+    listing.
+    """
+    logger.info(f"Fetching member events (start={start}, end={end}, limit={limit})")
+    query = ListingQuery(
+        start or utc_today() - timedelta(days=7), end, limit, cursor,
+        parse_tags(tags), parse_tags(any_tags)
+    )
+    if start is None and query == default_listing_query("member"):
+        snapshot = snapshot_listing(request, "member")
+        if snapshot is not None:
+            return snapshot
+    events, next_cursor, days = await fetch_listing("member", query)
+
+    return FastJSONResponse(listing_payload("member", events, next_cursor, days))
+
+
+# ============================================================================
+# LISTING SNAPSHOTS
+# ============================================================================
+
+# Encodings written per snapshot, in server preference order, and file suffixes
+SNAPSHOT_ENCODINGS = {"br": ".json.br", "gzip": ".json.gz", "identity": ".json"}
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    """A rendered default listing: files and ETags by content coding."""
+    source: str
+    day: date
+    files: Dict[str, Tuple[Path, os.stat_result]]
+    etags: Dict[str, str]
+
+
+def encode_snapshot(body: bytes) -> Dict[str, bytes]:
+    """The listing body in every content coding available here."""
+    encoded = {"identity": body, "gzip": gzip.compress(body, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        encoded["br"] = brotli.compress(body)
+    return encoded
+
+
+class SnapshotBuilder:
+    """
+    Renders an org's default public and member listings to files.
+
+    A daemon thread reads PRAGMA data_version on its own connection every
+    SNAPSHOT_POLL_SECONDS. A sync commit, a replaced database file or a
+    new UTC day, which moves the default windows, re-renders both pages
+    through load_listing, so public files pass the same projection check
+    as the endpoint. Files are named by content digest and never
+    rewritten; the previous generation is kept for responses still
+    reading it, and all are removed when the builder stops.
+    """
+
+    def __init__(self, org: "OrgContext"):
+        self.org = org
+        self.builds = 0
+        self._snapshots: Dict[str, Snapshot] = {}
+        self._marker: Optional[Tuple[Any, ...]] = None
+        self._probe: Optional[Tuple[Tuple[str, int], sqlite3.Connection]] = None
+        self._generations: "deque[List[Path]]" = deque()
+        self._lock = threading.Lock()
+        self._check_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def get(self, audience: str) -> Optional[Snapshot]:
+        """The current snapshot, or None if there is none for today's window."""
+        snapshot = self._snapshots.get(audience)
+        if snapshot is None or snapshot.day != utc_today():
+            return None
+        if snapshot.source != str(self.org.db_path):
+            return None
+        return snapshot
+
+    def ensure_started(self) -> None:
+        """Start the builder thread on first use."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._run, name=f"clubcal-snapshots-{self.org.org_id}", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self, wait: bool = True) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            if wait:
+                self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            if SNAPSHOT_DIR is not None:
+                try:
+                    self.check_now()
+                except Exception as e:
+                    logger.warning(f"Snapshot build for org {self.org.org_id} failed: {e}")
+            self._stop.wait(SNAPSHOT_POLL_SECONDS)
+
+        with self._check_lock:
+            self._snapshots, self._marker = {}, None
+            while self._generations:
+                for path in self._generations.popleft():
+                    path.unlink(missing_ok=True)
+            if self._probe is not None:
+                self._probe[1].close()
+                self._probe = None
+
+    def _data_version(self) -> Tuple[str, int, int]:
+        # data_version only moves for commits by other connections, so the
+        # probe connection is never used for anything else
+        db_path = self.org.db_path
+        try:
+            stat = db_path.stat()
+        except FileNotFoundError:
+            raise HTTPException(status_code=503, detail="Database not available")
+        key = (str(db_path), stat.st_ino)
+        if self._probe is None or self._probe[0] != key:
+            if self._probe is not None:
+                self._probe[1].close()
+            self._probe = (key, sqlite3.connect(key[0], check_same_thread=False))
+        return key + (self._probe[1].execute("PRAGMA data_version").fetchone()[0],)
+
+    def check_now(self) -> bool:
+        """Re-render if the data or the day changed. Returns True if files were written."""
+        with self._check_lock:
+            token = _current_org.set(self.org)
+            try:
+                # Migrate first so creating the search index is not a data change
+                get_db_connection()
+                marker = self._data_version() + (self.org.timezone, utc_today())
+                if marker == self._marker:
+                    return False
+                files: List[Path] = []
+                snapshots = {
+                    audience: self._render(audience, marker[0], marker[-1], files)
+                    for audience in ("public", "member")
+                }
+            except Exception:
+                # Fail closed: requests go back to the per-request path
+                self._snapshots, self._marker = {}, None
+                raise
+            finally:
+                _current_org.reset(token)
+
+            self._snapshots, self._marker = snapshots, marker
+            self.builds += 1
+            self._generations.append(files)
+            while len(self._generations) > 2:
+                for path in self._generations.popleft():
+                    path.unlink(missing_ok=True)
+            logger.info(f"Rendered listing snapshots for org {self.org.org_id}")
+            return True
+
+    def _render(self, audience: str, source: str, day: date, written: List[Path]) -> Snapshot:
+        events, next_cursor, days = load_listing(audience, default_listing_query(audience, day))
+        body = FastJSONResponse(listing_payload(audience, events, next_cursor, days)).body
+        digest = hashlib.sha1(body).hexdigest()[:20]
+
+        directory = SNAPSHOT_DIR / self.org.org_id
+        directory.mkdir(parents=True, exist_ok=True)
+        files: Dict[str, Tuple[Path, os.stat_result]] = {}
+        for encoding, data in encode_snapshot(body).items():
+            path = directory / f"{audience}-{digest}{SNAPSHOT_ENCODINGS[encoding]}"
+            temp = path.with_name(path.name + ".tmp")
+            temp.write_bytes(data)
+            os.replace(temp, path)
+            written.append(path)
+            files[encoding] = (path, path.stat())
+
+        etags = {
+            encoding: f'"{digest}"' if encoding == "identity" else f'"{digest}-{encoding}"'
+            for encoding in files
+        }
+        return Snapshot(source, day, files, etags)
+
+
+def negotiate_encoding(accept_encoding: str, available: Dict[str, Any]) -> str:
+    """Best content coding in `available` the Accept-Encoding header allows."""
+    accepted: Dict[str, float] = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        match = re.search(r"q=([0-9.]+)", params)
+        try:
+            accepted[name.strip()] = float(match.group(1)) if match else 1.0
+        except ValueError:
+            accepted[name.strip()] = 0.0
+
+    wildcard = accepted.get("*", 0.0)
+    for encoding in SNAPSHOT_ENCODINGS:
+        if encoding == "identity" or encoding not in available:
+            continue
+        if accepted.get(encoding, wildcard) > 0:
+            return encoding
+    return "identity"
+
+
+def snapshot_listing(request: Request, audience: str) -> Optional[Response]:
+    """
+    The default listing served from its snapshot file, or None when
+    snapshots are off or not built yet (the caller renders it instead).
+
+    FileResponse handles Range requests and uses the server's pathsend
+    extension for zero-copy sends where available.
+    """
+    if SNAPSHOT_DIR is None:
+        return None
+    builder = current_org().snapshot_builder
+    builder.ensure_started()
+    snapshot = builder.get(audience)
+    if snapshot is None:
+        return None
+
+    encoding = negotiate_encoding(request.headers.get("accept-encoding", ""), snapshot.files)
+    path, stat = snapshot.files[encoding]
+    etag = snapshot.etags[encoding]
+    headers = {
+        "ETag": etag,
+        "Vary": "Accept-Encoding",
+        "Cache-Control": "no-cache" if audience == "public" else "private, no-cache",
+    }
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None and (etag in if_none_match or if_none_match.strip() == "*"):
+        return Response(status_code=304, headers=headers)
+    return FileResponse(path, headers=headers, media_type="application/json", stat_result=stat)
+
+
+# ============================================================================
+# TAG FACETS ENDPOINT
+# ============================================================================
+
+def load_tag_facets(
+    audience: str,
+    query: ListingQuery,
+    prefix: Optional[str]
+) -> List[Dict[str, Any]]:
+    """Count events per tag within a listing's filters. Runs on the DB executor."""
+    conn = get_db_connection()
+    require_table(conn, "event_tags")
+    conditions, params = build_listing_clause(conn, audience, query)
+
+    if prefix:
+        conditions.append("event_tags.tag >= ? AND event_tags.tag < ?")
+        params.extend([prefix, prefix + "\uffff"])
+
+    sql = f"""
+    SELECT event_tags.tag AS tag, COUNT(*) AS count
+    FROM event_tags JOIN events ON events.Id = event_tags.event_id
+    WHERE {" AND ".join(conditions)}
+    GROUP BY event_tags.tag
+    ORDER BY count DESC, tag ASC
+    """
+
+    cur = conn.cursor()
+    cur.execute(sql, params)
+    return fetch_dicts(cur, cur.fetchall())
+
+
+def group_facets(facets: List[Dict[str, Any]]) -> Dict[str, List[str]]:
+    """Tags by prefix ('committee', 'time', ...; 'other' for plain tags), in count order."""
+    groups: Dict[str, List[str]] = {}
+    for facet in facets:
+        prefix, sep, _ = facet["tag"].partition(":")
+        groups.setdefault(prefix if sep else "other", []).append(facet["tag"])
+    return groups
+
+
+@app.get("/api/calendar/tags")
+async def get_tag_facets(
+    audience: str = Query("public", pattern="^(public|member)$"),
+    start: Optional[date] = Query(None, description="First day to include (default as listings)"),
+    end: Optional[date] = Query(None, description="Last day to include"),
+    tags: Optional[str] = Query(None, description="Only count events having all these tags"),
+    any_tags: Optional[str] = Query(None, alias="anyTags", description="Only count events having one"),
+    prefix: Optional[str] = Query(None, max_length=50, description="e.g. committee:")
+) -> FastJSONResponse:
+    """
+    Return tag counts for the events a listing with the same filters would show.
+
+    Counts are computed over the whole window, not a single page.
+    """
+    logger.info(f"Fetching tag facets for {audience} (prefix={prefix})")
+    if start is None:
+        start = utc_today() if audience == "public" else utc_today() - timedelta(days=7)
+    query = ListingQuery(start, end, 0, None, parse_tags(tags), parse_tags(any_tags))
+    prefix = prefix.lower() if prefix else None
+
+    facets = await cached_query(
+        ("tags", audience, query, prefix), load_tag_facets, audience, query, prefix
+    )
+
+    return FastJSONResponse({
+        "tags": facets,
+        "groups": group_facets(facets),
+        "count": len(facets),
+        "audience": audience,
+        "timestamp": datetime.now(timezone.utc).isoformat()
+    })
+
+
+# ============================================================================
+# SEARCH ENDPOINT
+# ============================================================================
+
+def build_match_query(q: str) -> str:
+    """
+    Turn free text into a safe FTS5 MATCH expression.
+
+    Each word becomes a quoted prefix term and all terms must match, so
+    user input can never inject FTS5 operators or column filters.
+    """
+    terms = re.findall(r"\w+", q)
+    if not terms:
+        raise HTTPException(status_code=400, detail="Query has no searchable terms")
+    return " ".join(f'"{term}"*' for term in terms)
+
+
+def load_search_results(
+    audience: str,
+    match: str,
+    start: Optional[date],
+    end: Optional[date],
+    limit: int,
+    offset: int
+) -> Tuple[List[Dict[str, Any]], bool]:
+    """Query one page of ranked search hits. Runs on the DB executor."""
+    conn = get_db_connection()
+    require_table(conn, "events_fts")
+    cur = conn.cursor()
+
+    conditions: List[str] = []
+    params: List[Any] = [match]
+    if start is not None or end is not None:
+        conditions, window_params = build_window_clause(start or date.min, end, None)
+        params.extend(window_params)
+
+    if audience == "public":
+        select_sql = PUBLIC_SELECT_SQL
+        access = public_access_condition(cur)
+        if access:
+            conditions.append(access)
+    else:
+        select_sql = MEMBER_SELECT_SQL
+    where_clause = ("WHERE " + " AND ".join(conditions)) if conditions else ""
+
+    weights = ", ".join(str(w) for w in SEARCH_WEIGHTS)
+    sql = f"""
+    WITH hits AS (
+        SELECT rowid AS HitId, bm25(events_fts, {weights}) AS Score
+        FROM events_fts
+        WHERE events_fts MATCH ?
+    )
+    SELECT {select_sql}
+    FROM hits JOIN events ON events.Id = hits.HitId
+    {where_clause}
+    ORDER BY Score ASC, StartDate ASC, Id ASC
+    LIMIT ? OFFSET ?
+    """
+
+    cur.execute(sql, params + [limit + 1, offset])
+    rows = cur.fetchall()
+    allowed = PUBLIC_LISTING_COLUMNS if audience == "public" else None
+    return fetch_dicts(cur, rows[:limit], allowed), len(rows) > limit
+
+
+@app.get("/api/calendar/search")
+async def search_events(
+    q: str = Query(..., min_length=1, max_length=200),
+    audience: str = Query("public", pattern="^(public|member)$"),
+    start: Optional[date] = Query(None, description="First day to include (public default: today)"),
+    end: Optional[date] = Query(None, description="Last day to include"),
+    limit: int = Query(SEARCH_PAGE_LIMIT, ge=1, le=MAX_PAGE_LIMIT),
+    offset: int = Query(0, ge=0)
+) -> FastJSONResponse:
+    """
+    Full-text search over event name, details and tags, best match first.
+
+    Public results use the public listing projection (no location, counts
+    or contact info) and default to upcoming events. Member results use
+    the member projection and search all history.
+    """
+    logger.info(f"Searching events for {audience} (q={q!r}, offset={offset})")
+    match = build_match_query(q)
+    if audience == "public" and start is None:
+        start = utc_today()
+
+    results, has_more = await cached_query(
+        ("search", audience, match, start, end, limit, offset),
+        load_search_results, audience, match, start, end, limit, offset
+    )
+
+    return FastJSONResponse({
+        "events": results,
+        "count": len(results),
+        "query": q,
+        "offset": offset,
+        "nextOffset": offset + len(results) if has_more else None,
+        "hasMore": has_more,
+        "audience": audience,
+        "timestamp": datetime.now(timezone.utc).isoformat()
+    })
+
+
+# ============================================================================
+# EVENT DETAIL ENDPOINT
+# ============================================================================
+
+def load_events_by_id(audience: str, event_ids: Tuple[int, ...]) -> List[Dict[str, Any]]:
+    """
+    Query several events in one IN (...) query. Runs on the DB executor.
+
+    Only the columns the audience may see are selected, so contact PII
+    never leaves the database.
+    """
+    select_sql = PUBLIC_DETAIL_SQL if audience == "public" else MEMBER_DETAIL_SQL
+    marks = ",".join("?" * len(event_ids))
+    cur = get_db_connection().cursor()
+    cur.execute(f"SELECT {select_sql} FROM events WHERE Id IN ({marks})", event_ids)
+    allowed = PUBLIC_DETAIL_COLUMNS if audience == "public" else None
+    return [project_event(e, audience) for e in fetch_dicts(cur, cur.fetchall(), allowed)]
+
+
+def project_event(event: Dict[str, Any], audience: str) -> Dict[str, Any]:
+    """Shape a detail row for an audience (adds member availability fields)."""
+    if audience == "public":
+        return event
+
+    limit = event.get("RegistrationsLimit") or 0
+    confirmed = event.get("ConfirmedRegistrationsCount") or 0
+    return {
+        **event,
+        "RegistrationsLimit": limit,
+        "ConfirmedRegistrationsCount": confirmed,
+        "SpotsAvailable": max(0, limit - confirmed) if limit else None,
+        "IsFull": confirmed >= limit if limit else False
+    }
+
+
+def cacheable_response(
+    request: Request,
+    payload: Dict[str, Any],
+    audience: str,
+    etag: str
+) -> Response:
+    """
+    Return payload with validators for browser and proxy caching.
+
+    Member responses are marked private so shared caches never keep them.
+    """
+    headers = cache_headers(audience, etag, DETAIL_MAX_AGE)
+    if is_not_modified(request, etag):
+        return Response(status_code=304, headers=headers)
+    return FastJSONResponse(payload, headers=headers)
+
+
+@app.get("/api/calendar/event/{event_id}")
+async def get_event_detail(
+    request: Request,
+    event_id: int,
+    audience: str = Query("public", pattern="^(public|member)$")
+) -> Response:
+    """
+    Get event details. Filters fields based on audience.
+    """
+    logger.info(f"Fetching event {event_id} for {audience}")
+    etag = await current_etag("detail", audience, (event_id,))
+    events = await cached_query(
+        ("detail", audience, (event_id,)), load_events_by_id, audience, (event_id,)
+    )
+
+    if not events:
+        raise HTTPException(status_code=404, detail="Event not found")
+
+    return cacheable_response(request, {
+        "event": events[0],
+        "audience": audience,
+        "timestamp": datetime.now(timezone.utc).isoformat()
+    }, audience, etag)
+
+
+@app.get("/api/calendar/events/batch")
+async def get_event_details_batch(
+    request: Request,
+    ids: str = Query(..., description="Comma-separated event ids"),
+    audience: str = Query("public", pattern="^(public|member)$")
+) -> Response:
+    """
+    Get details for up to BATCH_MAX_IDS events in one request.
+
+    Same audience filtering as get_event_detail. Results are keyed by id;
+    ids that do not exist are listed under "missing".
+    """
+    try:
+        event_ids = tuple(sorted({int(i) for i in ids.split(",") if i.strip()}))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids must be comma-separated integers")
+    if not event_ids:
+        raise HTTPException(status_code=400, detail="No event ids given")
+    if len(event_ids) > BATCH_MAX_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_MAX_IDS} ids per request")
+
+    logger.info(f"Fetching {len(event_ids)} events for {audience}")
+    etag = await current_etag("detail", audience, event_ids)
+    events = await cached_query(
+        ("detail", audience, event_ids), load_events_by_id, audience, event_ids
+    )
+
+    by_id = {str(e["Id"]): e for e in events}
+    return cacheable_response(request, {
+        "events": by_id,
+        "count": len(by_id),
+        "missing": [i for i in event_ids if str(i) not in by_id],
+        "audience": audience,
+        "timestamp": datetime.now(timezone.utc).isoformat()
+    }, audience, etag)
+
+
+# ============================================================================
+# ICS SUBSCRIPTION FEEDS
+# ============================================================================
+
+def ics_offset(offset: timedelta) -> str:
+    """UTC offset as +HHMM/-HHMM."""
+    minutes = int(offset.total_seconds()) // 60
+    sign = "-" if minutes < 0 else "+"
+    return f"{sign}{abs(minutes) // 60:02d}{abs(minutes) % 60:02d}"
+
+
+@lru_cache(maxsize=None)
+def vtimezone_lines(tz_name: str, year: int) -> Tuple[str, ...]:
+    """
+    VTIMEZONE for tz_name, with yearly rules taken from its transitions in
+    `year` (the ICS feed passes the year its events start in, so a zone
+    whose rules have since changed is described as it is for the feed).
+    Zones without daylight time get a single STANDARD block.
+    """
+    tz = ZoneInfo(tz_name)
+    transitions = []
+    moment = datetime(year, 1, 1, tzinfo=timezone.utc)
+    offset = moment.astimezone(tz).utcoffset()
+    while moment.year == year:
+        step = moment + timedelta(hours=1)
+        after = step.astimezone(tz)
+        if after.utcoffset() != offset:
+            # Wall-clock time of the change, read on the clock before it
+            local = after.replace(tzinfo=None) - (after.utcoffset() - offset)
+            transitions.append((local, offset, after))
+            offset = after.utcoffset()
+        moment = step
+
+    lines = ["BEGIN:VTIMEZONE", f"TZID:{tz_name}", f"X-LIC-LOCATION:{tz_name}"]
+    if not transitions:
+        name = datetime(year, 1, 1, tzinfo=tz).tzname()
+        return tuple(lines + [
+            "BEGIN:STANDARD",
+            f"TZOFFSETFROM:{ics_offset(offset)}",
+            f"TZOFFSETTO:{ics_offset(offset)}",
+            f"TZNAME:{name}",
+            "DTSTART:19700101T000000",
+            "END:STANDARD",
+            "END:VTIMEZONE",
+        ])
+
+    weekdays = ("MO", "TU", "WE", "TH", "FR", "SA", "SU")
+    for local, before, after in transitions:
+        last_week = (local + timedelta(days=7)).month != local.month
+        nth = -1 if last_week else (local.day - 1) // 7 + 1
+        # Same rule in 1970, the conventional DTSTART year
+        first = date(1970, local.month, 1)
+        day = first + timedelta(days=(local.weekday() - first.weekday()) % 7)
+        if nth == -1:
+            while (day + timedelta(days=7)).month == local.month:
+                day += timedelta(days=7)
+        else:
+            day += timedelta(days=7 * (nth - 1))
+        kind = "DAYLIGHT" if after.dst() else "STANDARD"
+        lines += [
+            f"BEGIN:{kind}",
+            f"TZOFFSETFROM:{ics_offset(before)}",
+            f"TZOFFSETTO:{ics_offset(after.utcoffset())}",
+            f"TZNAME:{after.tzname()}",
+            f"DTSTART:{day.strftime('%Y%m%d')}T{local.strftime('%H%M%S')}",
+            f"RRULE:FREQ=YEARLY;BYMONTH={local.month};BYDAY={nth}{weekdays[local.weekday()]}",
+            f"END:{kind}",
+        ]
+    return tuple(lines + ["END:VTIMEZONE"])
+
+
+def ics_escape(text: Any) -> str:
+    """Escape a TEXT value (RFC 5545 section 3.3.11)."""
+    text = str(text or "")
+    text = text.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,")
+    return text.replace("\r\n", "\\n").replace("\n", "\\n").replace("\r", "\\n")
+
+
+def ics_fold(line: str) -> str:
+    """Fold a content line at 75 octets without splitting UTF-8 characters."""
+    out = []
+    current = ""
+    size = 0
+    for ch in line:
+        width = len(ch.encode("utf-8"))
+        if size + width > 75:
+            out.append(current)
+            current = " "
+            size = 1
+        current += ch
+        size += width
+    out.append(current)
+    return "\r\n".join(out) + "\r\n"
+
+
+def ics_local_time(value: Optional[str], tz_name: str = ICS_TIMEZONE) -> Optional[str]:
+    """
+    Format a StartDate/EndDate as local tz_name time (YYYYMMDDTHHMMSS).
+
+    Offset-aware values are converted; naive values are already local.
+    """
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(ZoneInfo(tz_name))
+    return parsed.strftime("%Y%m%dT%H%M%S")
+
+
+def render_vevent(
+    event: Dict[str, Any],
+    audience: str,
+    uid_domain: str = ICS_UID_DOMAIN,
+    event_url: str = EVENT_URL_TEMPLATE,
+    tz_name: str = ICS_TIMEZONE
+) -> str:
+    """Render one listing row as a VEVENT. Public rows carry no location."""
+    start = ics_local_time(event.get("StartDate"), tz_name)
+    if start is None:
+        return ""
+    end = ics_local_time(event.get("EndDate"), tz_name)
+
+    if audience == "public":
+        description = event.get("BriefDescription")
+    else:
+        description = event.get("Details")
+
+    lines = [
+        "BEGIN:VEVENT",
+        f"UID:{event['Id']}@{uid_domain}",
+        f"DTSTAMP:{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')}",
+        f"DTSTART;TZID={tz_name}:{start}",
+    ]
+    if end:
+        lines.append(f"DTEND;TZID={tz_name}:{end}")
+    lines.append(f"SUMMARY:{ics_escape(event.get('Name'))}")
+    if description:
+        lines.append(f"DESCRIPTION:{ics_escape(description)}")
+    if audience == "member" and event.get("Location"):
+        lines.append(f"LOCATION:{ics_escape(event['Location'])}")
+    if event.get("Tags"):
+        categories = [t.strip() for t in event["Tags"].split(",") if t.strip()]
+        lines.append("CATEGORIES:" + ",".join(ics_escape(t) for t in categories))
+    lines.extend([
+        f"URL:{event_url.format(id=event['Id'])}",
+        "STATUS:CONFIRMED",
+        "TRANSP:OPAQUE",
+        "END:VEVENT",
+    ])
+    return "".join(ics_fold(line) for line in lines)
+
+
+class VEventCache:
+    """
+    Rendered VEVENT text per (audience, event id).
+
+    An entry is reused while the event's row is unchanged; any change to
+    the row re-renders just that event. One cache per org, rendering with
+    that org's UID domain, event URLs and timezone.
+    """
+
+    def __init__(self, max_entries: int, uid_domain: str = ICS_UID_DOMAIN,
+                 event_url: str = EVENT_URL_TEMPLATE, tz_name: str = ICS_TIMEZONE):
+        self.max_entries = max_entries
+        self.uid_domain = uid_domain
+        self.event_url = event_url
+        self.timezone = tz_name
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Tuple[str, Any], Tuple[Tuple[Any, ...], str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def render(self, event: Dict[str, Any], audience: str) -> str:
+        key = (audience, event["Id"])
+        fingerprint = tuple(event.items())
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None and cached[0] == fingerprint:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return cached[1]
+            self.misses += 1
+
+        text = render_vevent(event, audience, self.uid_domain, self.event_url, self.timezone)
+
+        with self._lock:
+            self._entries[key] = (fingerprint, text)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return text
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+vevent_cache = VEventCache(ICS_CACHE_SIZE)
+
+
+def ics_header(calendar_name: str, tz_name: str, year: int) -> str:
+    lines = [
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        "PRODID:-//ClubCalendar//SBNC Events//EN",
+        "CALSCALE:GREGORIAN",
+        "METHOD:PUBLISH",
+        f"X-WR-CALNAME:{ics_escape(calendar_name)}",
+        f"X-WR-TIMEZONE:{tz_name}",
+    ] + list(vtimezone_lines(tz_name, year))
+    return "".join(ics_fold(line) for line in lines)
+
+
+@app.get("/api/calendar/feed.ics")
+async def get_ics_feed(
+    request: Request,
+    audience: str = Query("public", pattern="^(public|member)$"),
+    tag: Optional[str] = Query(None, description="Comma-separated tags; events need one"),
+    committee: Optional[str] = Query(None, description="Committee slug(s), e.g. hikers")
+) -> Response:
+    """
+    Subscribable RFC 5545 feed of events from ICS_PAST_DAYS ago onward.
+
+    Narrow with tag= or committee= (committee=hikers means tag
+    committee:hikers). Public feeds use the public projection, so they
+    carry no location or registration data. The body is streamed a page
+    at a time from cached VEVENTs. Send If-None-Match/If-Modified-Since
+    to get 304 while nothing has changed.
+    """
+    any_tags = parse_tags(tag) + tuple(f"committee:{c}" for c in parse_tags(committee))
+    any_tags = tuple(sorted(set(any_tags)))
+    if len(any_tags) > MAX_TAG_FILTERS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_TAG_FILTERS} tags per filter")
+    logger.info(f"Serving ICS feed for {audience} (tags={any_tags})")
+
+    org = current_org()
+    etag = await current_etag("ics", audience, any_tags, org.timezone)
+    headers = cache_headers(audience, etag, ICS_MAX_AGE)
+    if is_not_modified(request, etag):
+        return Response(status_code=304, headers=headers)
+
+    start = utc_today() - timedelta(days=ICS_PAST_DAYS)
+    query = ListingQuery(start, None, ICS_PAGE_SIZE, None, (), any_tags)
+    # Fetch the first page up front so DB errors still become status codes
+    events, next_cursor = await fetch_events_page(audience, query)
+
+    calendar_name = org.calendar_name
+    if any_tags:
+        calendar_name += " - " + ", ".join(any_tags)
+
+    async def body() -> AsyncIterator[str]:
+        page, cursor = events, next_cursor
+        yield ics_header(calendar_name, org.timezone, start.year)
+        while True:
+            yield "".join(org.vevent_cache.render(e, audience) for e in page)
+            if cursor is None:
+                break
+            page, cursor = await fetch_events_page(
+                audience, ListingQuery(start, None, ICS_PAGE_SIZE, cursor, (), any_tags)
+            )
+        yield "END:VCALENDAR\r\n"
+
+    headers["Content-Disposition"] = 'inline; filename="clubcalendar.ics"'
+    return StreamingResponse(
+        body(), media_type="text/calendar; charset=utf-8", headers=headers
+    )
+
+
+# ============================================================================
+# LIVE CHANGE FEED (SSE + LONG-POLL)
+# ============================================================================
+
+# Fields each audience sees in change events; counts are member-only
+PUBLIC_CHANGE_FIELDS = ("Id", "Name", "StartDate", "EndDate")
+MEMBER_CHANGE_FIELDS = PUBLIC_CHANGE_FIELDS + (
+    "RegistrationsLimit", "ConfirmedRegistrationsCount", "SpotsAvailable", "IsFull"
+)
+
+
+def load_change_snapshot() -> Dict[str, Dict[int, Dict[str, Any]]]:
+    """
+    Compact state of current events per audience. Runs on the watcher thread.
+
+    Covers the member listing's default window (from 7 days ago).
+    """
+    conn = get_db_connection()
+    access = public_access_condition(conn.cursor())
+    cur = conn.cursor()
+    cur.execute(f"""
+        SELECT Id, Name, StartDate, EndDate,
+               RegistrationsLimit, ConfirmedRegistrationsCount,
+               {f"CASE WHEN {access} THEN 1 ELSE 0 END" if access else "1"} AS IsPublic
+        FROM events
+        WHERE StartDate >= ?
+    """, ((utc_today() - timedelta(days=7)).isoformat(),))
+
+    member: Dict[int, Dict[str, Any]] = {}
+    public: Dict[int, Dict[str, Any]] = {}
+    for event_id, name, start, end, limit, confirmed, is_public in cur.fetchall():
+        full = bool(limit and limit > 0 and (confirmed or 0) >= limit)
+        spots = limit - (confirmed or 0) if limit and limit > 0 else None
+        member[event_id] = {
+            "Id": event_id, "Name": name, "StartDate": start, "EndDate": end,
+            "RegistrationsLimit": limit, "ConfirmedRegistrationsCount": confirmed,
+            "SpotsAvailable": spots, "IsFull": full,
+        }
+        if is_public:
+            public[event_id] = {f: member[event_id][f] for f in PUBLIC_CHANGE_FIELDS}
+    return {"public": public, "member": member}
+
+
+def diff_snapshots(
+    old: Dict[int, Dict[str, Any]],
+    new: Dict[int, Dict[str, Any]]
+) -> Dict[str, Any]:
+    """Compact diff: added events in full, removed ids, changed fields only."""
+    added = [new[i] for i in new.keys() - old.keys()]
+    removed = sorted(old.keys() - new.keys())
+    changed = []
+    for event_id in new.keys() & old.keys():
+        fields = {k: v for k, v in new[event_id].items() if old[event_id].get(k) != v}
+        if fields:
+            changed.append({"Id": event_id, **fields})
+    added.sort(key=lambda e: e["Id"])
+    changed.sort(key=lambda e: e["Id"])
+    return {"added": added, "removed": removed, "changed": changed}
+
+
+class ChangeWatcher:
+    """
+    One watcher per process that turns wa.db changes into versioned diffs.
+
+    A daemon thread checks data_stamp() every CHANGE_POLL_SECONDS and, when
+    it moves, snapshots the events and records a diff per audience. SSE
+    and long-poll clients on any event loop wait on it and are woken
+    through call_soon_threadsafe, so clients never hit the DB themselves.
+
+    Versions and history belong to this process. A `since` this watcher
+    never issued (from another worker, or from before a restart) gets a
+    reset, so change feeds are exact only with a single worker or sticky
+    routing. Each org has its own watcher; its thread reads that org's
+    database.
+    """
+
+    def __init__(self, history: int, org: Optional["OrgContext"] = None):
+        self.org = org
+        self.version = 0
+        # History holds every diff after _floor; older clients must reset
+        self._floor = 0
+        self._history: "deque[Tuple[int, Dict[str, Dict[str, Any]]]]" = deque(maxlen=history)
+        self._snapshot: Optional[Dict[str, Dict[int, Dict[str, Any]]]] = None
+        self._stamp: Optional[Tuple[Any, ...]] = None
+        self._waiters: set = set()
+        self._lock = threading.Lock()
+        self._check_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def ensure_started(self) -> None:
+        """Start the watcher thread on first use."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            name = "clubcal-change-watcher" + (f"-{self.org.org_id}" if self.org else "")
+            self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+            self._thread.start()
+
+    def stop(self, wait: bool = True) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            if wait:
+                self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run(self) -> None:
+        if self.org is not None:
+            _current_org.set(self.org)
+        while not self._stop.is_set():
+            try:
+                self.check_now()
+            except Exception as e:
+                logger.warning(f"Change watcher check failed: {e}")
+            self._stop.wait(CHANGE_POLL_SECONDS)
+
+    def check_now(self) -> bool:
+        """Snapshot and diff if wa.db changed. Returns True if a version was added."""
+        with self._check_lock:
+            stamp = data_stamp()
+            if stamp == self._stamp:
+                return False
+            snapshot = load_change_snapshot()
+            previous, previous_stamp = self._snapshot, self._stamp
+            self._snapshot, self._stamp = snapshot, stamp
+
+            # First look at a database (or a different file): new baseline
+            if previous is None or previous_stamp[0] != stamp[0]:
+                self._record(None)
+                return True
+
+            diffs = {
+                audience: diff_snapshots(previous[audience], snapshot[audience])
+                for audience in ("public", "member")
+            }
+            if not any(any(d.values()) for d in diffs.values()):
+                return False
+            self._record(diffs)
+            return True
+
+    def _record(self, diffs: Optional[Dict[str, Dict[str, Any]]]) -> None:
+        with self._lock:
+            self.version = max(self.version + 1, int(time.time() * 1000))
+            if diffs is None:
+                self._history.clear()
+                self._floor = self.version
+            else:
+                if len(self._history) == self._history.maxlen:
+                    self._floor = self._history[0][0]
+                self._history.append((self.version, diffs))
+            waiters, self._waiters = self._waiters, set()
+        for loop, event in waiters:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                pass  # subscriber's loop already closed
+
+    def changes_since(self, since: int, audience: str) -> Tuple[int, List[Dict[str, Any]], bool]:
+        """
+        Return (version, diffs newer than since, reset).
+
+        reset is True when since is not a version this watcher can diff
+        from (older than the kept history, or issued by another process);
+        the client should refetch the listing instead of applying diffs.
+        """
+        with self._lock:
+            version = self.version
+            if since == version:
+                return version, [], False
+            if since != self._floor and all(v != since for v, _ in self._history):
+                return version, [], since != 0
+            changes = []
+            for entry_version, diffs in self._history:
+                diff = diffs[audience]
+                if entry_version > since and any(diff.values()):
+                    changes.append({"version": entry_version, **diff})
+            return version, changes, False
+
+    async def wait(self, since: int, timeout: float) -> None:
+        """Wait until a version newer than since exists, or timeout."""
+        loop = asyncio.get_running_loop()
+        event = asyncio.Event()
+        waiter = (loop, event)
+        with self._lock:
+            if self.version != since:
+                return
+            self._waiters.add(waiter)
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            with self._lock:
+                self._waiters.discard(waiter)
+
+
+change_watcher = ChangeWatcher(CHANGE_HISTORY)
+
+
+async def start_change_watcher() -> None:
+    """
+    Start the watcher and catch it up before answering a client.
+
+    The check is a stat() unless wa.db changed since the last poll.
+    """
+    watcher = current_org().change_watcher
+    watcher.ensure_started()
+    await run_db(watcher.check_now)
+
+
+@app.get("/api/calendar/changes/poll")
+async def poll_changes(
+    audience: str = Query("public", pattern="^(public|member)$"),
+    since: int = Query(0, ge=0, description="version from the previous response"),
+    timeout: float = Query(LONG_POLL_TIMEOUT, ge=0, le=60)
+) -> FastJSONResponse:
+    """
+    Long-poll fallback for /api/calendar/changes.
+
+    Returns at once if there are changes after `since`, otherwise waits up
+    to `timeout` seconds. since=0 just returns the current version.
+    """
+    await start_change_watcher()
+    watcher = current_org().change_watcher
+    version, changes, reset = watcher.changes_since(since, audience)
+    if not changes and not reset and since != 0:
+        await watcher.wait(max(since, version), timeout)
+        version, changes, reset = watcher.changes_since(since, audience)
+
+    return FastJSONResponse({
+        "version": version,
+        "changes": changes,
+        "reset": reset,
+        "audience": audience,
+        "timestamp": datetime.now(timezone.utc).isoformat()
+    })
+
+
+def sse_message(event: str, data: Dict[str, Any], event_id: Optional[int] = None) -> str:
+    body = json.dumps(data, separators=(",", ":"))
+    prefix = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{prefix}event: {event}\ndata: {body}\n\n"
+
+
+async def change_event_stream(
+    request: Optional[Request],
+    audience: str,
+    since: int
+) -> AsyncIterator[str]:
+    """
+    SSE body: a 'version' event, then one 'change' event per new diff.
+
+    A 'reset' event tells the client to refetch the listing. Comment lines
+    keep idle connections open through proxies.
+    """
+    watcher = current_org().change_watcher
+    version, changes, reset = watcher.changes_since(since, audience)
+    if reset:
+        yield sse_message("reset", {"version": version}, version)
+    yield sse_message("version", {"version": version}, version)
+    for change in changes:
+        yield sse_message("change", change, change["version"])
+    cursor = version
+
+    while request is None or not await request.is_disconnected():
+        await watcher.wait(cursor, SSE_KEEPALIVE_SECONDS)
+        version, changes, reset = watcher.changes_since(cursor, audience)
+        if reset:
+            yield sse_message("reset", {"version": version}, version)
+        for change in changes:
+            yield sse_message("change", change, change["version"])
+        if version == cursor:
+            yield ": keepalive\n\n"
+        cursor = version
+
+
+@app.get("/api/calendar/changes")
+async def stream_changes(
+    request: Request,
+    audience: str = Query("public", pattern="^(public|member)$"),
+    since: Optional[int] = Query(None, ge=0, description="resume after this version")
+) -> StreamingResponse:
+    """
+    Server-sent events of added, removed and changed events.
+
+    Member streams include registration counts and availability; public
+    streams cover public events with schedule fields only. Browsers resume
+    automatically via the Last-Event-ID header.
+    """
+    if since is None:
+        last_event_id = request.headers.get("last-event-id", "")
+        since = int(last_event_id) if last_event_id.isdigit() else 0
+    logger.info(f"Opening change stream for {audience} (since={since})")
+
+    await start_change_watcher()
+    return StreamingResponse(
+        change_event_stream(request, audience, since),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+# ============================================================================
+# ORGS (MULTI-CLUB SERVING)
+# ============================================================================
+
+# Widget configuration served to the default org (this server's own club)
+DEFAULT_WIDGET_CONFIG: Dict[str, Any] = {
+    "organization": {
+        "waAccountId": "176353",
+        "name": "Santa Barbara Newcomers Club"
+    },
+    "server": {
+        "eventsUrl": "https://mail.sbnewcomers.org/api/calendar/events",
+        "memberEventsUrl": "https://mail.sbnewcomers.org/api/calendar/events/member",
+        "eventDetailUrl": "https://mail.sbnewcomers.org/api/calendar/event"
+    },
+    "publicConfig": {
+        "headerTitle": "SBNC Public Events",
+        "showMyEvents": False,
+        "sidePanel": True,
+        "showLocation": False,
+        "showAvailability": False
+    },
+    "memberConfig": {
+        "headerTitle": "Club Events",
+        "showMyEvents": True,
+        "sidePanel": False,
+        "showLocation": True,
+        "showAvailability": True
+    },
+    "autoTagRules": [
+        {"type": "name-prefix", "pattern": "Games!:", "tag": "committee:games"},
+        {"type": "name-prefix", "pattern": "Wellness:", "tag": "committee:wellness"},
+        {"type": "name-prefix", "pattern": "Happy Hikers:", "tag": "committee:hikers"},
+        {"type": "name-prefix", "pattern": "Wine Appreciation:", "tag": "committee:wine"},
+        {"type": "name-prefix", "pattern": "Garden:", "tag": "committee:garden"},
+        {"type": "name-prefix", "pattern": "TGIF:", "tag": "committee:tgif"},
+        {"type": "name-prefix", "pattern": "Epicurious:", "tag": "committee:epicurious"}
+    ]
+}
+
+ORG_PATH = re.compile(r"^/orgs/(?P<org>[a-z0-9][a-z0-9_-]{0,63})(?=/|$)")
+
+_current_org: "contextvars.ContextVar[Optional[OrgContext]]" = contextvars.ContextVar(
+    "clubcal_org", default=None
+)
+
+
+def current_org() -> "OrgContext":
+    """The org the current request (or watcher thread) is serving."""
+    return _current_org.get() or default_org
+
+
+def cors_middleware(app: Any, origins: List[str]) -> CORSMiddleware:
+    """CORS policy for widget pages: GET only, from the given origins."""
+    return CORSMiddleware(
+        app,
+        allow_origins=origins,
+        allow_credentials=True,
+        allow_methods=["GET"],
+        allow_headers=["*"],
+    )
+
+
+class OrgContext:
+    """
+    Everything the API keeps for one org.
+
+    An org with a config_path is read from ORGS_DIR/<org>/config.json: the
+    file is the widget config served by /api/calendar/config, and its
+    optional "api" block sets databasePath (relative to the org directory,
+    default wa.db), allowedOrigins, calendarName and timezone (IANA name
+    for the day index and ICS feed). The default org (config_path None)
+    uses DB_PATH, ALLOWED_ORIGINS, ICS_TIMEZONE and the SBNC config.
+    """
+
+    def __init__(self, org_id: str, config_path: Optional[Path] = None,
+                 query_cache: Optional["QueryCache"] = None,
+                 vevent_cache: Optional[VEventCache] = None,
+                 change_watcher: Optional[ChangeWatcher] = None):
+        self.org_id = org_id
+        self.config_path = config_path
+        self.config: Dict[str, Any] = {}
+        self.query_cache = query_cache or QueryCache(QUERY_CACHE_SIZE)
+        self.vevent_cache = vevent_cache or VEventCache(ICS_CACHE_SIZE)
+        self.change_watcher = change_watcher or ChangeWatcher(CHANGE_HISTORY, self)
+        self.snapshot_builder = SnapshotBuilder(self)
+        self.last_used = time.monotonic()
+        self.active = 0
+        self._config_mtime: Optional[int] = None
+        self._config_checked = 0.0
+        self._cors: Optional[Tuple[Tuple[str, ...], CORSMiddleware]] = None
+
+    @property
+    def api_config(self) -> Dict[str, Any]:
+        return self.config.get("api") or {}
+
+    @property
+    def domain(self) -> Optional[str]:
+        return (self.config.get("organization") or {}).get("domain")
+
+    @property
+    def db_path(self) -> Path:
+        if self.config_path is None:
+            return DB_PATH
+        return self.config_path.parent / self.api_config.get("databasePath", "wa.db")
+
+    @property
+    def allowed_origins(self) -> List[str]:
+        if self.config_path is None:
+            return ALLOWED_ORIGINS
+        if "allowedOrigins" in self.api_config:
+            return list(self.api_config["allowedOrigins"])
+        if self.domain:
+            return [f"https://{self.domain}", f"https://www.{self.domain}"]
+        return []
+
+    @property
+    def calendar_name(self) -> str:
+        if self.config_path is None:
+            return ICS_CALENDAR_NAME
+        organization = self.config.get("organization") or {}
+        return self.api_config.get("calendarName") or organization.get("name") or self.org_id
+
+    @property
+    def timezone(self) -> str:
+        if self.config_path is None:
+            return ICS_TIMEZONE
+        return self.api_config.get("timezone") or ICS_TIMEZONE
+
+    @property
+    def widget_config(self) -> Dict[str, Any]:
+        if self.config_path is None:
+            return DEFAULT_WIDGET_CONFIG
+        return {k: v for k, v in self.config.items() if k != "api"}
+
+    def refresh_config(self) -> bool:
+        """
+        Reload config.json if it changed, checking at most every
+        ORG_CONFIG_CHECK_SECONDS. Returns False once the file is gone or
+        was never readable; a bad edit keeps the previous config.
+        """
+        if self.config_path is None:
+            return True
+        now = time.monotonic()
+        if self._config_mtime is not None and now - self._config_checked < ORG_CONFIG_CHECK_SECONDS:
+            return True
+        self._config_checked = now
+
+        try:
+            mtime = self.config_path.stat().st_mtime_ns
+            if mtime == self._config_mtime:
+                return True
+            config = json.loads(self.config_path.read_text())
+            if not isinstance(config, dict):
+                raise ValueError("config must be a JSON object")
+            tz_name = (config.get("api") or {}).get("timezone")
+            if tz_name:
+                ZoneInfo(tz_name)
+        except FileNotFoundError:
+            return False
+        except (OSError, ValueError, ZoneInfoNotFoundError) as e:
+            logger.warning(f"Config for org {self.org_id} not loaded: {e}")
+            return self._config_mtime is not None
+
+        first_load = self._config_mtime is None
+        previous_timezone = self.timezone
+        self.config, self._config_mtime = config, mtime
+        if self.domain:
+            self.vevent_cache.uid_domain = self.domain
+            self.vevent_cache.event_url = f"https://{self.domain}/event-{{id}}"
+        self.vevent_cache.timezone = self.timezone
+        self.vevent_cache.clear()
+        if self.timezone != previous_timezone:
+            # Cached listings carry day indexes in the old timezone
+            self.query_cache.clear()
+        if not first_load:
+            # databasePath may have moved; let DB threads drop stale handles
+            org_registry.generation += 1
+        logger.info(f"{'Loaded' if first_load else 'Reloaded'} config for org {self.org_id}")
+        return True
+
+    def cors(self, app: Any) -> CORSMiddleware:
+        """CORSMiddleware around app for this org's origins, rebuilt when they change."""
+        origins = tuple(self.allowed_origins)
+        if self._cors is None or self._cors[0] != origins:
+            self._cors = (origins, cors_middleware(app, list(origins)))
+        return self._cors[1]
+
+    def close(self) -> None:
+        """Stop the watcher and drop caches; DB threads close handles lazily."""
+        self.change_watcher.stop(wait=False)
+        self.snapshot_builder.stop(wait=False)
+        self.query_cache.clear()
+        self.vevent_cache.clear()
+
+
+class OrgRegistry:
+    """
+    Open orgs, least recently used first.
+
+    At most ORG_MAX_OPEN orgs are kept open; orgs with no request in flight
+    for ORG_IDLE_SECONDS are closed on a later lookup. Closing bumps
+    `generation` so DB threads release that org's connections.
+    """
+
+    def __init__(self):
+        self.generation = 0
+        self._open: "OrderedDict[str, OrgContext]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, org_id: str) -> Optional[OrgContext]:
+        """The org's context, opened on first use; None if it has no config."""
+        if org_id == DEFAULT_ORG:
+            return None
+        with self._lock:
+            org = self._open.get(org_id)
+            if org is not None:
+                self._open.move_to_end(org_id)
+
+        closed: List[OrgContext] = []
+        if org is None:
+            org = OrgContext(org_id, ORGS_DIR / org_id / "config.json")
+            if not org.refresh_config():
+                return None
+            with self._lock:
+                self._open[org_id] = org
+                while len(self._open) > ORG_MAX_OPEN:
+                    closed.append(self._pop_lru())
+        elif not org.refresh_config():
+            with self._lock:
+                self._open.pop(org_id, None)
+            closed.append(org)
+            org = None
+
+        now = time.monotonic()
+        if org is not None:
+            org.last_used = now
+        with self._lock:
+            for idle_id in [i for i, o in self._open.items()
+                            if not o.active and now - o.last_used > ORG_IDLE_SECONDS]:
+                closed.append(self._open.pop(idle_id))
+        self._close(closed)
+        return org
+
+    def _pop_lru(self) -> OrgContext:
+        # Prefer an org with no request (or change stream) in flight
+        for org_id, org in self._open.items():
+            if not org.active:
+                return self._open.pop(org_id)
+        return self._open.popitem(last=False)[1]
+
+    def _close(self, orgs: List[OrgContext]) -> None:
+        if not orgs:
+            return
+        for org in orgs:
+            org.close()
+            logger.info(f"Closed org {org.org_id}")
+        self.generation += 1
+
+    def open_orgs(self) -> List[OrgContext]:
+        with self._lock:
+            return list(self._open.values())
+
+    def open_paths(self) -> set:
+        """Database paths of the default org and every open org."""
+        return {str(org.db_path) for org in [default_org] + self.open_orgs()}
+
+    def close_all(self) -> None:
+        with self._lock:
+            orgs = list(self._open.values())
+            self._open.clear()
+        self._close(orgs)
+
+
+default_org = OrgContext(
+    DEFAULT_ORG, query_cache=query_cache, vevent_cache=vevent_cache, change_watcher=change_watcher
+)
+org_registry = OrgRegistry()
+
+
+class OrgMiddleware:
+    """
+    Pure ASGI middleware serving /orgs/<org>/... as that org.
+
+    The /orgs/<org> prefix moves into root_path, so the usual routes match
+    underneath it. The org is bound for the request (and the DB threads it
+    uses) and CORS is applied with its origins. Other paths are the
+    default org; unknown orgs get 404.
+    """
+
+    def __init__(self, app: Any):
+        self.app = app
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable, send: Callable) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        root_path = scope.get("root_path", "")
+        path = scope["path"]
+        if root_path and path.startswith(root_path):
+            path = path[len(root_path):]
+
+        match = ORG_PATH.match(path)
+        if match is None:
+            org = default_org
+        else:
+            org = org_registry.get(match.group("org"))
+            if org is None:
+                response = FastJSONResponse({"detail": "Unknown organization"}, status_code=404)
+                await response(scope, receive, send)
+                return
+            scope = dict(scope, root_path=root_path + match.group(0))
+
+        token = _current_org.set(org)
+        org.active += 1
+        try:
+            await org.cors(self.app)(scope, receive, send)
+        finally:
+            org.active -= 1
+            org.last_used = time.monotonic()
+            _current_org.reset(token)
+
+
+app.add_middleware(OrgMiddleware)
+
+
+# ============================================================================
+# CONFIG ENDPOINT
+# ============================================================================
+
+@app.get("/api/calendar/config")
+async def get_config() -> Dict[str, Any]:
+    """Return widget configuration for the requested org (SBNC by default)."""
+    return current_org().widget_config
+
+
+# ============================================================================
+# METRICS ENDPOINT
+# ============================================================================
+
+def render_metrics() -> str:
+    """Prometheus text exposition of this process's metrics."""
+    lines: List[str] = []
+    for metric in (http_requests, http_latency, http_response_size, db_latency, db_shed):
+        lines.extend(metric.render())
+
+    orgs = [default_org] + org_registry.open_orgs()
+    caches = [((org.org_id, "query"), org.query_cache) for org in orgs]
+    caches += [((org.org_id, "vevent"), org.vevent_cache) for org in orgs]
+    lines.extend(render_samples(
+        "clubcal_cache_hits_total", "Cache hits.", "counter", ("org", "cache"),
+        [(labels, cache.hits) for labels, cache in caches]
+    ))
+    lines.extend(render_samples(
+        "clubcal_cache_misses_total", "Cache misses.", "counter", ("org", "cache"),
+        [(labels, cache.misses) for labels, cache in caches]
+    ))
+    lines.extend(render_samples(
+        "clubcal_cache_hit_ratio", "Hits / (hits + misses) since start.", "gauge",
+        ("org", "cache"),
+        [(labels, cache.hits / (cache.hits + cache.misses) if cache.hits + cache.misses else 0.0)
+         for labels, cache in caches]
+    ))
+
+    with _db_executor_lock:
+        pending = _db_pending
+    # The executor and its pending cap are shared by every org in the
+    # process, so this one is deliberately unlabelled
+    lines.extend(render_samples(
+        "clubcal_db_pending", "DB calls queued or running on the executor (all orgs).", "gauge",
+        (), [((), pending)]
+    ))
+
+    # Freshness - how long since the sync last wrote each org's wa.db
+    modified = [(org.org_id, data_mtime(org)) for org in orgs]
+    modified = [((org_id,), when.timestamp()) for org_id, when in modified if when is not None]
+    if modified:
+        lines.extend(render_samples(
+            "clubcal_data_last_modified_seconds", "Unix time wa.db was last written.", "gauge",
+            ("org",), modified
+        ))
+        lines.extend(render_samples(
+            "clubcal_data_age_seconds", "Seconds since wa.db was last written.", "gauge",
+            ("org",), [(labels, max(0.0, time.time() - ts)) for labels, ts in modified]
+        ))
+
+    return "\n".join(lines) + "\n"
+
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics() -> Response:
+    """Prometheus metrics, when enabled with CLUBCAL_METRICS=1."""
+    if not METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Not Found")
+    return Response(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
 
 
 # ============================================================================
@@ -291,11 +2679,22 @@ def get_config() -> Dict[str, Any]:
 # ============================================================================
 
 @app.get("/health")
-def health_check() -> Dict[str, str]:
+async def health_check() -> Dict[str, str]:
     """Health check endpoint."""
     return {"status": "ok", "version": "1.03"}
 
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8001)
+    if SERVER_WORKERS > 1:
+        # Workers are separate processes, so uvicorn needs the import string.
+        # Each worker warms its own cache and DB executor via lifespan().
+        uvicorn.run(
+            "calendar_api:app",
+            host=SERVER_HOST,
+            port=SERVER_PORT,
+            workers=SERVER_WORKERS,
+            timeout_graceful_shutdown=30
+        )
+    else:
+        uvicorn.run(app, host=SERVER_HOST, port=SERVER_PORT)
@@ -3,11 +3,12 @@
 
 import sqlite3
 from datetime import datetime, timedelta
+from typing import List, Optional
 
 DB_PATH = "./wa.db"
 
-def create_test_db():
-    conn = sqlite3.connect(DB_PATH)
+def create_test_db(db_path: str = DB_PATH, events: Optional[List[tuple]] = None):
+    conn = sqlite3.connect(db_path)
     cur = conn.cursor()
 
     # Create events table
@@ -31,12 +32,27 @@ def create_test_db():
     )
     """)
 
+    # Keyset pagination index for the listing endpoints
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_events_start ON events(StartDate, Id)")
+
     # Clear existing
     cur.execute("DELETE FROM events")
 
-    # Sample events
-    now = datetime.now()
-    events = [
+    if events is None:
+        events = sample_events(datetime.now())
+
+    cur.executemany("""
+    INSERT INTO events VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)
+    """, events)
+
+    conn.commit()
+    conn.close()
+    print(f"Created test database at {db_path} with {len(events)} events")
+
+
+def sample_events(now: datetime) -> List[tuple]:
+    """The three hand-written sample events, dated relative to `now`."""
+    return [
         # Public event
         (1, "TGIF: Welcome Happy Hour",
          (now + timedelta(days=3)).isoformat(),
@@ -68,13 +84,5 @@ def create_test_db():
          103, "games@example.com", "805-555-3456"),
     ]
 
-    cur.executemany("""
-    INSERT INTO events VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)
-    """, events)
-
-    conn.commit()
-    conn.close()
-    print(f"Created test database at {DB_PATH} with {len(events)} events")
-
 if __name__ == "__main__":
     create_test_db()
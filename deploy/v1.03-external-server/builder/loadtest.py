@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+"""
+ClubCalendar API Load Test
+
+Starts calendar_api under uvicorn on this host for each requested worker
+count, drives a weighted mix of traffic (public list, member list, event
+detail, config) and prints throughput, latency percentiles and error
+rates per endpoint.
+
+Run against the local wa.db, comparing 1 worker with 4:
+    python loadtest.py --workers 1,4 --concurrency 64 --duration 10
+
+Size a server: 100k generated events, 200 req/s for 60 seconds:
+    python loadtest.py --generate 100000 --rate 200 --duration 60 --workers 4
+
+With --rate, requests are sent on a fixed schedule and latency is measured
+from the scheduled send time, so a slow server cannot hide its queueing.
+Without it, --concurrency clients send back-to-back as fast as possible.
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import httpx
+
+from create_test_db import create_test_db
+
+HERE = Path(__file__).resolve().parent
+
+DEFAULT_MIX = "public=40,member=20,detail=30,config=10"
+
+TAG_PREFIXES = ["committee", "activity", "time", "availability"]
+
+
+# ============================================================================
+# DATABASE GENERATION
+# ============================================================================
+
+def generate_events(count: int, public_ratio: float, tag_vocab: int,
+                    seed: int = 42) -> List[tuple]:
+    """
+    Deterministic event rows for create_test_db().
+
+    Events start tomorrow and are spread over the next year; each carries
+    one to four tags drawn from `tag_vocab` distinct tags, skewed so a few
+    tags are common and most are rare.
+    """
+    rng = random.Random(seed)
+    now = datetime.now().replace(microsecond=0)
+    vocab = [f"{TAG_PREFIXES[i % len(TAG_PREFIXES)]}:tag{i}" for i in range(tag_vocab)]
+    weights = [1 / (i + 1) for i in range(tag_vocab)]
+
+    rows = []
+    for i in range(1, count + 1):
+        start = now + timedelta(days=1 + rng.randrange(365), hours=rng.randrange(9, 20))
+        limit = rng.choice((0, 12, 20, 40, 100))
+        tags = sorted(set(rng.choices(vocab, weights, k=rng.randint(1, 4))))
+        rows.append((
+            i, f"Event {i}",
+            start.isoformat(), (start + timedelta(hours=2)).isoformat(),
+            f"Venue {i % 200}", f"Details for event {i}. " * rng.randint(2, 20),
+            "Public" if rng.random() < public_ratio else "Members",
+            ",".join(tags),
+            1, limit, rng.randrange(limit + 1),
+            f"https://sbnewcomers.org/event-{i}",
+            1000 + i % 500, f"organizer{i % 500}@example.com", "805-555-0000",
+        ))
+    return rows
+
+
+# ============================================================================
+# SERVER
+# ============================================================================
+
+def start_server(port: int, workers: int, db_path: str) -> subprocess.Popen:
+    """Launch calendar_api.py as a subprocess and wait until /health answers."""
+    env = dict(os.environ)
+    env.update({
+        "CLUBCAL_PORT": str(port),
+        "CLUBCAL_HOST": "127.0.0.1",
+        "CLUBCAL_WORKERS": str(workers),
+        "CLUBCAL_DB_PATH": db_path,
+    })
+    proc = subprocess.Popen(
+        [sys.executable, "calendar_api.py"],
+        cwd=str(HERE),
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/health", timeout=1).status_code == 200:
+                return proc
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+
+    proc.terminate()
+    raise RuntimeError(f"Server on port {port} did not start")
+
+
+def stop_server(proc: subprocess.Popen) -> None:
+    """Stop the server gracefully (SIGTERM), killing it if it hangs."""
+    proc.terminate()
+    try:
+        proc.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+
+
+# ============================================================================
+# TRAFFIC
+# ============================================================================
+
+def parse_mix(value: str) -> List[Tuple[str, int]]:
+    """'public=40,detail=30' -> [('public', 40), ('detail', 30)]"""
+    mix = []
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in ("public", "member", "detail", "config"):
+            raise ValueError(f"Unknown endpoint in mix: {name}")
+        mix.append((name.strip(), int(weight or 1)))
+    return mix
+
+
+def request_path(kind: str, rng: random.Random, max_id: int) -> str:
+    if kind == "public":
+        return "/api/calendar/events"
+    if kind == "member":
+        return "/api/calendar/events/member"
+    if kind == "detail":
+        audience = rng.choice(("public", "member"))
+        return f"/api/calendar/event/{rng.randint(1, max_id)}?audience={audience}"
+    return "/api/calendar/config"
+
+
+class Stats:
+    """Latencies and error counts per endpoint kind."""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+
+    def record(self, kind: str, latency: float, ok: bool) -> None:
+        self.latencies.setdefault(kind, [])
+        self.errors.setdefault(kind, 0)
+        if ok:
+            self.latencies[kind].append(latency)
+        else:
+            self.errors[kind] += 1
+
+
+async def drive(base_url: str, mix: List[Tuple[str, int]], concurrency: int,
+                duration: float, rate: float, max_id: int, seed: int = 1) -> Tuple[Stats, float]:
+    """
+    Send mixed traffic for `duration` seconds.
+
+    With rate > 0 requests are scheduled at fixed intervals (open loop),
+    at most `concurrency` in flight; otherwise `concurrency` clients loop.
+    """
+    rng = random.Random(seed)
+    kinds = [name for name, _ in mix]
+    weights = [weight for _, weight in mix]
+    stats = Stats()
+
+    async def send(client: httpx.AsyncClient, kind: str, scheduled: float) -> None:
+        try:
+            response = await client.get(request_path(kind, rng, max_id))
+            # 404 is expected for member-only ids requested as public
+            ok = response.status_code in (200, 404)
+        except httpx.HTTPError:
+            ok = False
+        stats.record(kind, time.monotonic() - scheduled, ok)
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+        started = time.monotonic()
+        deadline = started + duration
+
+        if rate > 0:
+            in_flight = asyncio.Semaphore(concurrency)
+            tasks = []
+
+            async def scheduled_send(kind: str, at: float) -> None:
+                async with in_flight:
+                    await send(client, kind, at)
+
+            n = 0
+            while True:
+                at = started + n / rate
+                if at >= deadline:
+                    break
+                delay = at - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                tasks.append(asyncio.create_task(
+                    scheduled_send(rng.choices(kinds, weights)[0], at)
+                ))
+                n += 1
+            await asyncio.gather(*tasks)
+        else:
+            async def worker() -> None:
+                while time.monotonic() < deadline:
+                    await send(client, rng.choices(kinds, weights)[0], time.monotonic())
+
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+        elapsed = time.monotonic() - started
+
+    return stats, elapsed
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[rank]
+
+
+def summarize(stats: Stats, elapsed: float) -> Dict[str, Dict[str, float]]:
+    """Per-endpoint (and 'all') throughput, latency percentiles and errors."""
+    summary = {}
+    every: List[float] = []
+    total_errors = 0
+
+    for kind in stats.latencies:
+        latencies = sorted(stats.latencies[kind])
+        errors = stats.errors[kind]
+        every.extend(latencies)
+        total_errors += errors
+        summary[kind] = row(latencies, errors, elapsed)
+
+    summary["all"] = row(sorted(every), total_errors, elapsed)
+    return summary
+
+
+def row(latencies: List[float], errors: int, elapsed: float) -> Dict[str, float]:
+    total = len(latencies) + errors
+    return {
+        "requests": total,
+        "rps": len(latencies) / elapsed if elapsed else 0.0,
+        "p50": percentile(latencies, 50) * 1000,
+        "p95": percentile(latencies, 95) * 1000,
+        "p99": percentile(latencies, 99) * 1000,
+        "errorRate": errors / total if total else 0.0,
+    }
+
+
+def print_summary(workers: int, summary: Dict[str, Dict[str, float]]) -> None:
+    print(f"\nworkers={workers}")
+    print(f"{'endpoint':>10} {'requests':>9} {'req/s':>9} {'p50 ms':>8} "
+          f"{'p95 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    for kind, r in summary.items():
+        print(f"{kind:>10} {r['requests']:>9} {r['rps']:>9.1f} {r['p50']:>8.1f} "
+              f"{r['p95']:>8.1f} {r['p99']:>8.1f} {r['errorRate']:>7.1%}")
+
+
+def run(worker_counts: List[int], port: int, concurrency: int, duration: float,
+        rate: float, mix: List[Tuple[str, int]], db_path: str,
+        max_id: int) -> List[Tuple[int, Dict[str, Dict[str, float]]]]:
+    results = []
+    for workers in worker_counts:
+        proc = start_server(port, workers, db_path)
+        try:
+            stats, elapsed = asyncio.run(drive(
+                f"http://127.0.0.1:{port}", mix, concurrency, duration, rate, max_id
+            ))
+        finally:
+            stop_server(proc)
+        summary = summarize(stats, elapsed)
+        print_summary(workers, summary)
+        results.append((workers, summary))
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="ClubCalendar API load test")
+    parser.add_argument("--workers", default=f"1,{os.cpu_count() or 2}",
+                        help="comma-separated worker counts to run in turn")
+    parser.add_argument("--concurrency", type=int, default=64,
+                        help="clients (closed loop) or max in-flight requests (with --rate)")
+    parser.add_argument("--rate", type=float, default=0,
+                        help="target requests/second across all endpoints (0 = as fast as possible)")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per run")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="endpoint weights")
+    parser.add_argument("--port", type=int, default=8011)
+    parser.add_argument("--db", default=None,
+                        help="database to serve (default: wa.db, or a temp file with --generate)")
+    parser.add_argument("--generate", type=int, default=0, metavar="EVENTS",
+                        help="generate a database with this many events first")
+    parser.add_argument("--public-ratio", type=float, default=0.5,
+                        help="share of generated events that are Public")
+    parser.add_argument("--tag-vocab", type=int, default=30,
+                        help="distinct tags in the generated database")
+    args = parser.parse_args()
+
+    worker_counts = [int(w) for w in args.workers.split(",") if w]
+    mix = parse_mix(args.mix)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = args.db
+        max_id = 3
+        if args.generate:
+            db_path = db_path or str(Path(tmp) / "wa.db")
+            create_test_db(db_path, generate_events(args.generate, args.public_ratio, args.tag_vocab))
+            max_id = args.generate
+        elif db_path is None:
+            db_path = str(HERE / "wa.db")
+
+        results = run(worker_counts, args.port, args.concurrency, args.duration,
+                      args.rate, mix, db_path, max_id)
+
+    # Throughput only differs between worker counts when not rate-limited
+    if not args.rate and len(results) > 1 and results[0][1]["all"]["rps"]:
+        speedup = results[-1][1]["all"]["rps"] / results[0][1]["all"]["rps"]
+        print(f"\nspeedup {results[-1][0]} vs {results[0][0]} workers: {speedup:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -8,15 +8,67 @@ Run with: pytest tests/test_calendar_api.py -v --tb=short
 
 import pytest
 from fastapi.testclient import TestClient
+from datetime import date, datetime, timedelta
+import asyncio
+import json
+import shutil
+import sqlite3
+import threading
+import time
 import sys
 import os
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import calendar_api
 from calendar_api import app
+from create_test_db import create_test_db
 
 client = TestClient(app)
 
 
+def make_events(count, now=None, access_levels=("Public", "Members")):
+    """Build `count` event rows, one per day starting tomorrow."""
+    now = now or datetime.now()
+    rows = []
+    for i in range(count):
+        start = now + timedelta(days=i + 1)
+        rows.append((
+            i + 1, f"Event {i + 1}",
+            start.isoformat(), (start + timedelta(hours=2)).isoformat(),
+            f"Venue {i + 1}", f"Details for event {i + 1}",
+            access_levels[i % len(access_levels)], "social",
+            1, 20, i % 21,
+            f"https://sbnewcomers.org/event-{i + 1}",
+            100 + i, f"organizer{i}@example.com", "805-555-0000",
+        ))
+    return rows
+
+
+FIXTURE_DB = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "wa.db")
+
+
+@pytest.fixture(autouse=True)
+def fixture_db(tmp_path, monkeypatch):
+    """Serve a copy of the bundled wa.db, so migrations never rewrite the fixture."""
+    db_path = tmp_path / "fixture.db"
+    shutil.copy(FIXTURE_DB, db_path)
+    monkeypatch.setattr(calendar_api, "DB_PATH", db_path)
+    return db_path
+
+
+@pytest.fixture
+def seeded_db(tmp_path, monkeypatch):
+    """Point the API at a fresh temporary database; returns a seeding function."""
+    db_path = tmp_path / "wa.db"
+    monkeypatch.setattr(calendar_api, "DB_PATH", db_path)
+
+    def seed(events):
+        create_test_db(str(db_path), events)
+        return events
+
+    return seed
+
+
 # ============================================================================
 # ENDPOINT AVAILABILITY TESTS
 # ============================================================================
@@ -242,6 +294,694 @@ class TestEventDetailAudienceFiltering:
         assert response.status_code == 404
 
 
+# ============================================================================
+# DATE WINDOW + KEYSET PAGINATION
+# ============================================================================
+
+class TestListingPagination:
+    """Verify start/end/limit/cursor on the listing endpoints"""
+
+    def _walk(self, url, **params):
+        ids = []
+        cursor = None
+        while True:
+            query = dict(params)
+            if cursor:
+                query["cursor"] = cursor
+            data = client.get(url, params=query).json()
+            ids.extend(e["Id"] for e in data["events"])
+            cursor = data["nextCursor"]
+            assert data["hasMore"] == (cursor is not None)
+            if cursor is None:
+                return ids
+
+    def test_member_pages_cover_all_events_once(self, seeded_db):
+        seeded_db(make_events(7))
+        ids = self._walk("/api/calendar/events/member", limit=3)
+        assert ids == [1, 2, 3, 4, 5, 6, 7]
+
+    def test_public_pages_only_public_events(self, seeded_db):
+        seeded_db(make_events(7))
+        ids = self._walk("/api/calendar/events", limit=2)
+        assert ids == [1, 3, 5, 7]
+
+    def test_single_page_has_no_cursor(self, seeded_db):
+        seeded_db(make_events(3))
+        data = client.get("/api/calendar/events/member").json()
+        assert data["count"] == 3
+        assert data["nextCursor"] is None
+        assert data["hasMore"] is False
+
+    def test_start_end_window(self, seeded_db):
+        now = datetime.now()
+        seeded_db(make_events(10, now=now))
+        start = (now + timedelta(days=3)).date().isoformat()
+        end = (now + timedelta(days=5)).date().isoformat()
+        data = client.get("/api/calendar/events/member",
+                          params={"start": start, "end": end}).json()
+        assert [e["Id"] for e in data["events"]] == [3, 4, 5]
+
+    def test_same_start_date_ties_broken_by_id(self, seeded_db):
+        events = make_events(5)
+        same_start = events[0][2]
+        events = [(e[0], e[1], same_start) + e[3:] for e in events]
+        seeded_db(events)
+        ids = self._walk("/api/calendar/events/member", limit=2)
+        assert ids == [1, 2, 3, 4, 5]
+
+    def test_invalid_cursor_rejected(self, seeded_db):
+        seeded_db(make_events(3))
+        response = client.get("/api/calendar/events/member?cursor=not-a-cursor")
+        assert response.status_code == 400
+
+    def test_end_before_start_rejected(self, seeded_db):
+        seeded_db(make_events(3))
+        response = client.get("/api/calendar/events?start=2026-05-02&end=2026-05-01")
+        assert response.status_code == 400
+
+    def test_limit_bounds_enforced(self, seeded_db):
+        seeded_db(make_events(3))
+        assert client.get("/api/calendar/events?limit=0").status_code == 422
+        too_many = calendar_api.MAX_PAGE_LIMIT + 1
+        assert client.get(f"/api/calendar/events?limit={too_many}").status_code == 422
+
+    def test_day_index_maps_days_to_page_positions(self, seeded_db):
+        now = datetime.now().replace(hour=10)
+        events = make_events(3, now=now)
+        # Event 2 runs over three local days
+        multi_day_end = (now + timedelta(days=4, hours=2)).isoformat()
+        events[1] = events[1][:3] + (multi_day_end,) + events[1][4:]
+        seeded_db(events)
+        data = client.get("/api/calendar/events/member").json()
+        day = lambda n: (now + timedelta(days=n)).date().isoformat()
+        assert data["days"] == {day(1): [0], day(2): [1], day(3): [1, 2], day(4): [1]}
+
+    def test_paged_public_events_still_clean(self, seeded_db):
+        seeded_db(make_events(6))
+        data = client.get("/api/calendar/events?limit=2").json()
+        for event in data["events"]:
+            for field in TestSecuritySummary.FORBIDDEN_PUBLIC_FIELDS:
+                assert field not in event
+
+
+# ============================================================================
+# DB EXECUTOR + QUERY CACHE
+# ============================================================================
+
+class TestExecutorAndCache:
+    """Verify bounded DB access and per-worker result caching"""
+
+    def test_repeat_request_served_from_cache(self, seeded_db):
+        seeded_db(make_events(3))
+        client.get("/api/calendar/events/member")
+        hits = calendar_api.query_cache.hits
+        client.get("/api/calendar/events/member")
+        assert calendar_api.query_cache.hits == hits + 1
+
+    def test_cache_invalidated_by_db_write(self, seeded_db):
+        events = seeded_db(make_events(3))
+        assert client.get("/api/calendar/events/member").json()["count"] == 3
+
+        extra = make_events(4)[3]
+        conn = sqlite3.connect(str(calendar_api.DB_PATH))
+        conn.execute("INSERT INTO events VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)", extra)
+        conn.commit()
+        conn.close()
+
+        assert client.get("/api/calendar/events/member").json()["count"] == len(events) + 1
+
+    def test_overload_shed_with_503(self, seeded_db, monkeypatch):
+        seeded_db(make_events(3))
+        monkeypatch.setattr(calendar_api, "DB_MAX_PENDING", 0)
+        response = client.get("/api/calendar/events")
+        assert response.status_code == 503
+        assert response.headers["retry-after"] == "1"
+
+    def test_startup_warms_cache(self, seeded_db):
+        seeded_db(make_events(3))
+        calendar_api.query_cache.clear()
+        with TestClient(app) as warm_client:
+            hits = calendar_api.query_cache.hits
+            warm_client.get("/api/calendar/events")
+            assert calendar_api.query_cache.hits == hits + 1
+
+
+# ============================================================================
+# FAST JSON + PROJECTION GUARD
+# ============================================================================
+
+class TestFastJSONResponses:
+    """Verify the fast serialization path keeps output and PII guarantees"""
+
+    def test_stdlib_fallback_matches_fast_path(self, seeded_db, monkeypatch):
+        seeded_db(make_events(5))
+        fast = client.get("/api/calendar/events/member").json()
+        monkeypatch.setattr(calendar_api, "orjson", None)
+        slow = client.get("/api/calendar/events/member").json()
+        fast.pop("timestamp")
+        slow.pop("timestamp")
+        assert fast == slow
+
+    def test_public_projection_violation_fails_closed(self, seeded_db, monkeypatch):
+        seeded_db(make_events(3))
+        monkeypatch.setattr(calendar_api, "PUBLIC_LISTING_COLUMNS",
+                            frozenset({"Id", "Name", "StartDate", "EndDate"}))
+        calendar_api.query_cache.clear()
+        response = client.get("/api/calendar/events")
+        assert response.status_code == 500
+
+    def test_public_events_only_projected_columns(self, seeded_db):
+        seeded_db(make_events(4))
+        for event in client.get("/api/calendar/events").json()["events"]:
+            assert set(event) <= calendar_api.PUBLIC_LISTING_COLUMNS
+
+
+# ============================================================================
+# TAG INDEX + FILTERING
+# ============================================================================
+
+def tagged_events():
+    """Five events; odd ids public. Tags exercise case and spacing."""
+    tags = [
+        "committee:hikers, time:morning",
+        "committee:hikers,time:evening",
+        "Committee:Wine, time:evening",
+        "committee:wine,time:morning, day:weekend",
+        "",
+    ]
+    return [row[:7] + (t,) + row[8:] for row, t in zip(make_events(5), tags)]
+
+
+class TestTagFiltering:
+    """Verify the event_tags index, tags=/anyTags= filters and facet counts"""
+
+    def ids(self, url, **params):
+        return [e["Id"] for e in client.get(url, params=params).json()["events"]]
+
+    def test_all_tags_filter(self, seeded_db):
+        seeded_db(tagged_events())
+        assert self.ids("/api/calendar/events/member", tags="committee:hikers") == [1, 2]
+        assert self.ids("/api/calendar/events/member",
+                        tags="committee:wine,time:morning") == [4]
+
+    def test_any_tags_filter_is_case_insensitive(self, seeded_db):
+        seeded_db(tagged_events())
+        assert self.ids("/api/calendar/events/member",
+                        anyTags="COMMITTEE:WINE, day:weekend") == [3, 4]
+
+    def test_public_tag_filter_keeps_audience_rules(self, seeded_db):
+        seeded_db(tagged_events())
+        assert self.ids("/api/calendar/events", anyTags="committee:hikers") == [1]
+
+    def test_tag_filter_with_pagination(self, seeded_db):
+        seeded_db(tagged_events())
+        first = client.get("/api/calendar/events/member",
+                           params={"anyTags": "time:morning,time:evening", "limit": 2}).json()
+        second = client.get("/api/calendar/events/member", params={
+            "anyTags": "time:morning,time:evening", "limit": 2,
+            "cursor": first["nextCursor"]}).json()
+        assert [e["Id"] for e in first["events"] + second["events"]] == [1, 2, 3, 4]
+
+    def test_index_follows_tag_updates(self, seeded_db):
+        seeded_db(tagged_events())
+        conn = sqlite3.connect(str(calendar_api.DB_PATH))
+        conn.execute("UPDATE events SET Tags = 'committee:wine' WHERE Id = 1")
+        conn.execute("DELETE FROM events WHERE Id = 4")
+        conn.commit()
+        conn.close()
+        assert self.ids("/api/calendar/events/member", tags="committee:wine") == [1, 3]
+
+    def test_index_follows_insert_or_replace(self, seeded_db):
+        rows = seeded_db(tagged_events())
+        self.ids("/api/calendar/events/member")
+        replaced = rows[3][:7] + ("committee:hikers",) + rows[3][8:]
+        execute_sql(("INSERT OR REPLACE INTO events VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)", replaced))
+        assert self.ids("/api/calendar/events/member", tags="committee:wine") == [3]
+        assert self.ids("/api/calendar/events/member", tags="committee:hikers") == [1, 2, 4]
+
+    def test_index_rebuilt_after_events_recreated(self, seeded_db):
+        rows = seeded_db(tagged_events())
+        self.ids("/api/calendar/events/member")
+        conn = sqlite3.connect(str(calendar_api.DB_PATH))
+        ddl = conn.execute("SELECT sql FROM sqlite_master WHERE name = 'events'").fetchone()[0]
+        conn.executescript(f"DROP TABLE events; {ddl};")
+        retagged = [row[:7] + ("committee:birders",) + row[8:] for row in rows[:2]]
+        conn.executemany("INSERT INTO events VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)", retagged)
+        conn.commit()
+        conn.close()
+
+        assert self.ids("/api/calendar/events/member", tags="committee:hikers") == []
+        assert self.ids("/api/calendar/events/member", tags="committee:birders") == [1, 2]
+        facets = client.get("/api/calendar/tags?audience=member").json()["tags"]
+        assert "committee:wine" not in json.dumps(facets)
+        assert "committee:birders" in json.dumps(facets)
+
+    def test_too_many_tags_rejected(self, seeded_db):
+        seeded_db(tagged_events())
+        many = ",".join(f"t{i}" for i in range(calendar_api.MAX_TAG_FILTERS + 1))
+        assert client.get(f"/api/calendar/events?tags={many}").status_code == 400
+
+    def test_facet_counts(self, seeded_db):
+        seeded_db(tagged_events())
+        data = client.get("/api/calendar/tags?audience=member").json()
+        counts = {f["tag"]: f["count"] for f in data["tags"]}
+        assert counts == {
+            "committee:hikers": 2, "committee:wine": 2,
+            "time:morning": 2, "time:evening": 2, "day:weekend": 1,
+        }
+
+    def test_facet_groups(self, seeded_db):
+        seeded_db(tagged_events())
+        data = client.get("/api/calendar/tags?audience=member").json()
+        assert set(data["groups"]) == {"committee", "time", "day"}
+        assert sorted(data["groups"]["committee"]) == ["committee:hikers", "committee:wine"]
+
+    def test_facet_prefix_and_public_audience(self, seeded_db):
+        seeded_db(tagged_events())
+        data = client.get("/api/calendar/tags?prefix=committee:").json()
+        counts = {f["tag"]: f["count"] for f in data["tags"]}
+        assert counts == {"committee:hikers": 1, "committee:wine": 1}
+
+    def test_facet_drill_down(self, seeded_db):
+        seeded_db(tagged_events())
+        data = client.get("/api/calendar/tags",
+                          params={"audience": "member", "tags": "committee:wine"}).json()
+        counts = {f["tag"]: f["count"] for f in data["tags"]}
+        assert counts["time:morning"] == 1
+        assert "committee:hikers" not in counts
+
+
+# ============================================================================
+# FULL-TEXT SEARCH
+# ============================================================================
+
+def search_events():
+    """Events with distinctive text; ids 1-2 public, 3 member-only, 4 in the past."""
+    now = datetime.now()
+    rows = make_events(4, now=now)
+    texts = [
+        ("Happy Hikers: Rattlesnake Canyon", "Moderate hike, bring water", "hiking,outdoors", "Public"),
+        ("Wine Appreciation: Tasting", "A hike-free evening of wine", "wine,social", "Public"),
+        ("Garden: Members Tour", "Private hiking garden tour", "garden", "Members"),
+        ("Happy Hikers: Past Hike", "Last year's hike", "hiking", "Public"),
+    ]
+    out = []
+    for row, (name, details, tags, access) in zip(rows, texts):
+        row = list(row)
+        row[1], row[5], row[7], row[6] = name, details, tags, access
+        out.append(tuple(row))
+    past = list(out[3])
+    past[2] = (now - timedelta(days=400)).isoformat()
+    out[3] = tuple(past)
+    return out
+
+
+class TestSearch:
+    """Verify FTS5 search ranking, audience filtering and index maintenance"""
+
+    def test_finds_by_name_details_and_tags(self, seeded_db):
+        seeded_db(search_events())
+        ids = lambda q: {e["Id"] for e in client.get(
+            "/api/calendar/search", params={"q": q, "audience": "member"}).json()["events"]}
+        assert ids("rattlesnake") == {1}
+        assert ids("tasting") == {2}
+        assert ids("outdoors") == {1}
+
+    def test_name_match_ranks_first(self, seeded_db):
+        rows = make_events(2)
+        details_hit = rows[0][:5] + ("Meet at the canyon trailhead",) + rows[0][6:]
+        name_hit = rows[1][:1] + ("Canyon Hike",) + rows[1][2:]
+        seeded_db([details_hit, name_hit])
+        data = client.get("/api/calendar/search?q=canyon&audience=member").json()
+        assert [e["Id"] for e in data["events"]] == [2, 1]
+
+    def test_prefix_matching(self, seeded_db):
+        seeded_db(search_events())
+        data = client.get("/api/calendar/search?q=rattle").json()
+        assert [e["Id"] for e in data["events"]] == [1]
+
+    def test_public_excludes_member_only_and_past(self, seeded_db):
+        seeded_db(search_events())
+        data = client.get("/api/calendar/search?q=hik").json()
+        ids = {e["Id"] for e in data["events"]}
+        assert 3 not in ids
+        assert 4 not in ids
+        for event in data["events"]:
+            assert set(event) <= calendar_api.PUBLIC_LISTING_COLUMNS
+
+    def test_member_searches_history(self, seeded_db):
+        seeded_db(search_events())
+        data = client.get("/api/calendar/search?q=past&audience=member").json()
+        assert [e["Id"] for e in data["events"]] == [4]
+        assert "Location" in data["events"][0]
+
+    def test_locked_database_retried(self, seeded_db):
+        seeded_db(search_events())
+        path = str(calendar_api.DB_PATH)
+        key = (path, "locked-test")
+        writer = sqlite3.connect(path, isolation_level=None)
+        writer.execute("BEGIN IMMEDIATE")
+        conn = sqlite3.connect(path, timeout=0)
+        try:
+            calendar_api.ensure_schema(conn, key)
+            assert key not in calendar_api._schema_checked
+            assert not calendar_api.table_exists(conn, "events_fts")
+
+            writer.execute("COMMIT")
+            calendar_api.ensure_schema(conn, key)
+            assert key in calendar_api._schema_checked
+            assert calendar_api.table_exists(conn, "events_fts")
+        finally:
+            writer.close()
+            conn.close()
+
+    def test_fixture_database_migrated(self, fixture_db):
+        # The bundled wa.db has only the events table
+        assert client.get("/api/calendar/search?q=event&audience=member").status_code == 200
+        conn = sqlite3.connect(str(fixture_db))
+        try:
+            versions = dict(conn.execute("SELECT name, version FROM index_versions"))
+        finally:
+            conn.close()
+        assert versions == {"events_fts": 2, "event_tags": 2}
+
+    def test_index_follows_insert_or_replace(self, seeded_db):
+        rows = seeded_db(search_events())
+        client.get("/api/calendar/search?q=tasting&audience=member")
+        replaced = rows[1][:1] + ("Cheese Social",) + rows[1][2:5] + ("Bring a plate",) + rows[1][6:]
+        execute_sql(("INSERT OR REPLACE INTO events VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)", replaced))
+        ids = lambda q: [e["Id"] for e in client.get(
+            "/api/calendar/search", params={"q": q, "audience": "member"}).json()["events"]]
+        assert ids("tasting") == []
+        assert ids("cheese") == [2]
+
+    def test_index_rebuilt_after_events_recreated(self, seeded_db):
+        rows = seeded_db(search_events())
+        client.get("/api/calendar/search?q=tasting&audience=member")
+        conn = sqlite3.connect(str(calendar_api.DB_PATH))
+        ddl = conn.execute("SELECT sql FROM sqlite_master WHERE name = 'events'").fetchone()[0]
+        conn.executescript(f"DROP TABLE events; {ddl};")
+        conn.execute("INSERT INTO events VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)", rows[0])
+        conn.commit()
+        conn.close()
+        data = client.get("/api/calendar/search?q=tasting&audience=member").json()
+        assert data["events"] == []
+        data = client.get("/api/calendar/search?q=rattlesnake&audience=member").json()
+        assert [e["Id"] for e in data["events"]] == [1]
+
+    def test_pagination(self, seeded_db):
+        seeded_db(search_events())
+        first = client.get("/api/calendar/search?q=hik&audience=member&limit=2").json()
+        assert first["hasMore"] is True
+        second = client.get("/api/calendar/search", params={
+            "q": "hik", "audience": "member", "limit": 2, "offset": first["nextOffset"]}).json()
+        ids = [e["Id"] for e in first["events"] + second["events"]]
+        assert sorted(ids) == [1, 2, 3, 4]
+
+    def test_index_follows_updates_and_deletes(self, seeded_db):
+        seeded_db(search_events())
+        assert client.get("/api/calendar/search?q=rattlesnake").json()["count"] == 1
+        conn = sqlite3.connect(str(calendar_api.DB_PATH))
+        conn.execute("UPDATE events SET Name = 'Happy Hikers: Cold Spring' WHERE Id = 1")
+        conn.execute("DELETE FROM events WHERE Id = 2")
+        conn.commit()
+        conn.close()
+        assert client.get("/api/calendar/search?q=rattlesnake").json()["count"] == 0
+        assert client.get("/api/calendar/search?q=cold").json()["count"] == 1
+        assert client.get("/api/calendar/search?q=tasting").json()["count"] == 0
+
+    def test_operator_syntax_is_neutralized(self, seeded_db):
+        seeded_db(search_events())
+        response = client.get('/api/calendar/search', params={"q": 'Name:"wine" OR NEAR('})
+        assert response.status_code == 200
+
+    def test_query_without_terms_rejected(self, seeded_db):
+        seeded_db(search_events())
+        assert client.get("/api/calendar/search?q=%21%21").status_code == 400
+        assert client.get("/api/calendar/search?q=").status_code == 422
+
+
+# ============================================================================
+# BATCH EVENT DETAIL
+# ============================================================================
+
+class TestBatchEventDetail:
+    """Verify the batch detail endpoint matches single-event detail"""
+
+    def test_results_keyed_by_id_with_missing(self, seeded_db):
+        seeded_db(make_events(5))
+        data = client.get("/api/calendar/events/batch?ids=3,1,999&audience=member").json()
+        assert set(data["events"]) == {"1", "3"}
+        assert data["missing"] == [999]
+        assert data["count"] == 2
+
+    def test_matches_single_detail(self, seeded_db):
+        seeded_db(make_events(5))
+        for audience in ("public", "member"):
+            batch = client.get(f"/api/calendar/events/batch?ids=1,2&audience={audience}").json()
+            for event_id in (1, 2):
+                single = client.get(f"/api/calendar/event/{event_id}?audience={audience}").json()
+                assert batch["events"][str(event_id)] == single["event"]
+
+    def test_public_batch_clean(self, seeded_db):
+        seeded_db(make_events(5))
+        data = client.get("/api/calendar/events/batch?ids=1,2,3,4,5").json()
+        for event in data["events"].values():
+            for field in TestSecuritySummary.FORBIDDEN_PUBLIC_FIELDS:
+                assert field not in event
+
+    def test_member_detail_excludes_contact_pii(self, seeded_db):
+        seeded_db(make_events(2))
+        event = client.get("/api/calendar/event/1?audience=member").json()["event"]
+        assert "ContactEmail" not in event
+        assert "ContactPhone" not in event
+        assert "OrganizerContactId" not in event
+
+    def test_invalid_ids_rejected(self, seeded_db):
+        seeded_db(make_events(2))
+        assert client.get("/api/calendar/events/batch?ids=1,abc").status_code == 400
+        assert client.get("/api/calendar/events/batch?ids=,").status_code == 400
+        too_many = ",".join(str(i) for i in range(calendar_api.BATCH_MAX_IDS + 1))
+        assert client.get(f"/api/calendar/events/batch?ids={too_many}").status_code == 400
+
+    def test_conditional_get(self, seeded_db):
+        seeded_db(make_events(3))
+        first = client.get("/api/calendar/events/batch?ids=1,2")
+        assert first.headers["cache-control"].startswith("public")
+        again = client.get("/api/calendar/events/batch?ids=2,1",
+                           headers={"If-None-Match": first.headers["etag"]})
+        assert again.status_code == 304
+
+    def test_member_responses_private(self, seeded_db):
+        seeded_db(make_events(3))
+        response = client.get("/api/calendar/event/1?audience=member")
+        assert response.headers["cache-control"].startswith("private")
+
+    def test_etag_changes_with_data(self, seeded_db):
+        seeded_db(make_events(3))
+        etag = client.get("/api/calendar/event/1").headers["etag"]
+        conn = sqlite3.connect(str(calendar_api.DB_PATH))
+        conn.execute("UPDATE events SET Name = 'Renamed' WHERE Id = 1")
+        conn.commit()
+        conn.close()
+        response = client.get("/api/calendar/event/1", headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.json()["event"]["Name"] == "Renamed"
+
+
+# ============================================================================
+# ICS SUBSCRIPTION FEEDS
+# ============================================================================
+
+class TestIcsFeed:
+    """Verify RFC 5545 subscription feeds"""
+
+    def vevents(self, body):
+        return body.split("BEGIN:VEVENT")[1:]
+
+    def test_public_feed_structure(self, seeded_db):
+        seeded_db(make_events(4))
+        response = client.get("/api/calendar/feed.ics")
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/calendar")
+        body = response.text
+        assert body.startswith("BEGIN:VCALENDAR\r\n")
+        assert body.endswith("END:VCALENDAR\r\n")
+        assert "TZID:America/Los_Angeles" in body
+        assert "BEGIN:VTIMEZONE" in body
+        assert len(self.vevents(body)) == 2  # public events 1 and 3
+
+    def test_public_feed_has_no_location(self, seeded_db):
+        seeded_db(make_events(4))
+        body = client.get("/api/calendar/feed.ics").text
+        assert "\r\nLOCATION:" not in body
+        assert "Venue" not in body
+
+    def test_member_feed_has_location(self, seeded_db):
+        seeded_db(make_events(4))
+        body = client.get("/api/calendar/feed.ics?audience=member").text
+        assert len(self.vevents(body)) == 4
+        assert "LOCATION:Venue 1" in body
+
+    def test_committee_feed(self, seeded_db):
+        seeded_db(tagged_events())
+        body = client.get("/api/calendar/feed.ics?audience=member&committee=wine").text
+        uids = [line for line in body.split("\r\n") if line.startswith("UID:")]
+        assert uids == ["UID:3@sbnewcomers.org", "UID:4@sbnewcomers.org"]
+
+    def test_lines_folded_and_crlf(self, seeded_db):
+        rows = make_events(1)
+        long_details = "Très long détail, avec virgules; " * 20
+        seeded_db([rows[0][:5] + (long_details,) + rows[0][6:]])
+        body = client.get("/api/calendar/feed.ics?audience=member").content
+        for line in body.split(b"\r\n"):
+            assert len(line) <= 75
+            assert b"\n" not in line
+
+    def test_offset_times_converted_to_local(self, seeded_db):
+        row = make_events(1)[0]
+        seeded_db([row[:2] + ("2099-07-04T19:00:00+00:00", "2099-07-04T21:00:00+00:00") + row[4:]])
+        body = client.get("/api/calendar/feed.ics?audience=member").text
+        assert "DTSTART;TZID=America/Los_Angeles:20990704T120000" in body
+        assert "DTEND;TZID=America/Los_Angeles:20990704T140000" in body
+
+    def test_conditional_get(self, seeded_db):
+        seeded_db(make_events(3))
+        first = client.get("/api/calendar/feed.ics")
+        assert "last-modified" in first.headers
+        again = client.get("/api/calendar/feed.ics",
+                           headers={"If-None-Match": first.headers["etag"]})
+        assert again.status_code == 304
+        since = client.get("/api/calendar/feed.ics",
+                           headers={"If-Modified-Since": first.headers["last-modified"]})
+        assert since.status_code == 304
+
+    def test_vevents_reused_until_event_changes(self, seeded_db):
+        seeded_db(make_events(3))
+        client.get("/api/calendar/feed.ics?audience=member")
+        misses = calendar_api.vevent_cache.misses
+        conn = sqlite3.connect(str(calendar_api.DB_PATH))
+        conn.execute("UPDATE events SET Name = 'Renamed' WHERE Id = 2")
+        conn.commit()
+        conn.close()
+        body = client.get("/api/calendar/feed.ics?audience=member").text
+        assert calendar_api.vevent_cache.misses == misses + 1
+        assert "SUMMARY:Renamed" in body
+
+
+# ============================================================================
+# LIVE CHANGE FEED
+# ============================================================================
+
+def execute_sql(*statements):
+    conn = sqlite3.connect(str(calendar_api.DB_PATH))
+    for sql, params in statements:
+        conn.execute(sql, params)
+    conn.commit()
+    conn.close()
+
+
+class TestChangeFeed:
+    """Verify versioned diffs over long-poll and SSE"""
+
+    def version(self):
+        return client.get("/api/calendar/changes/poll?since=0").json()["version"]
+
+    def poll(self, since, audience="member", timeout=0):
+        return client.get("/api/calendar/changes/poll", params={
+            "since": since, "audience": audience, "timeout": timeout}).json()
+
+    def test_since_zero_returns_current_version(self, seeded_db):
+        seeded_db(make_events(3))
+        data = self.poll(0)
+        assert data["version"] > 0
+        assert data["changes"] == []
+        assert data["reset"] is False
+
+    def test_registration_change_is_member_only(self, seeded_db):
+        seeded_db(make_events(3))
+        since = self.version()
+        execute_sql(("UPDATE events SET ConfirmedRegistrationsCount = 20 WHERE Id = 1", ()))
+        calendar_api.change_watcher.check_now()
+
+        member = self.poll(since)
+        assert member["changes"][0]["changed"] == [{
+            "Id": 1, "ConfirmedRegistrationsCount": 20, "SpotsAvailable": 0, "IsFull": True
+        }]
+        assert self.poll(since, audience="public")["changes"] == []
+
+    def test_added_and_removed_events(self, seeded_db):
+        seeded_db(make_events(3))
+        since = self.version()
+        new_public, new_member = make_events(5)[3:]
+        execute_sql(
+            ("INSERT INTO events VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)", new_public),
+            ("INSERT INTO events VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)", new_member),
+            ("DELETE FROM events WHERE Id = 1", ()),
+        )
+        calendar_api.change_watcher.check_now()
+
+        member = self.poll(since)["changes"][0]
+        assert [e["Id"] for e in member["added"]] == [4, 5]
+        assert member["removed"] == [1]
+
+        public = self.poll(since, audience="public")["changes"][0]
+        assert [e["Id"] for e in public["added"]] == [5]
+        for event in public["added"]:
+            assert "ConfirmedRegistrationsCount" not in event
+            assert "SpotsAvailable" not in event
+
+    def test_long_poll_woken_by_change(self, seeded_db):
+        seeded_db(make_events(3))
+        since = self.version()
+        result = {}
+
+        def waiter():
+            started = time.monotonic()
+            result["data"] = self.poll(since, timeout=10)
+            result["elapsed"] = time.monotonic() - started
+
+        thread = threading.Thread(target=waiter)
+        thread.start()
+        time.sleep(0.3)
+        execute_sql(("UPDATE events SET Name = 'Moved' WHERE Id = 2", ()))
+        calendar_api.change_watcher.check_now()
+        thread.join(timeout=10)
+
+        assert result["elapsed"] < 5
+        assert result["data"]["changes"][0]["changed"] == [{"Id": 2, "Name": "Moved"}]
+
+    def test_stale_version_requests_reset(self, seeded_db):
+        seeded_db(make_events(3))
+        self.version()
+        assert self.poll(1)["reset"] is True
+
+    def test_unknown_version_requests_reset(self, seeded_db):
+        seeded_db(make_events(3))
+        since = self.version()
+        # A newer version issued by another worker process
+        data = self.poll(since + 5, timeout=10)
+        assert data["reset"] is True
+        assert data["version"] == since
+
+    def test_sse_stream_replays_changes(self, seeded_db):
+        seeded_db(make_events(3))
+        since = self.version()
+        execute_sql(("UPDATE events SET Name = 'Moved' WHERE Id = 3", ()))
+        calendar_api.change_watcher.check_now()
+
+        async def first_messages(count):
+            stream = calendar_api.change_event_stream(None, "public", since)
+            messages = [await stream.__anext__() for _ in range(count)]
+            await stream.aclose()
+            return messages
+
+        version_msg, change_msg = asyncio.run(first_messages(2))
+        assert "event: version" in version_msg
+        assert "event: change" in change_msg
+        assert '"Name":"Moved"' in change_msg
+
+
 # ============================================================================
 # CONFIG ENDPOINT
 # ============================================================================
@@ -278,6 +1018,302 @@ class TestConfigEndpoint:
         assert mem["showAvailability"] == True
 
 
+# ============================================================================
+# METRICS
+# ============================================================================
+
+def metric_value(text, sample):
+    """Value of the exposition line that starts with `sample`, or None."""
+    for line in text.splitlines():
+        if line.startswith(sample + " "):
+            return float(line.rsplit(" ", 1)[1])
+    return None
+
+
+class TestMetrics:
+    """Verify the Prometheus endpoint and request middleware"""
+
+    def test_disabled_by_default(self):
+        assert client.get("/metrics").status_code == 404
+
+    def test_route_counts_latency_and_size(self, seeded_db, monkeypatch):
+        seeded_db(make_events(3))
+        monkeypatch.setattr(calendar_api, "METRICS_ENABLED", True)
+        client.get("/api/calendar/event/1?audience=member")
+        client.get("/api/calendar/event/2?audience=member")
+
+        response = client.get("/metrics")
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        text = response.text
+
+        route = 'org="default",route="/api/calendar/event/{event_id}"'
+        assert metric_value(
+            text, f'clubcal_http_requests_total{{{route},method="GET",status="200"}}'
+        ) >= 2
+        assert metric_value(
+            text, f'clubcal_http_request_duration_seconds_bucket{{{route},le="+Inf"}}'
+        ) >= 2
+        assert metric_value(text, f"clubcal_http_response_size_bytes_sum{{{route}}}") > 0
+        assert 'clubcal_db_query_duration_seconds_count{org="default",' in text
+
+    def test_cache_ratio_and_freshness(self, seeded_db, monkeypatch):
+        seeded_db(make_events(3))
+        monkeypatch.setattr(calendar_api, "METRICS_ENABLED", True)
+        client.get("/api/calendar/events")
+        client.get("/api/calendar/events")
+
+        text = client.get("/metrics").text
+        assert 0 < metric_value(text, 'clubcal_cache_hit_ratio{org="default",cache="query"}') <= 1
+        assert metric_value(text, 'clubcal_data_age_seconds{org="default"}') >= 0
+
+    def test_unmatched_paths_share_one_label(self, monkeypatch):
+        monkeypatch.setattr(calendar_api, "METRICS_ENABLED", True)
+        client.get("/no/such/path/1")
+        client.get("/no/such/path/2")
+        text = client.get("/metrics").text
+        assert "/no/such/path" not in text
+        assert metric_value(
+            text,
+            'clubcal_http_requests_total{org="default",route="<unmatched>",method="GET",status="404"}'
+        ) >= 2
+
+
+# ============================================================================
+# MULTI-CLUB SERVING
+# ============================================================================
+
+def write_org(orgs_dir, org_id, events, **config):
+    """Create orgs/<org_id>/config.json and wa.db; returns the config path."""
+    org_dir = orgs_dir / org_id
+    org_dir.mkdir(parents=True, exist_ok=True)
+    create_test_db(str(org_dir / "wa.db"), events)
+    config_path = org_dir / "config.json"
+    config_path.write_text(json.dumps(config))
+    return config_path
+
+
+@pytest.fixture
+def orgs_dir(tmp_path, monkeypatch):
+    """A fresh ORGS_DIR and org registry for each test."""
+    path = tmp_path / "orgs"
+    path.mkdir()
+    registry = calendar_api.OrgRegistry()
+    monkeypatch.setattr(calendar_api, "ORGS_DIR", path)
+    monkeypatch.setattr(calendar_api, "org_registry", registry)
+    monkeypatch.setattr(calendar_api, "ORG_CONFIG_CHECK_SECONDS", 0)
+    yield path
+    registry.close_all()
+
+
+class TestMultiClub:
+    """Verify org-scoped routes, configs, CORS and bounded open orgs"""
+
+    def test_org_routes_use_org_database(self, seeded_db, orgs_dir):
+        seeded_db(make_events(2))
+        write_org(orgs_dir, "alpha", make_events(6))
+
+        org = client.get("/orgs/alpha/api/calendar/events/member").json()
+        assert org["count"] == 6
+        assert client.get("/api/calendar/events/member").json()["count"] == 2
+        assert client.get("/orgs/alpha/api/calendar/event/5?audience=member").status_code == 200
+        assert client.get("/api/calendar/event/5?audience=member").status_code == 404
+
+    def test_unknown_org_is_404(self, orgs_dir):
+        response = client.get("/orgs/nosuchclub/api/calendar/events")
+        assert response.status_code == 404
+        assert response.json()["detail"] == "Unknown organization"
+
+    def test_config_served_and_hot_reloaded(self, orgs_dir):
+        config_path = write_org(
+            orgs_dir, "alpha", make_events(1),
+            organization={"name": "Alpha Club", "domain": "alpha.example"},
+            api={"allowedOrigins": ["https://alpha.example"]},
+        )
+        data = client.get("/orgs/alpha/api/calendar/config").json()
+        assert data == {"organization": {"name": "Alpha Club", "domain": "alpha.example"}}
+
+        config_path.write_text(json.dumps({"organization": {"name": "Alpha Renamed"}}))
+        os.utime(config_path, ns=(time.time_ns(), time.time_ns() + 10**9))
+        data = client.get("/orgs/alpha/api/calendar/config").json()
+        assert data["organization"]["name"] == "Alpha Renamed"
+
+    def test_timezone_per_org(self, seeded_db, orgs_dir):
+        row = make_events(1)[0]
+        row = row[:2] + ("2099-07-04T23:30:00+00:00", "2099-07-05T01:30:00+00:00") + row[4:]
+        seeded_db([row])
+        write_org(orgs_dir, "london", [row], api={"timezone": "Europe/London"})
+
+        assert "2099-07-04" in client.get("/api/calendar/events/member").json()["days"]
+        assert "2099-07-05" in client.get("/orgs/london/api/calendar/events/member").json()["days"]
+
+        body = client.get("/orgs/london/api/calendar/feed.ics?audience=member").text
+        assert "TZID:Europe/London" in body
+        assert "DTSTART;TZID=Europe/London:20990705T003000" in body
+        assert "TZNAME:BST" in body
+
+    def test_vtimezone_rules_follow_feed_year(self, seeded_db, orgs_dir, monkeypatch):
+        # Mexico City dropped daylight time in late 2022
+        write_org(orgs_dir, "mexico", make_events(1), api={"timezone": "America/Mexico_City"})
+
+        monkeypatch.setattr(calendar_api, "utc_today", lambda: date(2021, 6, 1))
+        body = client.get("/orgs/mexico/api/calendar/feed.ics").text
+        assert "BEGIN:DAYLIGHT" in body
+
+        monkeypatch.setattr(calendar_api, "utc_today", lambda: date(2027, 6, 1))
+        body = client.get("/orgs/mexico/api/calendar/feed.ics").text
+        assert "BEGIN:DAYLIGHT" not in body
+        assert "TZOFFSETTO:-0600" in body
+
+    def test_cors_origins_per_org(self, orgs_dir):
+        write_org(orgs_dir, "alpha", make_events(1), organization={"domain": "alpha.example"})
+        write_org(orgs_dir, "beta", make_events(1), organization={"domain": "beta.example"})
+        headers = {"Origin": "https://alpha.example"}
+
+        allowed = client.get("/orgs/alpha/api/calendar/config", headers=headers)
+        assert allowed.headers["access-control-allow-origin"] == "https://alpha.example"
+        denied = client.get("/orgs/beta/api/calendar/config", headers=headers)
+        assert "access-control-allow-origin" not in denied.headers
+
+    def test_db_metrics_labelled_by_org(self, seeded_db, orgs_dir, monkeypatch):
+        seeded_db(make_events(2))
+        write_org(orgs_dir, "alpha", make_events(3))
+        monkeypatch.setattr(calendar_api, "METRICS_ENABLED", True)
+        client.get("/orgs/alpha/api/calendar/event/1?audience=member")
+        monkeypatch.setattr(calendar_api, "DB_MAX_PENDING", 0)
+        assert client.get("/orgs/alpha/api/calendar/event/2?audience=member").status_code == 503
+        monkeypatch.setattr(calendar_api, "DB_MAX_PENDING", 64)
+
+        text = client.get("/metrics").text
+        assert 'clubcal_db_query_duration_seconds_count{org="alpha",' in text
+        assert metric_value(text, 'clubcal_db_shed_total{org="alpha"}') >= 1
+        # One executor serves every org, so its queue depth has no org label
+        assert metric_value(text, "clubcal_db_pending") == 0
+
+    def test_least_recently_used_org_closed(self, orgs_dir, monkeypatch):
+        monkeypatch.setattr(calendar_api, "ORG_MAX_OPEN", 1)
+        write_org(orgs_dir, "alpha", make_events(2))
+        write_org(orgs_dir, "beta", make_events(3))
+
+        client.get("/orgs/alpha/api/calendar/events")
+        client.get("/orgs/beta/api/calendar/events")
+        assert [o.org_id for o in calendar_api.org_registry.open_orgs()] == ["beta"]
+        assert client.get("/orgs/alpha/api/calendar/events/member").json()["count"] == 2
+
+    def test_metrics_labelled_by_org(self, seeded_db, orgs_dir, monkeypatch):
+        seeded_db(make_events(1))
+        write_org(orgs_dir, "alpha", make_events(2))
+        monkeypatch.setattr(calendar_api, "METRICS_ENABLED", True)
+        client.get("/orgs/alpha/api/calendar/events")
+        client.get("/orgs/alpha/api/calendar/events")
+
+        text = client.get("/metrics").text
+        assert metric_value(
+            text,
+            'clubcal_http_requests_total{org="alpha",route="/api/calendar/events",'
+            'method="GET",status="200"}'
+        ) >= 2
+        assert metric_value(text, 'clubcal_cache_hits_total{org="alpha",cache="query"}') >= 1
+
+
+# ============================================================================
+# LISTING SNAPSHOTS
+# ============================================================================
+
+@pytest.fixture
+def snapshots(seeded_db, tmp_path, monkeypatch):
+    """Enable snapshots; returns a function that seeds wa.db and builds them."""
+    monkeypatch.setattr(calendar_api, "SNAPSHOT_DIR", tmp_path / "snapshots")
+    builder = calendar_api.default_org.snapshot_builder
+
+    def build(events):
+        seeded_db(events)
+        builder.check_now()
+        return builder
+
+    yield build
+    builder.stop()
+
+
+def without_timestamp(data):
+    data.pop("timestamp")
+    return data
+
+
+class TestListingSnapshots:
+    """Verify pre-rendered listings match the rendered path and keep PII rules"""
+
+    def test_snapshot_matches_rendered_listing(self, snapshots, monkeypatch):
+        snapshots(make_events(6))
+        paths = ("/api/calendar/events", "/api/calendar/events/member")
+        served = [client.get(path, headers={"Accept-Encoding": "gzip"}) for path in paths]
+        monkeypatch.setattr(calendar_api, "SNAPSHOT_DIR", None)
+        rendered = [client.get(path) for path in paths]
+
+        for snapshot, response in zip(served, rendered):
+            assert snapshot.headers["content-encoding"] == "gzip"
+            assert snapshot.headers["etag"]
+            assert "etag" not in response.headers
+            assert without_timestamp(snapshot.json()) == without_timestamp(response.json())
+
+    def test_filtered_requests_bypass_snapshot(self, snapshots):
+        snapshots(make_events(6))
+        response = client.get("/api/calendar/events/member?limit=2")
+        assert "etag" not in response.headers
+        assert response.json()["count"] == 2
+
+    def test_public_snapshot_only_projected_columns(self, snapshots):
+        snapshots(make_events(6))
+        data = client.get("/api/calendar/events").json()
+        assert data["count"] == 3
+        for event in data["events"]:
+            assert set(event) <= calendar_api.PUBLIC_LISTING_COLUMNS
+
+    def test_projection_violation_fails_closed(self, snapshots, monkeypatch):
+        builder = snapshots(make_events(3))
+        execute_sql(("UPDATE events SET Name = 'Renamed' WHERE Id = 1", ()))
+        monkeypatch.setattr(calendar_api, "PUBLIC_LISTING_COLUMNS",
+                            frozenset({"Id", "Name", "StartDate", "EndDate"}))
+        calendar_api.query_cache.clear()
+        with pytest.raises(calendar_api.HTTPException):
+            builder.check_now()
+        assert builder.get("public") is None
+        assert client.get("/api/calendar/events").status_code == 500
+
+    def test_rebuilt_after_db_write(self, snapshots):
+        builder = snapshots(make_events(3))
+        etag = client.get("/api/calendar/events/member").headers["etag"]
+        assert builder.check_now() is False
+
+        execute_sql(("UPDATE events SET Name = 'Renamed' WHERE Id = 2", ()))
+        assert builder.check_now() is True
+        response = client.get("/api/calendar/events/member")
+        assert response.headers["etag"] != etag
+        assert response.json()["events"][1]["Name"] == "Renamed"
+
+    def test_identity_range_and_not_modified(self, snapshots):
+        snapshots(make_events(3))
+        full = client.get("/api/calendar/events", headers={"Accept-Encoding": "identity"})
+        assert "content-encoding" not in full.headers
+        assert full.headers["accept-ranges"] == "bytes"
+
+        part = client.get("/api/calendar/events",
+                          headers={"Accept-Encoding": "identity", "Range": "bytes=0-9"})
+        assert part.status_code == 206
+        assert part.content == full.content[:10]
+
+        cached = client.get("/api/calendar/events", headers={
+            "Accept-Encoding": "identity", "If-None-Match": full.headers["etag"]})
+        assert cached.status_code == 304
+
+    def test_encoding_negotiation(self):
+        available = {"identity": None, "gzip": None, "br": None}
+        assert calendar_api.negotiate_encoding("gzip, br", available) == "br"
+        assert calendar_api.negotiate_encoding("gzip, br;q=0", available) == "gzip"
+        assert calendar_api.negotiate_encoding("", available) == "identity"
+        assert calendar_api.negotiate_encoding("*", {"identity": None, "gzip": None}) == "gzip"
+
+
 # ============================================================================
 # HEALTH CHECK
 # ============================================================================
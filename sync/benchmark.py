@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+"""
+ClubCalendar Sync Benchmarks
+============================
+Measures the sync transform and publish pipeline on generated Wild Apricot
+payloads, so performance changes are measured instead of guessed.
+
+Benchmarks (each at every --sizes scale):
+    auto_tags   apply_auto_tags over all events
+    transform   transform_event over all events
+    sync        the full sync_events loop with an in-memory WA client
+    save        LocalFileStorage.save_events of the transformed events
+    sync_http   sync_events end to end over HTTP against wa_simulator
+                (only with --simulator; --sim-latency/--sim-page-size apply)
+
+Each reports events/second (best of --repeat runs) and peak traced memory
+(from a separate run, so tracing does not skew the timing).
+
+Usage:
+    python benchmark.py --sizes 100,10000,100000 --rules 50
+    python benchmark.py --save-baseline          # record this machine's baseline
+    python benchmark.py --check --threshold 0.2  # exit 1 on a >20% regression
+
+Baselines are machine-specific: record them on the machine that runs --check.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import logging
+import argparse
+import tempfile
+import tracemalloc
+from contextlib import ExitStack
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import sync
+from config import SyncConfig, DeploymentType, WildApricotConfig, CustomServerConfig
+from storage import LocalFileStorage
+from scheduler import RateLimitScheduler
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE = os.path.join(HERE, 'benchmark_baselines.json')
+
+# Fixed so every run (and every machine) benchmarks identical payloads
+GENERATOR_EPOCH = datetime(2026, 1, 5, 0, 0, 0)
+
+COMMITTEES = [
+    'Happy Hikers', 'Games!', 'Wine Appreciation', 'Garden', 'TGIF',
+    'Epicurious', 'Wellness', 'Book Club', 'Cycling', 'Theater'
+]
+ACTIVITIES = [
+    'Rattlesnake Canyon Hike', 'Trivia Night', 'Pinot Tasting', 'Rose Pruning',
+    'Happy Hour', 'Dinner at Lucky\'s', 'Yoga in the Park', 'Book Discussion',
+    'Coast Ride', 'Ensemble Theatre Matinee', 'Potluck', 'Beach Walk'
+]
+LOCATIONS = [
+    'The Blue Dolphin, 123 State St', 'Rattlesnake Canyon Trailhead',
+    'The Library Bar, 456 Anacapa St', 'Alice Keck Park', 'Member home'
+]
+WORDS = (
+    'join us for a relaxed afternoon with fellow members bring water snacks '
+    'and a friend parking is limited carpool recommended rsvp required'
+).split()
+
+
+# =============================================================================
+# DATA GENERATION
+# =============================================================================
+
+def generate_events(count: int, seed: int = 42, description_bytes: int = 500,
+                    epoch: datetime = GENERATOR_EPOCH) -> List[Dict[str, Any]]:
+    """
+    Deterministic WA /events payloads.
+
+    Events are spread over the year after `epoch` across mornings,
+    afternoons and evenings, with a realistic mix of limits, access levels
+    and WA tags.
+    """
+    rng = random.Random(seed)
+    events = []
+
+    for i in range(count):
+        start = epoch + timedelta(
+            days=rng.randrange(365), hours=rng.choice((9, 10, 13, 15, 17, 18, 19))
+        )
+        limit = rng.choice((None, 0, 12, 20, 40, 100))
+        confirmed = rng.randrange((limit or 30) + 1)
+        name = f'{rng.choice(COMMITTEES)}: {rng.choice(ACTIVITIES)}'
+        if rng.random() < 0.02:
+            name = f'CANCELLED - {name}'
+
+        words = []
+        size = 0
+        while size < description_bytes:
+            word = rng.choice(WORDS)
+            words.append(word)
+            size += len(word) + 1
+
+        events.append({
+            'Id': 100000 + i,
+            'Name': name,
+            'StartDate': start.strftime('%Y-%m-%dT%H:%M:%S-08:00'),
+            'EndDate': (start + timedelta(hours=2)).strftime('%Y-%m-%dT%H:%M:%S-08:00'),
+            'Location': rng.choice(LOCATIONS),
+            'Details': {'DescriptionHtml': '<p>' + ' '.join(words) + '</p>'},
+            'AccessLevel': rng.choice(('Public', 'Public', 'Restricted')),
+            'Tags': rng.sample(['social', 'outdoors', 'food', 'wine', 'newcomer'], rng.randrange(3)),
+            'RegistrationEnabled': rng.random() < 0.9,
+            'RegistrationsLimit': limit,
+            'ConfirmedRegistrationsCount': confirmed,
+            'Url': f'https://sbnewcomers.org/event-{100000 + i}',
+            'RegistrationUrl': f'https://sbnewcomers.org/event-{100000 + i}/register',
+        })
+
+    return events
+
+
+def generate_rules(count: int, seed: int = 7) -> List[Dict[str, Any]]:
+    """Deterministic auto-tag rules cycling through all rule types."""
+    rng = random.Random(seed)
+    rule_types = ('name-prefix', 'name-contains', 'name-suffix')
+    rules = []
+
+    for i in range(count):
+        rule_type = rule_types[i % len(rule_types)]
+        if rule_type == 'name-prefix':
+            pattern = rng.choice(COMMITTEES) + ':'
+        elif rule_type == 'name-suffix':
+            pattern = rng.choice(ACTIVITIES).split()[-1]
+        else:
+            pattern = rng.choice(WORDS + [a.split()[0] for a in ACTIVITIES])
+        rules.append({'type': rule_type, 'pattern': pattern, 'tag': f'rule:{i}'})
+
+    return rules
+
+
+# =============================================================================
+# BENCHMARKS
+# =============================================================================
+
+class InMemoryWAClient:
+    """Stands in for WildApricotClient, serving pre-generated events."""
+
+    events: List[Dict[str, Any]] = []
+
+    def __init__(self, account_id: str, api_key: str, **options: Any):
+        self.scheduler = RateLimitScheduler()
+
+    def get_events(self, include_past_days: int = 0) -> List[Dict[str, Any]]:
+        return self.events
+
+
+def bench_config(data_directory: str) -> SyncConfig:
+    return SyncConfig(
+        deployment_type=DeploymentType.CUSTOM_SERVER,
+        org_id='bench',
+        wa_config=WildApricotConfig(account_id='bench', api_key='bench'),
+        custom_server=CustomServerConfig(
+            data_directory=data_directory,
+            config_file=os.path.join(data_directory, 'config.json'),
+            base_url=''
+        ),
+        delta_retention=0,
+        state_directory=os.path.join(data_directory, 'state')
+    )
+
+
+def build_benchmarks(events: List[Dict[str, Any]], rules: List[Dict[str, Any]],
+                     workdir: str) -> Dict[str, Callable[[], Any]]:
+    """Zero-argument callables, one per benchmark, over the given data."""
+    org_config = {'auto_tag_rules': rules}
+    config = bench_config(workdir)
+    storage = LocalFileStorage(config)
+    storage.save_config(config.org_id, org_config)
+    transformed = [sync.transform_event(e, org_config) for e in events]
+    output = {'_orgId': config.org_id, 'eventCount': len(transformed), 'events': transformed}
+
+    def run_sync() -> Any:
+        InMemoryWAClient.events = events
+        original = sync.WildApricotClient
+        sync.WildApricotClient = InMemoryWAClient
+        try:
+            # Start from nothing so every run publishes the same full file
+            storage.delete_document(config.org_id, 'events.json')
+            return sync.sync_events(config)
+        finally:
+            sync.WildApricotClient = original
+
+    return {
+        'auto_tags': lambda: [sync.apply_auto_tags(e, rules) for e in events],
+        'transform': lambda: [sync.build_event_record(e, org_config) for e in events],
+        'sync': run_sync,
+        'save': lambda: storage.save_events(config.org_id, output),
+    }
+
+
+def measure(fn: Callable[[], Any], repeat: int) -> Tuple[float, float]:
+    """(best wall seconds over `repeat` runs, peak traced KB of one run)."""
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return best, peak / 1024
+
+
+def http_sync_benchmark(events: List[Dict[str, Any]], rules: List[Dict[str, Any]], workdir: str,
+                        simulator: Any) -> Callable[[], Any]:
+    """sync_events over real HTTP against a running WASimulator."""
+    config = bench_config(workdir)
+    config.wa_config.api_url = simulator.api_url
+    config.wa_config.auth_url = simulator.auth_url
+    # Generated events start at GENERATOR_EPOCH; reach back far enough to fetch them all
+    config.include_past_days = (datetime.now() - GENERATOR_EPOCH).days + 1
+    # The simulator has no quota; measure the pipeline, not WA's rate limit.
+    # Own account id, since schedulers are shared per account.
+    config.wa_config.account_id = 'bench-http'
+    config.wa_config.rate_limit_per_minute = 1_000_000
+    storage = LocalFileStorage(config)
+    storage.save_config(config.org_id, {'auto_tag_rules': rules})
+
+    def run_sync() -> Any:
+        storage.delete_document(config.org_id, 'events.json')
+        return sync.sync_events(config)
+
+    return run_sync
+
+
+def run(sizes: List[int], rule_count: int, description_bytes: int, repeat: int,
+        only: List[str], simulator_options: Optional[Dict[str, Any]] = None) -> Dict[str, Dict[str, float]]:
+    """Run every benchmark at every size; results keyed by 'name@size'."""
+    rules = generate_rules(rule_count)
+    results: Dict[str, Dict[str, float]] = {}
+
+    for size in sizes:
+        events = generate_events(size, description_bytes=description_bytes)
+        with tempfile.TemporaryDirectory() as workdir, ExitStack() as stack:
+            benchmarks = build_benchmarks(events, rules, workdir)
+            if simulator_options is not None and (not only or 'sync_http' in only):
+                # Imported here: the simulator imports this module's generator
+                from wa_simulator import WASimulator
+                simulator = stack.enter_context(WASimulator(events=events, **simulator_options))
+                benchmarks['sync_http'] = http_sync_benchmark(
+                    events, rules, os.path.join(workdir, 'http'), simulator
+                )
+
+            for name, fn in benchmarks.items():
+                if only and name not in only:
+                    continue
+                seconds, peak_kb = measure(fn, repeat)
+                results[f'{name}@{size}'] = {
+                    'events': size,
+                    'seconds': round(seconds, 6),
+                    'eventsPerSec': round(size / seconds, 1) if seconds else 0.0,
+                    'peakKb': round(peak_kb, 1)
+                }
+
+    return results
+
+
+# =============================================================================
+# BASELINES
+# =============================================================================
+
+def check_regressions(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]],
+                      threshold: float) -> List[str]:
+    """Describe every result slower or larger than baseline by more than threshold."""
+    failures = []
+
+    for key, result in results.items():
+        base = baseline.get(key)
+        if base is None:
+            continue
+
+        if result['eventsPerSec'] < base['eventsPerSec'] * (1 - threshold):
+            failures.append(
+                f"{key}: {result['eventsPerSec']:.0f} events/s vs baseline {base['eventsPerSec']:.0f}"
+            )
+        if result['peakKb'] > base['peakKb'] * (1 + threshold):
+            failures.append(
+                f"{key}: peak {result['peakKb']:.0f} KB vs baseline {base['peakKb']:.0f} KB"
+            )
+
+    return failures
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='ClubCalendar sync benchmarks')
+    parser.add_argument('--sizes', default='100,1000,10000',
+                        help='comma-separated event counts (up to 1000000)')
+    parser.add_argument('--rules', type=int, default=20, help='number of auto-tag rules')
+    parser.add_argument('--description-bytes', type=int, default=500)
+    parser.add_argument('--repeat', type=int, default=3, help='timed runs per benchmark (best kept)')
+    parser.add_argument('--only', default='', help='comma-separated benchmark names')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='baseline JSON file')
+    parser.add_argument('--save-baseline', action='store_true', help='write results as the baseline')
+    parser.add_argument('--check', action='store_true', help='fail if results regress past --threshold')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='allowed fractional regression (0.2 = 20%%)')
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    parser.add_argument('--simulator', action='store_true',
+                        help='also run sync_http against a local WA simulator')
+    parser.add_argument('--sim-latency', type=float, default=0.0, help='simulated seconds per WA call')
+    parser.add_argument('--sim-page-size', type=int, default=100, help='simulated WA page size')
+    args = parser.parse_args()
+
+    # Keep per-save/per-sync INFO lines out of the benchmark output
+    logging.disable(logging.INFO)
+
+    sizes = [int(s) for s in args.sizes.split(',') if s]
+    only = [s for s in args.only.split(',') if s]
+    simulator_options = None
+    if args.simulator:
+        simulator_options = {'latency': args.sim_latency, 'page_size': args.sim_page_size}
+    results = run(sizes, args.rules, args.description_bytes, args.repeat, only, simulator_options)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"{'benchmark':<20} {'events/s':>12} {'seconds':>10} {'peak KB':>10}")
+        for key, r in results.items():
+            print(f"{key:<20} {r['eventsPerSec']:>12.0f} {r['seconds']:>10.4f} {r['peakKb']:>10.1f}")
+
+    if args.save_baseline:
+        baseline = {
+            '_generated': datetime.utcnow().isoformat() + 'Z',
+            '_python': sys.version.split()[0],
+            'rules': args.rules,
+            'descriptionBytes': args.description_bytes,
+            'results': results
+        }
+        with open(args.baseline, 'w') as f:
+            json.dump(baseline, f, indent=2)
+        print(f"Saved baseline to {args.baseline}")
+
+    if args.check:
+        if not os.path.exists(args.baseline):
+            print(f"No baseline at {args.baseline}; run with --save-baseline first")
+            sys.exit(2)
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+        if (baseline.get('rules'), baseline.get('descriptionBytes')) != (args.rules, args.description_bytes):
+            print("Warning: baseline was recorded with different --rules/--description-bytes")
+
+        failures = check_regressions(results, baseline.get('results', {}), args.threshold)
+        if failures:
+            print(f"Regressions beyond {args.threshold:.0%}:")
+            for failure in failures:
+                print(f"  {failure}")
+            sys.exit(1)
+        print(f"No regressions beyond {args.threshold:.0%}")
+
+
+if __name__ == '__main__':
+    main()
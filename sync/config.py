@@ -11,7 +11,7 @@ Supported backends:
 import os
 import json
 from enum import Enum
-from typing import Optional
+from typing import Any, Dict, Optional
 from dataclasses import dataclass, field
 
 
@@ -35,6 +35,16 @@ class CustomServerConfig:
     data_directory: str  # Where to write events.json
     config_file: str     # Path to config.json
     base_url: str        # Public URL base for the files
+    database_path: Optional[str] = None  # Also upsert events into this SQLite db
+
+
+# Private sync state (caches, profiles); never under the published data
+# directory. Next to the sync scripts, which the sync user owns.
+DEFAULT_STATE_DIRECTORY = '/opt/clubcalendar/state'
+
+
+WA_API_URL = "https://api.wildapricot.org/v2.2"
+WA_AUTH_URL = "https://oauth.wildapricot.org/auth/token"
 
 
 @dataclass
@@ -44,6 +54,12 @@ class WildApricotConfig:
     api_key: str
     client_id: Optional[str] = None
     client_secret: Optional[str] = None
+    # Overridable to point the sync at a local simulator (see wa_simulator.py)
+    api_url: str = WA_API_URL
+    auth_url: str = WA_AUTH_URL
+    # Request quota shared by all syncs for this account (see scheduler.py)
+    rate_limit_per_minute: int = 120
+    max_concurrency: int = 4
 
 
 @dataclass
@@ -60,6 +76,20 @@ class SyncConfig:
     # Sync settings
     include_past_days: int = 0
     sync_interval_minutes: int = 15
+    availability_interval_minutes: int = 2  # Fast-lane registration-count sync
+    delta_retention: int = 96  # Published deltas kept (0 disables deltas)
+    daemon_socket: Optional[str] = None  # Control socket for daemon.py
+
+    # Local, unpublished directory for caches and CLUBCAL_SYNC_PROFILE reports
+    state_directory: str = DEFAULT_STATE_DIRECTORY
+
+
+def sync_setting(file_sync: Dict[str, Any], env_name: str, key: str, default: int) -> int:
+    """Integer sync setting: environment variable, then config.json "sync" block."""
+    value = os.environ.get(env_name)
+    if value is None:
+        value = file_sync.get(key, default)
+    return int(value)
 
 
 def load_config() -> SyncConfig:
@@ -77,7 +107,11 @@ def load_config() -> SyncConfig:
         account_id=os.environ.get('WA_ACCOUNT_ID', ''),
         api_key=os.environ.get('WA_API_KEY', ''),
         client_id=os.environ.get('WA_CLIENT_ID'),
-        client_secret=os.environ.get('WA_CLIENT_SECRET')
+        client_secret=os.environ.get('WA_CLIENT_SECRET'),
+        api_url=os.environ.get('WA_API_URL', WA_API_URL),
+        auth_url=os.environ.get('WA_AUTH_URL', WA_AUTH_URL),
+        rate_limit_per_minute=int(os.environ.get('WA_RATE_LIMIT', '120')),
+        max_concurrency=int(os.environ.get('WA_MAX_CONCURRENCY', '4'))
     )
 
     org_id = os.environ.get('ORG_ID', 'default')
@@ -85,6 +119,7 @@ def load_config() -> SyncConfig:
     # Load deployment-specific config
     google_cloud = None
     custom_server = None
+    file_config: Dict[str, Any] = {}
 
     if deployment_type == DeploymentType.GOOGLE_CLOUD:
         google_cloud = GoogleCloudConfig(
@@ -103,7 +138,8 @@ def load_config() -> SyncConfig:
             custom_server = CustomServerConfig(
                 data_directory=file_config.get('data_directory', '/var/www/clubcalendar/data'),
                 config_file=config_file,
-                base_url=file_config.get('base_url', '')
+                base_url=file_config.get('base_url', ''),
+                database_path=os.environ.get('CLUBCAL_DB_PATH', file_config.get('database_path'))
             )
 
             # Override WA config from file if not in environment
@@ -118,17 +154,28 @@ def load_config() -> SyncConfig:
             custom_server = CustomServerConfig(
                 data_directory=os.environ.get('CLUBCAL_DATA_DIR', '/var/www/clubcalendar/data'),
                 config_file=config_file,
-                base_url=os.environ.get('CLUBCAL_BASE_URL', '')
+                base_url=os.environ.get('CLUBCAL_BASE_URL', ''),
+                database_path=os.environ.get('CLUBCAL_DB_PATH')
             )
 
+    file_sync = file_config.get('sync', {})
+    state_directory = os.environ.get(
+        'CLUBCAL_STATE_DIR', file_config.get('state_directory', DEFAULT_STATE_DIRECTORY)
+    )
+
     return SyncConfig(
         deployment_type=deployment_type,
         org_id=org_id,
         wa_config=wa_config,
         google_cloud=google_cloud,
         custom_server=custom_server,
-        include_past_days=int(os.environ.get('INCLUDE_PAST_DAYS', '0')),
-        sync_interval_minutes=int(os.environ.get('SYNC_INTERVAL', '15'))
+        include_past_days=sync_setting(file_sync, 'INCLUDE_PAST_DAYS', 'include_past_days', 0),
+        sync_interval_minutes=sync_setting(file_sync, 'SYNC_INTERVAL', 'interval_minutes', 15),
+        availability_interval_minutes=sync_setting(
+            file_sync, 'AVAILABILITY_SYNC_INTERVAL', 'availability_interval_minutes', 2),
+        delta_retention=sync_setting(file_sync, 'DELTA_RETENTION', 'delta_retention', 96),
+        daemon_socket=os.environ.get('CLUBCAL_SYNC_SOCKET'),
+        state_directory=state_directory
     )
 
 
@@ -145,9 +192,14 @@ EXAMPLE_CONFIG = """
 
     "data_directory": "/var/www/clubcalendar/data",
     "base_url": "https://mail.sbnewcomers.org/clubcalendar",
+    "timezone": "America/Los_Angeles",
+    "database_path": "/opt/clubcalendar/wa.db",
+    "state_directory": "/opt/clubcalendar/state",
 
     "sync": {
         "interval_minutes": 15,
+        "availability_interval_minutes": 2,
+        "delta_retention": 96,
         "include_past_days": 0
     },
 
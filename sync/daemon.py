@@ -0,0 +1,401 @@
+#!/usr/bin/env python3
+"""
+ClubCalendar Sync Daemon
+========================
+Long-running alternative to running sync.py from cron on a custom server.
+
+The daemon loads its configuration once and keeps the WA client (with its
+token and pooled connections), storage backend and org config warm between
+runs. It schedules:
+
+    full sync          every sync.interval_minutes (SYNC_INTERVAL)
+    availability sync  every sync.availability_interval_minutes
+                       (AVAILABILITY_SYNC_INTERVAL; 0 disables)
+
+with +/-10% jitter. Intervals come from config.json's "sync" block; the
+environment overrides. Runs never overlap; a run that overruns its interval
+pushes the next one back instead of queueing a backlog.
+
+Triggers:
+    SIGUSR1            full sync now
+    SIGUSR2            availability sync now
+    SIGHUP             reload org config
+    SIGTERM / SIGINT   finish the current run and exit
+    control socket     CLUBCAL_SYNC_SOCKET; one command per connection:
+                       sync | availability | reload | status
+
+Usage:
+    python daemon.py                      # run in the foreground
+    python daemon.py --status             # print state; exit 1 if unhealthy
+    python daemon.py --trigger sync       # request a full sync now
+"""
+
+import os
+import json
+import time
+import queue
+import random
+import signal
+import socket
+import logging
+import argparse
+import threading
+import socketserver
+from dataclasses import dataclass, asdict
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from config import load_config, SyncConfig
+from storage import create_storage_backend
+from sync import create_wa_client, run_traced, _sync_events, _sync_availability
+
+logger = logging.getLogger(__name__)
+
+# Scheduled runs are spread by up to this fraction of their interval
+JITTER_FRACTION = 0.1
+
+# Unhealthy after this many failed runs in a row, or when the last
+# successful full sync is older than this many intervals
+MAX_CONSECUTIVE_FAILURES = 3
+STALE_INTERVALS = 3
+
+COMMANDS = ('sync', 'availability', 'reload', 'status')
+
+
+@dataclass
+class JobState:
+    """Schedule and last-run state of one daemon job."""
+    name: str
+    interval: float  # seconds; 0 means triggered only
+    next_run: Optional[float] = None  # time.monotonic() deadline
+    runs: int = 0
+    failures: int = 0
+    consecutive_failures: int = 0
+    overruns: int = 0
+    last_started: Optional[str] = None
+    last_duration_ms: Optional[float] = None
+    last_success: Optional[str] = None
+    last_error: Optional[str] = None
+    last_result: Optional[Dict[str, Any]] = None
+
+
+class SyncDaemon:
+    """Runs full and availability syncs on a schedule or on demand."""
+
+    def __init__(self, config: SyncConfig):
+        if not config.wa_config.account_id or not config.wa_config.api_key:
+            raise ValueError("Wild Apricot credentials not configured")
+
+        self.config = config
+        self.storage = create_storage_backend(config)
+        self.wa_client = create_wa_client(config)
+
+        self.jobs = {
+            'sync': JobState('sync', config.sync_interval_minutes * 60),
+            'availability': JobState('availability', config.availability_interval_minutes * 60),
+        }
+        self.running: Optional[str] = None
+        self.started_at = datetime.utcnow().isoformat() + 'Z'
+        self._started = time.monotonic()
+
+        self._org_config: Optional[Dict[str, Any]] = None
+        self._org_config_stamp: Optional[int] = None
+        self._reload = True
+
+        self._triggers: 'queue.Queue[str]' = queue.Queue()
+        self._pending: set = set()
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._server: Optional[socketserver.BaseServer] = None
+
+    # -------------------------------------------------------------------------
+    # Triggers
+    # -------------------------------------------------------------------------
+
+    def trigger(self, command: str) -> bool:
+        """
+        Queue a job (or a config reload) to run as soon as possible.
+
+        Returns False if it was already queued; repeated triggers coalesce.
+        """
+        if command == 'reload':
+            self._reload = True
+            return True
+        with self._lock:
+            if command in self._pending:
+                return False
+            self._pending.add(command)
+        self._triggers.put(command)
+        return True
+
+    def stop(self) -> None:
+        """Exit after the current run finishes."""
+        self._stopping.set()
+        self._triggers.put('stop')
+
+    def _install_signal_handlers(self) -> None:
+        # Handlers run on the main thread, which only waits on the worker
+        signal.signal(signal.SIGUSR1, lambda *_: self.trigger('sync'))
+        signal.signal(signal.SIGUSR2, lambda *_: self.trigger('availability'))
+        signal.signal(signal.SIGHUP, lambda *_: self.trigger('reload'))
+        signal.signal(signal.SIGTERM, lambda *_: self.stop())
+        signal.signal(signal.SIGINT, lambda *_: self.stop())
+
+    def _start_control_socket(self, path: str) -> None:
+        daemon = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self) -> None:
+                command = self.rfile.readline().decode().strip()
+                if command == 'status':
+                    reply = daemon.status()
+                elif command in COMMANDS:
+                    reply = {'command': command, 'queued': daemon.trigger(command)}
+                else:
+                    reply = {'error': f"Unknown command: {command}"}
+                self.wfile.write((json.dumps(reply, default=str) + '\n').encode())
+
+        # A socket left behind by a crashed daemon would block the bind
+        if os.path.exists(path):
+            os.unlink(path)
+        self._server = socketserver.ThreadingUnixStreamServer(path, Handler)
+        self._server.daemon_threads = True
+        os.chmod(path, 0o600)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        logger.info(f"Control socket listening on {path}")
+
+    # -------------------------------------------------------------------------
+    # Scheduling
+    # -------------------------------------------------------------------------
+
+    def _jittered(self, interval: float) -> float:
+        return interval * (1 + random.uniform(-JITTER_FRACTION, JITTER_FRACTION))
+
+    def _reschedule(self, job: JobState, scheduled: Optional[float]) -> None:
+        """
+        Set the job's next deadline after a run.
+
+        Scheduled runs keep their cadence; if the run took longer than the
+        interval, the missed slots are skipped rather than run back to back.
+        """
+        if not job.interval:
+            job.next_run = None
+            return
+
+        now = time.monotonic()
+        base = scheduled if scheduled is not None else now
+        next_run = base + self._jittered(job.interval)
+        if next_run <= now:
+            job.overruns += 1
+            logger.warning(
+                f"{job.name} run overran its {job.interval / 60:.0f} minute interval; "
+                f"skipping missed runs"
+            )
+            next_run = now + self._jittered(job.interval)
+        job.next_run = next_run
+
+    def _next_due(self) -> Optional[JobState]:
+        scheduled = [job for job in self.jobs.values() if job.next_run is not None]
+        return min(scheduled, key=lambda job: job.next_run) if scheduled else None
+
+    def _wait_for_work(self) -> Optional[str]:
+        """Block until a trigger arrives or the next job is due; None on stop."""
+        while not self._stopping.is_set():
+            due = self._next_due()
+            timeout = None if due is None else max(0.0, due.next_run - time.monotonic())
+            try:
+                command = self._triggers.get(timeout=timeout)
+            except queue.Empty:
+                return due.name
+            if command == 'stop':
+                return None
+            with self._lock:
+                self._pending.discard(command)
+            return command
+        return None
+
+    # -------------------------------------------------------------------------
+    # Runs
+    # -------------------------------------------------------------------------
+
+    def org_config(self) -> Dict[str, Any]:
+        """Org config, reloaded on SIGHUP/reload or when the config file changes."""
+        stamp = None
+        if self.config.custom_server:
+            try:
+                stamp = os.stat(self.config.custom_server.config_file).st_mtime_ns
+            except OSError:
+                pass
+
+        if self._reload or self._org_config is None or stamp != self._org_config_stamp:
+            self._org_config = self.storage.load_config(self.config.org_id)
+            self._org_config_stamp = stamp
+            self._reload = False
+            logger.info(f"Loaded config for org: {self.config.org_id}")
+
+        return self._org_config
+
+    def run_job(self, name: str) -> None:
+        """Run one job now, recording its outcome; never raises."""
+        job = self.jobs[name]
+        scheduled = job.next_run if job.next_run is not None and job.next_run <= time.monotonic() else None
+
+        with self._lock:
+            self.running = name
+            job.runs += 1
+            job.last_started = datetime.utcnow().isoformat() + 'Z'
+        started = time.monotonic()
+
+        try:
+            if name == 'sync':
+                result = run_traced('sync_events', _sync_events, self.config, self.storage,
+                                    wa_client=self.wa_client, org_config=self.org_config())
+            else:
+                result = run_traced('sync_availability', _sync_availability, self.config,
+                                    self.storage, wa_client=self.wa_client)
+        except Exception as e:
+            logger.error(f"{name} run failed: {e}", exc_info=True)
+            with self._lock:
+                job.failures += 1
+                job.consecutive_failures += 1
+                job.last_error = str(e)
+        else:
+            with self._lock:
+                job.consecutive_failures = 0
+                job.last_success = datetime.utcnow().isoformat() + 'Z'
+                job.last_error = None
+                job.last_result = {
+                    key: result.get(key)
+                    for key in ('eventCount', 'changedCount', 'version', 'url')
+                    if key in result
+                }
+        finally:
+            with self._lock:
+                self.running = None
+                job.last_duration_ms = round((time.monotonic() - started) * 1000, 2)
+                self._reschedule(job, scheduled)
+
+                # A full sync refreshes availability too
+                availability = self.jobs['availability']
+                if name == 'sync' and availability.interval:
+                    availability.next_run = time.monotonic() + self._jittered(availability.interval)
+
+    def _work(self) -> None:
+        # Publish once at startup; availability waits for its first interval
+        self.jobs['sync'].next_run = time.monotonic()
+
+        while True:
+            name = self._wait_for_work()
+            if name is None:
+                break
+            self.run_job(name)
+
+    def run(self) -> None:
+        """Run until SIGTERM/SIGINT."""
+        self._install_signal_handlers()
+        if self.config.daemon_socket:
+            self._start_control_socket(self.config.daemon_socket)
+
+        logger.info(
+            f"Sync daemon started for org {self.config.org_id}: full sync every "
+            f"{self.config.sync_interval_minutes} min, availability every "
+            f"{self.config.availability_interval_minutes} min"
+        )
+
+        worker = threading.Thread(target=self._work, name='sync-worker')
+        worker.start()
+        try:
+            while worker.is_alive():
+                worker.join(1.0)
+        finally:
+            if self._server:
+                self._server.shutdown()
+                self._server.server_close()
+                os.unlink(self.config.daemon_socket)
+            logger.info("Sync daemon stopped")
+
+    # -------------------------------------------------------------------------
+    # Health
+    # -------------------------------------------------------------------------
+
+    def healthy(self) -> bool:
+        """False after repeated failures or when published data is stale."""
+        with self._lock:
+            jobs = list(self.jobs.values())
+            sync_job = self.jobs['sync']
+            last_success = sync_job.last_success
+
+        if any(job.consecutive_failures >= MAX_CONSECUTIVE_FAILURES for job in jobs):
+            return False
+
+        stale_after = STALE_INTERVALS * sync_job.interval
+        if not stale_after:
+            return True
+        if last_success is None:
+            return time.monotonic() - self._started < stale_after
+        age = datetime.utcnow() - datetime.fromisoformat(last_success.rstrip('Z'))
+        return age.total_seconds() < stale_after
+
+    def status(self) -> Dict[str, Any]:
+        """Daemon and per-job state, as returned by the `status` command."""
+        healthy = self.healthy()
+        now = time.monotonic()
+        with self._lock:
+            jobs = {}
+            for name, job in self.jobs.items():
+                state = asdict(job)
+                state['next_run'] = round(job.next_run - now, 1) if job.next_run is not None else None
+                jobs[name] = state
+            return {
+                'pid': os.getpid(),
+                'orgId': self.config.org_id,
+                'startedAt': self.started_at,
+                'uptimeSeconds': round(now - self._started, 1),
+                'healthy': healthy,
+                'running': self.running,
+                'jobs': jobs
+            }
+
+
+# =============================================================================
+# CONTROL CLIENT
+# =============================================================================
+
+def send_command(path: str, command: str, timeout: float = 5.0) -> Dict[str, Any]:
+    """Send one command to a running daemon's control socket."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(path)
+        sock.sendall((command + '\n').encode())
+        with sock.makefile('rb') as reply:
+            return json.loads(reply.readline())
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='ClubCalendar sync daemon')
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument('--status', action='store_true',
+                       help="print the running daemon's state; exit 1 if unhealthy")
+    group.add_argument('--trigger', choices=('sync', 'availability', 'reload'),
+                       help='ask the running daemon to run a job now')
+    parser.add_argument('--socket', help='control socket (default: CLUBCAL_SYNC_SOCKET)')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)s] %(message)s')
+    config = load_config()
+    if args.socket:
+        config.daemon_socket = args.socket
+
+    if args.status or args.trigger:
+        if not config.daemon_socket:
+            parser.error('no control socket configured (set CLUBCAL_SYNC_SOCKET or --socket)')
+        reply = send_command(config.daemon_socket, 'status' if args.status else args.trigger)
+        print(json.dumps(reply, indent=2))
+        return 0 if reply.get('healthy', True) and 'error' not in reply else 1
+
+    SyncDaemon(config).run()
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
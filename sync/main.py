@@ -13,7 +13,7 @@ import logging
 os.environ.setdefault('CLUBCAL_DEPLOYMENT', 'google_cloud')
 
 import functions_framework
-from sync import sync_events
+from sync import sync_events, sync_availability
 from config import load_config
 
 logging.basicConfig(level=logging.INFO)
@@ -40,6 +40,27 @@ def sync_events_handler(request):
         return (f"Sync failed: {str(e)}", 500)
 
 
+@functions_framework.http
+def sync_availability_handler(request):
+    """
+    Cloud Function HTTP entry point for the fast-lane availability sync.
+
+    Triggered by Cloud Scheduler every few minutes; only refreshes
+    registration counts in the published events file.
+    """
+    try:
+        result = sync_availability()
+
+        return (
+            f"Updated availability for {result['changedCount']} events",
+            200
+        )
+
+    except Exception as e:
+        logger.error(f"Availability sync failed: {str(e)}", exc_info=True)
+        return (f"Availability sync failed: {str(e)}", 500)
+
+
 # For local testing
 if __name__ == '__main__':
     class MockRequest:
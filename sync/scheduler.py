@@ -0,0 +1,266 @@
+"""
+ClubCalendar WA Request Scheduler
+=================================
+Rate-limit aware scheduling for Wild Apricot API calls.
+
+Every call for a WA account goes through one shared RateLimitScheduler:
+a token bucket caps the request rate, a concurrency limit caps calls in
+flight, and waiting callers are served by priority so fast-lane
+availability calls jump ahead of bulk event fetches.
+
+On a 429 the scheduler halves its rate and concurrency and pauses until
+Retry-After; successes recover them gradually (AIMD). 429 and 5xx
+responses are retried instead of failing the run.
+"""
+
+import time
+import heapq
+import logging
+import itertools
+import threading
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+# Priority lanes - lower is served first
+PRIORITY_FAST = 0   # token refresh, availability fast lane
+PRIORITY_BULK = 1   # full event fetches
+
+LANE_NAMES = {PRIORITY_FAST: 'fast', PRIORITY_BULK: 'bulk'}
+
+# Retries for 429/5xx/connection errors, and the backoff base when the
+# server gives no Retry-After
+MAX_RETRIES = 5
+BACKOFF_SECONDS = 0.5
+
+# Successes needed to regain one concurrency slot after throttling
+RECOVERY_SUCCESSES = 10
+
+
+class RateLimitScheduler:
+    """Token bucket + adaptive concurrency limit shared by one WA account."""
+
+    def __init__(self, rate_per_minute: float = 120, max_concurrency: int = 4,
+                 burst: Optional[int] = None, max_retries: int = MAX_RETRIES):
+        self.max_rate = rate_per_minute / 60.0
+        self.min_rate = self.max_rate / 32
+        self.rate = self.max_rate
+        self.burst = burst if burst is not None else max(1, max_concurrency)
+        self.max_concurrency = max_concurrency
+        self.concurrency = max_concurrency
+        self.max_retries = max_retries
+
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._active = 0
+        self._successes = 0
+        self._waiters: List[Tuple[int, int]] = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+
+        self.stats: Dict[str, Any] = {
+            'requests': 0, 'throttled': 0, 'serverErrors': 0, 'retries': 0,
+            'lanes': {name: {'requests': 0, 'waitMs': 0.0, 'maxWaitMs': 0.0}
+                      for name in LANE_NAMES.values()}
+        }
+
+    # -------------------------------------------------------------------------
+    # Slots
+    # -------------------------------------------------------------------------
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, priority: int = PRIORITY_BULK) -> float:
+        """
+        Block until this caller may send a request.
+
+        Returns:
+            Seconds spent waiting in the queue
+        """
+        started = time.monotonic()
+        ticket = (priority, next(self._seq))
+
+        with self._cond:
+            heapq.heappush(self._waiters, ticket)
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+
+                timeout = None
+                if self._waiters[0] == ticket:
+                    if now < self._paused_until:
+                        timeout = self._paused_until - now
+                    elif self._tokens < 1:
+                        timeout = (1 - self._tokens) / self.rate
+                    elif self._active < self.concurrency:
+                        heapq.heappop(self._waiters)
+                        self._tokens -= 1
+                        self._active += 1
+                        # Let the next waiter re-check now that the head moved
+                        self._cond.notify_all()
+                        break
+                    # Otherwise at the concurrency limit: wait for a release
+
+                self._cond.wait(timeout)
+
+            waited = time.monotonic() - started
+            lane = self.stats['lanes'][LANE_NAMES.get(priority, 'bulk')]
+            lane['requests'] += 1
+            lane['waitMs'] += waited * 1000
+            lane['maxWaitMs'] = max(lane['maxWaitMs'], waited * 1000)
+            self.stats['requests'] += 1
+
+        return waited
+
+    def release(self, success: bool = True, throttled: bool = False,
+                retry_after: Optional[float] = None) -> None:
+        """
+        Return a slot, adapting rate and concurrency to the outcome.
+
+        Throttling backs off; successes recover; other failures leave the
+        limits alone.
+        """
+        with self._cond:
+            self._active -= 1
+            if throttled:
+                self.rate = max(self.min_rate, self.rate / 2)
+                self.concurrency = max(1, self.concurrency // 2)
+                self._successes = 0
+                self._tokens = 0.0
+                pause = retry_after if retry_after is not None else 1 / self.rate
+                self._paused_until = max(self._paused_until, time.monotonic() + pause)
+                self.stats['throttled'] += 1
+                logger.warning(
+                    f"WA throttled request; rate now {self.rate * 60:.0f}/min, "
+                    f"concurrency {self.concurrency}, pausing {pause:.1f}s"
+                )
+            elif success:
+                self.rate = min(self.max_rate, self.rate + self.max_rate / 20)
+                self._successes += 1
+                if self._successes >= RECOVERY_SUCCESSES and self.concurrency < self.max_concurrency:
+                    self.concurrency += 1
+                    self._successes = 0
+            self._cond.notify_all()
+
+    # -------------------------------------------------------------------------
+    # Requests
+    # -------------------------------------------------------------------------
+
+    def request(self, method: str, url: str, priority: int = PRIORITY_BULK,
+                session: Optional[requests.Session] = None, **kwargs: Any) -> requests.Response:
+        """
+        Send a request through the scheduler, retrying 429/5xx responses.
+
+        Pass a `session` to reuse its pooled connections. The returned
+        response carries `queue_wait`: total seconds this call spent waiting
+        for slots across all attempts.
+
+        Raises:
+            requests.HTTPError: if the last retry still fails
+        """
+        kwargs.setdefault('timeout', 60)
+        sender = session or requests
+        queue_wait = 0.0
+
+        for attempt in range(self.max_retries + 1):
+            last = attempt == self.max_retries
+            if attempt:
+                with self._cond:
+                    self.stats['retries'] += 1
+
+            queue_wait += self.acquire(priority)
+            try:
+                response = sender.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                self.release(success=False)
+                if last:
+                    raise
+                time.sleep(BACKOFF_SECONDS * 2 ** attempt)
+                continue
+
+            if response.status_code == 429:
+                self.release(success=False, throttled=True, retry_after=parse_retry_after(response))
+                if last:
+                    response.raise_for_status()
+                # The pause set by release() holds this and every other caller
+                continue
+
+            self.release(success=response.status_code < 500)
+
+            if response.status_code >= 500 and not last:
+                with self._cond:
+                    self.stats['serverErrors'] += 1
+                time.sleep(BACKOFF_SECONDS * 2 ** attempt)
+                continue
+
+            response.raise_for_status()
+            response.queue_wait = queue_wait
+            return response
+
+        raise RuntimeError("unreachable")
+
+    def metrics(self) -> Dict[str, Any]:
+        """Snapshot of request counts, queue waits and current limits."""
+        with self._cond:
+            lanes = {
+                name: {
+                    'requests': lane['requests'],
+                    'avgWaitMs': round(lane['waitMs'] / lane['requests'], 2) if lane['requests'] else 0.0,
+                    'maxWaitMs': round(lane['maxWaitMs'], 2)
+                }
+                for name, lane in self.stats['lanes'].items()
+            }
+            return {
+                'requests': self.stats['requests'],
+                'throttled': self.stats['throttled'],
+                'serverErrors': self.stats['serverErrors'],
+                'retries': self.stats['retries'],
+                'ratePerMinute': round(self.rate * 60, 1),
+                'concurrency': self.concurrency,
+                'queued': len(self._waiters),
+                'lanes': lanes
+            }
+
+
+def parse_retry_after(response: requests.Response) -> Optional[float]:
+    """Retry-After as seconds (delta or HTTP date), or None if absent/invalid."""
+    value = response.headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+# =============================================================================
+# PER-ACCOUNT REGISTRY
+# =============================================================================
+
+_schedulers: Dict[str, RateLimitScheduler] = {}
+_schedulers_lock = threading.Lock()
+
+
+def get_scheduler(account_id: str, rate_per_minute: float = 120,
+                  max_concurrency: int = 4) -> RateLimitScheduler:
+    """The process-wide scheduler for a WA account, created on first use."""
+    with _schedulers_lock:
+        scheduler = _schedulers.get(account_id)
+        if scheduler is None:
+            scheduler = RateLimitScheduler(rate_per_minute, max_concurrency)
+            _schedulers[account_id] = scheduler
+        return scheduler
@@ -6,19 +6,34 @@ Provides a unified interface for storing data across different backends.
 Supported backends:
 - Google Cloud Storage + Firestore
 - Local filesystem (custom server)
+- Local filesystem + SQLite database read by calendar_api (custom server)
 """
 
 import os
 import json
 import logging
+import sqlite3
 from abc import ABC, abstractmethod
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, Tuple
 from datetime import datetime
 
 from config import SyncConfig, DeploymentType
+from tracing import span
 
 logger = logging.getLogger(__name__)
 
+# Cloud Storage prefix for private sync state; these blobs are never made public
+STATE_PREFIX = '_state'
+
+# Member-only tag prefixes, kept out of every public output: the public file,
+# its facets and the events table that calendar_api serves to anyone
+PRIVATE_TAG_PREFIXES = ('availability:',)
+
+
+def public_tags(tags: List[str]) -> List[str]:
+    """Tags without the member-only availability:* tags."""
+    return [tag for tag in tags if not tag.startswith(PRIVATE_TAG_PREFIXES)]
+
 
 class StorageBackend(ABC):
     """Abstract base class for storage backends."""
@@ -34,6 +49,45 @@ class StorageBackend(ABC):
         pass
 
     @abstractmethod
+    def save_document(self, org_id: str, name: str, data: Dict[str, Any]) -> str:
+        """
+        Publish a JSON document under the org's data path (e.g. 'events.json').
+
+        Returns:
+            URL where the document can be accessed
+        """
+        pass
+
+    @abstractmethod
+    def load_document(self, org_id: str, name: str) -> Optional[Dict[str, Any]]:
+        """
+        Load a published JSON document.
+
+        Returns:
+            Document data, or None if it does not exist
+        """
+        pass
+
+    @abstractmethod
+    def delete_document(self, org_id: str, name: str) -> None:
+        """Delete a published JSON document if it exists."""
+        pass
+
+    @abstractmethod
+    def save_state(self, org_id: str, name: str, data: Dict[str, Any]) -> None:
+        """Save a private JSON document (e.g. a cache) that is never published."""
+        pass
+
+    @abstractmethod
+    def load_state(self, org_id: str, name: str) -> Optional[Dict[str, Any]]:
+        """
+        Load a private JSON document saved with save_state.
+
+        Returns:
+            Document data, or None if it does not exist
+        """
+        pass
+
     def save_events(self, org_id: str, events_data: Dict[str, Any]) -> str:
         """
         Save events JSON data.
@@ -41,7 +95,16 @@ class StorageBackend(ABC):
         Returns:
             URL where the events file can be accessed
         """
-        pass
+        return self.save_document(org_id, 'events.json', events_data)
+
+    def load_events(self, org_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Load the currently published events JSON data.
+
+        Returns:
+            Events data, or None if nothing has been published yet
+        """
+        return self.load_document(org_id, 'events.json')
 
 
 class GoogleCloudStorage(StorageBackend):
@@ -70,22 +133,58 @@ class GoogleCloudStorage(StorageBackend):
         """Save config to Firestore."""
         self._firestore_client.collection(self.firestore_collection).document(org_id).set(config)
 
-    def save_events(self, org_id: str, events_data: Dict[str, Any]) -> str:
-        """Save events to Cloud Storage."""
+    def save_document(self, org_id: str, name: str, data: Dict[str, Any]) -> str:
+        """Save a JSON document to Cloud Storage."""
         bucket = self._storage_client.bucket(self.bucket_name)
-        blob = bucket.blob(f'{org_id}/events.json')
+        blob = bucket.blob(f'{org_id}/{name}')
+
+        with span('serialize', document=name) as attrs:
+            json_str = json.dumps(data, indent=2, default=str)
+            attrs['bytes'] = len(json_str)
 
-        json_str = json.dumps(events_data, indent=2, default=str)
-        blob.upload_from_string(json_str, content_type='application/json')
+        with span('storage_write', document=name):
+            blob.upload_from_string(json_str, content_type='application/json')
 
-        # Make publicly readable
-        blob.make_public()
+            # Make publicly readable
+            blob.make_public()
 
-        url = f'https://storage.googleapis.com/{self.bucket_name}/{org_id}/events.json'
-        logger.info(f"Saved events to {url}")
+        url = f'https://storage.googleapis.com/{self.bucket_name}/{org_id}/{name}'
+        logger.info(f"Saved {name} to {url}")
 
         return url
 
+    def load_document(self, org_id: str, name: str) -> Optional[Dict[str, Any]]:
+        """Load a published JSON document from Cloud Storage."""
+        blob = self._storage_client.bucket(self.bucket_name).blob(f'{org_id}/{name}')
+
+        if not blob.exists():
+            return None
+
+        return json.loads(blob.download_as_text())
+
+    def delete_document(self, org_id: str, name: str) -> None:
+        """Delete a JSON document from Cloud Storage."""
+        blob = self._storage_client.bucket(self.bucket_name).blob(f'{org_id}/{name}')
+
+        if blob.exists():
+            blob.delete()
+
+    def save_state(self, org_id: str, name: str, data: Dict[str, Any]) -> None:
+        """Save a private JSON document to Cloud Storage (not made public)."""
+        blob = self._storage_client.bucket(self.bucket_name).blob(f'{STATE_PREFIX}/{org_id}/{name}')
+
+        with span('storage_write', document=name):
+            blob.upload_from_string(json.dumps(data, default=str), content_type='application/json')
+
+    def load_state(self, org_id: str, name: str) -> Optional[Dict[str, Any]]:
+        """Load a private JSON document from Cloud Storage."""
+        blob = self._storage_client.bucket(self.bucket_name).blob(f'{STATE_PREFIX}/{org_id}/{name}')
+
+        if not blob.exists():
+            return None
+
+        return json.loads(blob.download_as_text())
+
     def _default_config(self) -> Dict[str, Any]:
         return {
             'autoTagRules': [],
@@ -106,10 +205,21 @@ class LocalFileStorage(StorageBackend):
         self.data_directory = config.custom_server.data_directory
         self.config_file = config.custom_server.config_file
         self.base_url = config.custom_server.base_url
+        self.state_directory = config.state_directory
 
         # Ensure data directory exists
         os.makedirs(self.data_directory, exist_ok=True)
 
+        # Fail before fetching anything if the caches could not be saved
+        try:
+            os.makedirs(self.state_directory, exist_ok=True)
+        except OSError as e:
+            raise ValueError(f"Cannot create state directory {self.state_directory}: {e}; "
+                             "create it for the sync user or set CLUBCAL_STATE_DIR") from e
+        if not os.access(self.state_directory, os.W_OK):
+            raise ValueError(f"State directory {self.state_directory} is not writable by this user; "
+                             "chown it to the sync user or set CLUBCAL_STATE_DIR")
+
     def load_config(self, org_id: str) -> Dict[str, Any]:
         """Load config from JSON file."""
         if os.path.exists(self.config_file):
@@ -128,25 +238,70 @@ class LocalFileStorage(StorageBackend):
 
         logger.info(f"Saved config to {self.config_file}")
 
-    def save_events(self, org_id: str, events_data: Dict[str, Any]) -> str:
-        """Save events to local JSON file."""
+    def save_document(self, org_id: str, name: str, data: Dict[str, Any]) -> str:
+        """Save a JSON document to the local data directory."""
+        file_path = os.path.join(self.data_directory, org_id, name)
+
         # Create org subdirectory if needed
-        org_dir = os.path.join(self.data_directory, org_id)
-        os.makedirs(org_dir, exist_ok=True)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
 
-        file_path = os.path.join(org_dir, 'events.json')
+        with span('serialize', document=name) as attrs:
+            json_str = json.dumps(data, indent=2, default=str)
+            attrs['bytes'] = len(json_str)
 
-        with open(file_path, 'w') as f:
-            json.dump(events_data, f, indent=2, default=str)
+        # Write to a temp file and rename so readers never see a partial file
+        with span('storage_write', document=name):
+            tmp_path = f'{file_path}.tmp'
+            with open(tmp_path, 'w') as f:
+                f.write(json_str)
+            os.replace(tmp_path, file_path)
 
-        logger.info(f"Saved events to {file_path}")
+        logger.info(f"Saved {name} to {file_path}")
 
         # Return public URL
         if self.base_url:
-            return f'{self.base_url}/data/{org_id}/events.json'
+            return f'{self.base_url}/data/{org_id}/{name}'
         else:
             return file_path
 
+    def load_document(self, org_id: str, name: str) -> Optional[Dict[str, Any]]:
+        """Load a JSON document from the local data directory."""
+        file_path = os.path.join(self.data_directory, org_id, name)
+
+        if not os.path.exists(file_path):
+            return None
+
+        with open(file_path, 'r') as f:
+            return json.load(f)
+
+    def delete_document(self, org_id: str, name: str) -> None:
+        """Delete a JSON document from the local data directory."""
+        file_path = os.path.join(self.data_directory, org_id, name)
+
+        if os.path.exists(file_path):
+            os.remove(file_path)
+
+    def save_state(self, org_id: str, name: str, data: Dict[str, Any]) -> None:
+        """Save a private JSON document to the local state directory."""
+        file_path = os.path.join(self.state_directory, org_id, name)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+
+        with span('storage_write', document=name):
+            tmp_path = f'{file_path}.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(data, f, default=str)
+            os.replace(tmp_path, file_path)
+
+    def load_state(self, org_id: str, name: str) -> Optional[Dict[str, Any]]:
+        """Load a private JSON document from the local state directory."""
+        file_path = os.path.join(self.state_directory, org_id, name)
+
+        if not os.path.exists(file_path):
+            return None
+
+        with open(file_path, 'r') as f:
+            return json.load(f)
+
     def _default_config(self) -> Dict[str, Any]:
         return {
             'auto_tag_rules': [],
@@ -160,9 +315,154 @@ class LocalFileStorage(StorageBackend):
         }
 
 
+# Same layout as the events table read by calendar_api.py. Organizer and
+# contact columns are not part of the transformed events, so the sync only
+# fills them on insert and never overwrites them.
+EVENTS_SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS events (
+    Id INTEGER PRIMARY KEY,
+    Name TEXT,
+    StartDate TEXT,
+    EndDate TEXT,
+    Location TEXT,
+    Details TEXT,
+    AccessLevel TEXT,
+    Tags TEXT,
+    RegistrationEnabled INTEGER,
+    RegistrationsLimit INTEGER,
+    ConfirmedRegistrationsCount INTEGER,
+    RegistrationUrl TEXT,
+    OrganizerContactId INTEGER,
+    ContactEmail TEXT,
+    ContactPhone TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_events_start ON events(StartDate, Id);
+"""
+
+SYNCED_COLUMNS = (
+    'Id', 'Name', 'StartDate', 'EndDate', 'Location', 'Details', 'AccessLevel',
+    'Tags', 'RegistrationEnabled', 'RegistrationsLimit',
+    'ConfirmedRegistrationsCount', 'RegistrationUrl',
+)
+
+# Upsert rather than INSERT OR REPLACE, and skip rows whose values are
+# unchanged so unchanged events cost no page writes or index churn.
+_UPDATED = SYNCED_COLUMNS[1:]
+UPSERT_EVENT_SQL = (
+    f"INSERT INTO events ({', '.join(SYNCED_COLUMNS)}) "
+    f"VALUES ({', '.join('?' for _ in SYNCED_COLUMNS)}) "
+    f"ON CONFLICT(Id) DO UPDATE SET "
+    f"{', '.join(f'{c} = excluded.{c}' for c in _UPDATED)} "
+    f"WHERE ({', '.join(f'events.{c}' for c in _UPDATED)}) "
+    f"IS NOT ({', '.join(f'excluded.{c}' for c in _UPDATED)})"
+)
+
+
+class SQLiteStorage(LocalFileStorage):
+    """
+    Local filesystem backend that also maintains the SQLite events table.
+
+    events.json is still written for the static widget; the same events are
+    upserted into the database in one transaction so calendar_api.py reads
+    row-level updates instead of a separately fed copy.
+    """
+
+    def __init__(self, config: SyncConfig):
+        super().__init__(config)
+        self.database_path = config.custom_server.database_path
+
+    def save_events(self, org_id: str, events_data: Dict[str, Any]) -> str:
+        """Save events to the JSON file and the SQLite database."""
+        url = super().save_events(org_id, events_data)
+
+        with span('db_write') as attrs:
+            upserted, deleted = self.write_events(
+                events_data.get('events', []), events_data.get('windowStart')
+            )
+            attrs.update(upserted=upserted, deleted=deleted)
+        logger.info(
+            f"Saved events to {self.database_path} "
+            f"({upserted} inserted/updated, {deleted} deleted)"
+        )
+
+        return url
+
+    def write_events(self, events: List[Dict[str, Any]],
+                     window_start: Optional[str] = None) -> Tuple[int, int]:
+        """
+        Upsert events and delete rows no longer present, in one transaction.
+
+        Only rows starting on or after `window_start` (the first day the sync
+        fetched, 'YYYY-MM-DD') can be deleted, so past events the sync no
+        longer fetches are kept. Without a window nothing is deleted.
+
+        Returns:
+            (rows inserted or updated, rows deleted)
+        """
+        rows = [self._event_row(event) for event in events]
+
+        conn = sqlite3.connect(self.database_path, timeout=30, isolation_level=None)
+        try:
+            # WAL lets the API keep reading the previous snapshot during the write
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(EVENTS_SCHEMA_SQL)
+
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                upserted = conn.executemany(UPSERT_EVENT_SQL, rows).rowcount
+
+                deleted = 0
+                if window_start:
+                    conn.execute("CREATE TEMP TABLE IF NOT EXISTS sync_ids (Id INTEGER PRIMARY KEY)")
+                    conn.execute("DELETE FROM sync_ids")
+                    conn.executemany(
+                        "INSERT OR IGNORE INTO sync_ids VALUES (?)", ((row[0],) for row in rows)
+                    )
+                    deleted = conn.execute(
+                        "DELETE FROM events WHERE StartDate >= ? "
+                        "AND Id NOT IN (SELECT Id FROM sync_ids)",
+                        (window_start,)
+                    ).rowcount
+
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        finally:
+            conn.close()
+
+        return upserted, deleted
+
+    @staticmethod
+    def _event_row(event: Dict[str, Any]) -> Tuple[Any, ...]:
+        """
+        Map a transformed event back onto the events table columns.
+
+        Tags are served to anonymous callers, so availability:* tags are
+        left out; members get availability from the registration counts.
+        """
+        return (
+            event.get('id'),
+            event.get('name', ''),
+            event.get('start', ''),
+            event.get('end', ''),
+            event.get('location', ''),
+            event.get('description', ''),
+            event.get('accessLevel', 'Public'),
+            ','.join(sorted(public_tags(event.get('tags', [])))),
+            1 if event.get('registrationEnabled', True) else 0,
+            event.get('registrationsLimit'),
+            event.get('confirmedRegistrations', 0),
+            event.get('registrationUrl', ''),
+        )
+
+
 def create_storage_backend(config: SyncConfig) -> StorageBackend:
     """Factory function to create appropriate storage backend."""
     if config.deployment_type == DeploymentType.GOOGLE_CLOUD:
         return GoogleCloudStorage(config)
+    elif config.custom_server and config.custom_server.database_path:
+        return SQLiteStorage(config)
     else:
         return LocalFileStorage(config)
@@ -10,18 +10,32 @@ Usage:
     # As a standalone script (custom server)
     python sync.py
 
+    # Fast-lane availability refresh (registration counts only)
+    python sync.py --availability
+
     # With Google Cloud Functions
     See main.py for the Cloud Function wrapper
 """
 
+import re
+import sys
+import copy
+import html
+import json
+import hashlib
 import logging
-from datetime import datetime, timedelta
-from typing import List, Dict, Any, Optional
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from typing import List, Dict, Any, NamedTuple, Optional, Tuple, Union
+from zoneinfo import ZoneInfo
 
 import requests
 
-from config import load_config, SyncConfig
-from storage import create_storage_backend, StorageBackend
+from config import load_config, SyncConfig, WA_API_URL, WA_AUTH_URL
+from storage import create_storage_backend, public_tags, StorageBackend
+from tracing import start_trace, span, profiled
+from scheduler import RateLimitScheduler, get_scheduler, PRIORITY_FAST, PRIORITY_BULK
 
 # Configure logging
 logging.basicConfig(
@@ -36,12 +50,23 @@ logger = logging.getLogger(__name__)
 # =============================================================================
 
 class WildApricotClient:
-    """Client for Wild Apricot API."""
+    """
+    Client for Wild Apricot API.
 
-    def __init__(self, account_id: str, api_key: str):
+    All calls go through the account's shared RateLimitScheduler, so
+    concurrent syncs for one account stay within its quota.
+    """
+
+    def __init__(self, account_id: str, api_key: str,
+                 base_url: str = WA_API_URL, auth_url: str = WA_AUTH_URL,
+                 scheduler: Optional[RateLimitScheduler] = None):
         self.account_id = account_id
         self.api_key = api_key
-        self.base_url = "https://api.wildapricot.org/v2.2"
+        self.base_url = base_url.rstrip('/')
+        self.auth_url = auth_url
+        self.scheduler = scheduler or get_scheduler(account_id)
+        # Kept across calls so a long-lived client reuses its connections
+        self.session = requests.Session()
         self.token = None
         self.token_expires = None
 
@@ -52,18 +77,22 @@ class WildApricotClient:
 
         logger.info("Refreshing WA API token")
 
-        auth_url = "https://oauth.wildapricot.org/auth/token"
-        response = requests.post(
-            auth_url,
-            data={
-                'grant_type': 'client_credentials',
-                'scope': 'auto'
-            },
-            auth=('APIKEY', self.api_key)
-        )
-        response.raise_for_status()
+        with span('token') as attrs:
+            # Every other call waits on the token, so it takes the fast lane
+            response = self.scheduler.request(
+                'POST',
+                self.auth_url,
+                priority=PRIORITY_FAST,
+                session=self.session,
+                data={
+                    'grant_type': 'client_credentials',
+                    'scope': 'auto'
+                },
+                auth=('APIKEY', self.api_key)
+            )
+            attrs['waitMs'] = round(response.queue_wait * 1000, 2)
 
-        data = response.json()
+            data = response.json()
         self.token = data['access_token']
         self.token_expires = datetime.now() + timedelta(seconds=data['expires_in'] - 60)
 
@@ -79,11 +108,66 @@ class WildApricotClient:
         Returns:
             List of event dictionaries
         """
-        token = self._get_token()
-
         # Calculate date range
         start_date = datetime.now() - timedelta(days=include_past_days)
 
+        logger.info(f"Fetching events from WA API (since {start_date.date()})")
+
+        all_events = self._fetch_events_since(start_date, PRIORITY_BULK)
+
+        logger.info(f"Fetched {len(all_events)} events from WA")
+        return all_events
+
+    def get_registration_counts(self) -> Dict[Any, Dict[str, Any]]:
+        """
+        Fetch current registration counts for upcoming events.
+
+        Used by the fast-lane availability sync; only events starting
+        today or later are requested.
+
+        Returns:
+            Mapping of event Id to its ConfirmedRegistrationsCount and
+            RegistrationsLimit
+        """
+        events = self._fetch_events_since(datetime.now(), PRIORITY_FAST)
+
+        counts = {
+            event.get('Id'): {
+                'ConfirmedRegistrationsCount': event.get('ConfirmedRegistrationsCount', 0),
+                'RegistrationsLimit': event.get('RegistrationsLimit'),
+            }
+            for event in events
+        }
+
+        logger.info(f"Fetched registration counts for {len(counts)} upcoming events")
+        return counts
+
+    def get_event_details(self, event_id: Any) -> Dict[str, Any]:
+        """
+        Fetch a single event, including the Details the list endpoint may omit.
+
+        Returns:
+            Event dictionary with Details.DescriptionHtml
+        """
+        token = self._get_token()
+
+        response = self.scheduler.request(
+            'GET',
+            f"{self.base_url}/accounts/{self.account_id}/events/{event_id}",
+            priority=PRIORITY_BULK,
+            session=self.session,
+            headers={
+                'Authorization': f'Bearer {token}',
+                'Accept': 'application/json'
+            }
+        )
+
+        return response.json()
+
+    def _fetch_events_since(self, start_date: datetime, priority: int) -> List[Dict[str, Any]]:
+        """Fetch all pages of events starting on or after start_date."""
+        token = self._get_token()
+
         url = f"{self.base_url}/accounts/{self.account_id}/events"
         params = {
             '$filter': f"StartDate ge {start_date.strftime('%Y-%m-%d')}",
@@ -95,43 +179,249 @@ class WildApricotClient:
             'Accept': 'application/json'
         }
 
-        logger.info(f"Fetching events from WA API (since {start_date.date()})")
-
         all_events = []
         page_url = url
+        page = 0
 
         while page_url:
-            response = requests.get(page_url, headers=headers, params=params if page_url == url else None)
-            response.raise_for_status()
+            page += 1
+            with span('fetch_page', page=page) as attrs:
+                response = self.scheduler.request(
+                    'GET', page_url, priority=priority, session=self.session,
+                    headers=headers, params=params if page_url == url else None
+                )
+                attrs['waitMs'] = round(response.queue_wait * 1000, 2)
+
+                data = response.json()
+
+                # Handle different response formats
+                if isinstance(data, dict):
+                    events = data.get('Events', [])
+                    all_events.extend(events)
+
+                    # Check for pagination
+                    page_url = data.get('ResultNextPageUrl')
+                else:
+                    events = data
+                    all_events.extend(data)
+                    page_url = None
+
+                attrs['events'] = len(events)
 
-            data = response.json()
+        return all_events
 
-            # Handle different response formats
-            if isinstance(data, dict):
-                events = data.get('Events', [])
-                all_events.extend(events)
 
-                # Check for pagination
-                page_url = data.get('ResultNextPageUrl')
-            else:
-                all_events.extend(data)
-                page_url = None
+def create_wa_client(config: SyncConfig) -> WildApricotClient:
+    """WA client for the configured account and API endpoints."""
+    scheduler = get_scheduler(
+        config.wa_config.account_id,
+        rate_per_minute=config.wa_config.rate_limit_per_minute,
+        max_concurrency=config.wa_config.max_concurrency
+    )
+    return WildApricotClient(
+        config.wa_config.account_id,
+        config.wa_config.api_key,
+        base_url=config.wa_config.api_url,
+        auth_url=config.wa_config.auth_url,
+        scheduler=scheduler
+    )
 
-        logger.info(f"Fetched {len(all_events)} events from WA")
-        return all_events
+
+# =============================================================================
+# DETAILS ENRICHMENT
+# =============================================================================
+
+DETAILS_CACHE_DOCUMENT = 'cache/details.json'
+
+# Cached descriptions are refetched after this long even when the event's
+# stamp is unchanged, in case an edit did not change the stamp
+DETAILS_MAX_AGE = timedelta(hours=24)
+
+# List fields that change without the event itself being edited
+VOLATILE_FIELDS = ('ConfirmedRegistrationsCount', 'PendingRegistrationsCount',
+                   'CheckedInAttendeesNumber', 'Details')
+
+
+def is_cancelled(event: Dict[str, Any]) -> bool:
+    """Cancelled events are marked in WA by 'CANCELLED' in the name."""
+    return 'CANCELLED' in event.get('Name', '').upper()
+
+
+def has_description(event: Dict[str, Any]) -> bool:
+    details = event.get('Details')
+    return isinstance(details, dict) and 'DescriptionHtml' in details
+
+
+def details_stamp(event: Dict[str, Any]) -> str:
+    """
+    Version stamp for an event's details.
+
+    WA's last-modified time when the list payload has one, otherwise a
+    fingerprint of the event's non-volatile list fields.
+    """
+    modified = event.get('LastModifiedDate')
+    if modified:
+        return str(modified)
+
+    stable = {key: value for key, value in event.items() if key not in VOLATILE_FIELDS}
+    return hashlib.sha1(json.dumps(stable, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def enrich_details(wa_client: WildApricotClient, events: List[Dict[str, Any]],
+                   cache: Dict[str, Dict[str, Any]],
+                   now: Optional[datetime] = None) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, int]]:
+    """
+    Fill in Details.DescriptionHtml for events listed without it.
+
+    Descriptions come from the cache when the event's stamp is unchanged
+    and the entry is fresh; the rest are fetched concurrently, bounded by
+    the client scheduler's concurrency. A failed fetch keeps the previously
+    cached description (retried next run), or leaves it empty if there was
+    none, rather than failing the sync.
+
+    Args:
+        wa_client: Client used for per-event detail calls
+        events: Raw WA events, updated in place
+        cache: Previous cache, keyed by event Id
+
+    Returns:
+        (new cache holding only current events, counts of cached/fetched/failed)
+    """
+    now = now or datetime.utcnow()
+    new_cache: Dict[str, Dict[str, Any]] = {}
+    counts = {'cached': 0, 'fetched': 0, 'failed': 0}
+    missing = []
+
+    for event in events:
+        if has_description(event) or is_cancelled(event):
+            continue
+
+        key = str(event.get('Id'))
+        stamp = details_stamp(event)
+        entry = cache.get(key)
+        if (entry and entry.get('stamp') == stamp
+                and now - datetime.fromisoformat(entry['fetched']) < DETAILS_MAX_AGE):
+            event['Details'] = {'DescriptionHtml': entry['description']}
+            new_cache[key] = entry
+            counts['cached'] += 1
+        else:
+            missing.append((key, stamp, event))
+
+    def fetch(item: Tuple[str, str, Dict[str, Any]]) -> Tuple[str, str, Dict[str, Any], Optional[str]]:
+        key, stamp, event = item
+        try:
+            details = wa_client.get_event_details(event.get('Id')).get('Details') or {}
+            return key, stamp, event, details.get('DescriptionHtml', '')
+        except Exception as e:
+            logger.warning(f"Failed to fetch details for event {key}: {e}")
+            return key, stamp, event, None
+
+    if missing:
+        with ThreadPoolExecutor(max_workers=wa_client.scheduler.max_concurrency) as pool:
+            for key, stamp, event, description in pool.map(fetch, missing):
+                if description is None:
+                    counts['failed'] += 1
+                    previous = cache.get(key)
+                    if previous:
+                        event['Details'] = {'DescriptionHtml': previous['description']}
+                        new_cache[key] = previous
+                    continue
+                event['Details'] = {'DescriptionHtml': description}
+                new_cache[key] = {'stamp': stamp, 'fetched': now.isoformat(), 'description': description}
+                counts['fetched'] += 1
+
+    return new_cache, counts
 
 
 # =============================================================================
 # EVENT TRANSFORMATION
 # =============================================================================
 
-def apply_auto_tags(event: Dict[str, Any], rules: List[Dict[str, Any]]) -> List[str]:
+class EventRecord(NamedTuple):
+    """
+    Transformed event, kept compact through the pipeline.
+
+    Tags are a sorted tuple of interned strings, so the handful of distinct
+    tags are shared by every event. Records are indexed and diffed as they
+    are, and converted to the published dict shape by to_dict() only when
+    the events document is serialized.
+    """
+    id: Any
+    name: str
+    start: str
+    end: str
+    location: str
+    description: str
+    url: str
+    registration_url: str
+    tags: Tuple[str, ...]
+    spots_available: Optional[int]
+    is_full: bool
+    registrations_limit: Optional[int]
+    confirmed_registrations: int
+    registration_enabled: bool
+    access_level: str
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'id': self.id,
+            'name': self.name,
+            'start': self.start,
+            'end': self.end,
+            'location': self.location,
+            'description': self.description,
+            'url': self.url,
+            'registrationUrl': self.registration_url,
+            'tags': list(self.tags),
+            'spotsAvailable': self.spots_available,
+            'isFull': self.is_full,
+            'registrationsLimit': self.registrations_limit,
+            'confirmedRegistrations': self.confirmed_registrations,
+            'registrationEnabled': self.registration_enabled,
+            'accessLevel': self.access_level
+        }
+
+    @classmethod
+    def from_dict(cls, event: Dict[str, Any]) -> 'EventRecord':
+        """Record for a published event dict; the inverse of to_dict()."""
+        return cls(
+            id=event.get('id'),
+            name=event.get('name', ''),
+            start=event.get('start', ''),
+            end=event.get('end', ''),
+            location=event.get('location', ''),
+            description=event.get('description', ''),
+            url=event.get('url', ''),
+            registration_url=event.get('registrationUrl', ''),
+            tags=intern_tags(event.get('tags', [])),
+            spots_available=event.get('spotsAvailable'),
+            is_full=event.get('isFull', False),
+            registrations_limit=event.get('registrationsLimit'),
+            confirmed_registrations=event.get('confirmedRegistrations', 0),
+            registration_enabled=event.get('registrationEnabled', True),
+            access_level=sys.intern(event.get('accessLevel', 'Public'))
+        )
+
+
+def event_dict(event: Union[EventRecord, Dict[str, Any]]) -> Dict[str, Any]:
+    """Published dict for an event that may still be an EventRecord."""
+    return event.to_dict() if isinstance(event, EventRecord) else event
+
+
+def intern_tags(tags: List[str]) -> Tuple[str, ...]:
+    """Deduplicated, sorted (so unchanged events diff equal) and interned."""
+    return tuple(sorted({sys.intern(tag) for tag in tags}))
+
+
+def apply_auto_tags(event: Dict[str, Any], rules: List[Dict[str, Any]],
+                    rule_counts: Optional[Counter] = None) -> List[str]:
     """
     Apply auto-tagging rules to an event.
 
     Args:
         event: Event dictionary from WA API
         rules: List of auto-tag rules from config
+        rule_counts: Optional counter of matches per rule type
 
     Returns:
         List of auto-generated tags
@@ -158,6 +448,8 @@ def apply_auto_tags(event: Dict[str, Any], rules: List[Dict[str, Any]]) -> List[
 
         if matched:
             auto_tags.append(tag)
+            if rule_counts is not None:
+                rule_counts[rule_type] += 1
 
     return auto_tags
 
@@ -212,17 +504,32 @@ def derive_weekend(start_date_str: str) -> bool:
         return False
 
 
-def transform_event(event: Dict[str, Any], org_config: Dict[str, Any]) -> Dict[str, Any]:
+def calculate_spots(event: Dict[str, Any]) -> Optional[int]:
+    """Spots left from WA registration fields, or None if there is no limit."""
+    limit = event.get('RegistrationsLimit')
+    confirmed = event.get('ConfirmedRegistrationsCount', 0)
+    return None if limit is None else max(0, limit - confirmed)
+
+
+def transform_event(event: Dict[str, Any], org_config: Dict[str, Any],
+                    rule_counts: Optional[Counter] = None) -> Dict[str, Any]:
     """
     Transform WA event to ClubCalendar format.
 
     Args:
         event: Raw event from WA API
         org_config: Organization configuration
+        rule_counts: Optional counter of tags added per rule type
 
     Returns:
         Transformed event dictionary
     """
+    return build_event_record(event, org_config, rule_counts).to_dict()
+
+
+def build_event_record(event: Dict[str, Any], org_config: Dict[str, Any],
+                       rule_counts: Optional[Counter] = None) -> EventRecord:
+    """Transform WA event to a compact EventRecord (see transform_event)."""
     # Get existing tags from WA
     wa_tags = event.get('Tags', [])
     if isinstance(wa_tags, str):
@@ -234,7 +541,7 @@ def transform_event(event: Dict[str, Any], org_config: Dict[str, Any]) -> Dict[s
     auto_tag_rules = org_config.get('auto_tag_rules', org_config.get('autoTagRules', []))
 
     # Apply auto-tagging rules
-    auto_tags = apply_auto_tags(event, auto_tag_rules)
+    auto_tags = apply_auto_tags(event, auto_tag_rules, rule_counts)
 
     # Derive additional tags
     start_date = event.get('StartDate', '')
@@ -249,13 +556,18 @@ def transform_event(event: Dict[str, Any], org_config: Dict[str, Any]) -> Dict[s
     if derive_weekend(start_date):
         auto_tags.append('day:weekend')
 
-    # Combine all tags (deduplicated)
-    all_tags = list(set(wa_tags + auto_tags))
+    if rule_counts is not None:
+        if time_tag:
+            rule_counts['time-of-day'] += 1
+        if 'day:weekend' in auto_tags:
+            rule_counts['weekend'] += 1
+        rule_counts['availability'] += 1
+
+    # Combine all tags
+    all_tags = intern_tags(wa_tags + auto_tags)
 
     # Calculate spots available
-    limit = event.get('RegistrationsLimit')
-    confirmed = event.get('ConfirmedRegistrationsCount', 0)
-    spots = None if limit is None else max(0, limit - confirmed)
+    spots = calculate_spots(event)
 
     # Get event URL
     event_id = event.get('Id')
@@ -265,22 +577,408 @@ def transform_event(event: Dict[str, Any], org_config: Dict[str, Any]) -> Dict[s
         event_url = f"https://sbnewcomers.org/event-{event_id}"
 
     # Build transformed event
-    return {
-        'id': event_id,
-        'name': event.get('Name', ''),
-        'start': start_date,
-        'end': event.get('EndDate', ''),
-        'location': event.get('Location', ''),
-        'description': event.get('Details', {}).get('DescriptionHtml', '') if isinstance(event.get('Details'), dict) else '',
-        'url': event_url,
-        'registrationUrl': event.get('RegistrationUrl', ''),
-        'tags': all_tags,
-        'spotsAvailable': spots,
-        'isFull': spots == 0 if spots is not None else False,
-        'registrationEnabled': event.get('RegistrationEnabled', True),
-        'accessLevel': event.get('AccessLevel', 'Public')
+    return EventRecord(
+        id=event_id,
+        name=event.get('Name', ''),
+        start=start_date,
+        end=event.get('EndDate', ''),
+        location=event.get('Location', ''),
+        description=event.get('Details', {}).get('DescriptionHtml', '') if isinstance(event.get('Details'), dict) else '',
+        url=event_url,
+        registration_url=event.get('RegistrationUrl', ''),
+        tags=all_tags,
+        spots_available=spots,
+        is_full=spots == 0 if spots is not None else False,
+        registrations_limit=event.get('RegistrationsLimit'),
+        confirmed_registrations=event.get('ConfirmedRegistrationsCount', 0),
+        registration_enabled=event.get('RegistrationEnabled', True),
+        access_level=sys.intern(event.get('AccessLevel', 'Public'))
+    )
+
+
+def patch_availability(events: List[Dict[str, Any]], counts: Dict[Any, Dict[str, Any]]) -> int:
+    """
+    Update availability fields of already-transformed events in place.
+
+    Only the availability:* tag, spotsAvailable, isFull and the raw
+    registration counts are touched, using the same rules as transform_event.
+
+    Args:
+        events: Transformed events from the published events file
+        counts: Registration counts keyed by event Id
+
+    Returns:
+        Number of events whose availability changed
+    """
+    changed = 0
+
+    for event in events:
+        registration = counts.get(event.get('id'))
+        if registration is None:
+            continue
+
+        spots = calculate_spots(registration)
+        is_full = spots == 0 if spots is not None else False
+        avail_tag = derive_availability(registration)
+
+        tags = sorted([t for t in event.get('tags', []) if not t.startswith('availability:')] + [avail_tag])
+
+        limit = registration.get('RegistrationsLimit')
+        confirmed = registration.get('ConfirmedRegistrationsCount', 0)
+
+        if (event.get('spotsAvailable') == spots and event.get('isFull') == is_full
+                and event.get('registrationsLimit') == limit
+                and event.get('confirmedRegistrations') == confirmed
+                and tags == event.get('tags', [])):
+            continue
+
+        event['spotsAvailable'] = spots
+        event['isFull'] = is_full
+        event['registrationsLimit'] = limit
+        event['confirmedRegistrations'] = confirmed
+        event['tags'] = tags
+        changed += 1
+
+    return changed
+
+
+# =============================================================================
+# FACET INDEX
+# =============================================================================
+
+class FacetIndex:
+    """
+    Tag facets for an events list, built one event at a time.
+
+    Positions are indexes into the events array of the document the index
+    is published with.
+    """
+
+    def __init__(self):
+        self.positions: Dict[str, List[int]] = {}
+
+    def add(self, position: int, tags: List[str]) -> None:
+        for tag in tags:
+            self.positions.setdefault(tag, []).append(position)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        counts: tag -> events; positions: tag -> event indexes;
+        groups: prefix ('committee', 'time', ...; 'other' for plain tags)
+        -> its tags, most used first.
+        """
+        tags = sorted(self.positions, key=lambda tag: (-len(self.positions[tag]), tag))
+
+        groups: Dict[str, List[str]] = {}
+        for tag in tags:
+            prefix, sep, _ = tag.partition(':')
+            groups.setdefault(prefix if sep else 'other', []).append(tag)
+
+        return {
+            'counts': {tag: len(self.positions[tag]) for tag in tags},
+            'positions': {tag: self.positions[tag] for tag in tags},
+            'groups': groups
+        }
+
+
+def build_facets(events: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Facet index for an already-built events list."""
+    index = FacetIndex()
+    for position, event in enumerate(events):
+        index.add(position, event.get('tags', []))
+    return index.to_dict()
+
+
+# =============================================================================
+# DAY INDEX
+# =============================================================================
+
+# Org config 'timezone' default; calendar days are bucketed in local time
+DEFAULT_TIMEZONE = 'America/Los_Angeles'
+
+# Longest span indexed for one event, so a bad end date cannot blow up the index
+MAX_EVENT_DAYS = 62
+
+
+def local_date(value: str, tz: ZoneInfo) -> Optional[datetime]:
+    """
+    Parse a WA timestamp into aware local time.
+
+    Naive and date-only values are already local and get `tz` attached, so
+    any two results compare safely.
+    """
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except (ValueError, AttributeError):
+        return None
+    return parsed.astimezone(tz) if parsed.tzinfo is not None else parsed.replace(tzinfo=tz)
+
+
+def event_days(start: str, end: str, tz: ZoneInfo) -> List[date]:
+    """
+    Local calendar days an event occupies.
+
+    Multi-day events cover every day from start to end; an end at exactly
+    midnight does not claim the following day.
+    """
+    start_dt = local_date(start, tz)
+    if start_dt is None:
+        return []
+
+    end_dt = local_date(end, tz) if end else None
+    if end_dt is None or end_dt <= start_dt:
+        return [start_dt.date()]
+
+    last = end_dt.date()
+    if end_dt.time() == datetime.min.time():
+        last -= timedelta(days=1)
+
+    span_days = min((last - start_dt.date()).days, MAX_EVENT_DAYS - 1)
+    return [start_dt.date() + timedelta(days=n) for n in range(span_days + 1)]
+
+
+class DayIndex:
+    """Local day ('YYYY-MM-DD') -> positions of the events on that day."""
+
+    def __init__(self, timezone: str = DEFAULT_TIMEZONE):
+        self.timezone = timezone
+        self._tz = ZoneInfo(timezone)
+        self.days: Dict[date, List[int]] = {}
+
+    def days_for(self, start: str, end: str) -> List[date]:
+        return event_days(start, end, self._tz)
+
+    def add(self, position: int, start: str, end: str) -> None:
+        self.add_days(position, self.days_for(start, end))
+
+    def add_days(self, position: int, days: List[date]) -> None:
+        for day in days:
+            self.days.setdefault(day, []).append(position)
+
+    def to_dict(self) -> Dict[str, List[int]]:
+        return {day.isoformat(): self.days[day] for day in sorted(self.days)}
+
+
+def build_day_index(events: List[Dict[str, Any]], timezone: str = DEFAULT_TIMEZONE) -> Dict[str, List[int]]:
+    """Day index for an already-built events list."""
+    index = DayIndex(timezone)
+    for position, event in enumerate(events):
+        index.add(position, event.get('start', ''), event.get('end', ''))
+    return index.to_dict()
+
+
+# =============================================================================
+# AUDIENCE PROJECTIONS
+# =============================================================================
+
+PUBLIC_EVENTS_DOCUMENT = 'events-public.json'
+
+# Public events carry a plain-text description cut to this many characters
+PUBLIC_DESCRIPTION_LENGTH = 200
+
+# Fields copied into the public file; location, registration counts and
+# availability stay in the member file (events.json)
+PUBLIC_EVENT_FIELDS = ('id', 'name', 'start', 'end', 'url')
+
+HTML_TAG = re.compile(r'<[^>]+>')
+WHITESPACE = re.compile(r'\s+')
+
+
+def brief_description(description_html: str, length: int = PUBLIC_DESCRIPTION_LENGTH) -> str:
+    """Description HTML as plain text, truncated with '...' past `length`."""
+    text = WHITESPACE.sub(' ', html.unescape(HTML_TAG.sub(' ', description_html or ''))).strip()
+    if len(text) > length:
+        return text[:length].rstrip() + '...'
+    return text
+
+
+def public_events(events: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Public-audience projection: Public events only, with brief descriptions."""
+    return [
+        {
+            **{field: event.get(field) for field in PUBLIC_EVENT_FIELDS},
+            'tags': public_tags(event.get('tags', [])),
+            'description': brief_description(event.get('description', ''))
+        }
+        for event in events
+        if event.get('accessLevel', 'Public') == 'Public'
+    ]
+
+
+def publish_public_events(storage: StorageBackend, org_id: str,
+                          output: Dict[str, Any]) -> Optional[str]:
+    """
+    Write the public artifact for a published events document.
+
+    Skipped when the public projection is unchanged, which is the usual
+    case for availability-only updates.
+
+    Returns:
+        URL of the public file, or None if it was not rewritten
+    """
+    with span('project_public') as attrs:
+        events = public_events(output.get('events', []))
+        attrs['events'] = len(events)
+
+    current = storage.load_document(org_id, PUBLIC_EVENTS_DOCUMENT)
+    if current is not None and current.get('events') == events:
+        return None
+
+    return storage.save_document(org_id, PUBLIC_EVENTS_DOCUMENT, {
+        '_warning': output.get('_warning'),
+        '_generated': output.get('_generated'),
+        '_orgId': org_id,
+        'audience': 'public',
+        'version': output.get('version'),
+        'eventCount': len(events),
+        'events': events,
+        'facets': build_facets(events),
+        'timezone': output.get('timezone', DEFAULT_TIMEZONE),
+        'days': build_day_index(events, output.get('timezone', DEFAULT_TIMEZONE))
+    })
+
+
+# =============================================================================
+# DELTA PUBLISHING
+# =============================================================================
+
+DELTA_WINDOW_DOCUMENT = 'deltas.json'
+
+
+def delta_document_name(version: int) -> str:
+    """Storage name of the delta that produces `version`."""
+    return f'deltas/delta-{version}.json'
+
+
+def diff_events(previous: List[Dict[str, Any]],
+                current: List[Union[EventRecord, Dict[str, Any]]]) -> Dict[str, Any]:
+    """
+    Diff two transformed event lists by id.
+
+    `current` may hold EventRecords (full sync) or dicts (availability
+    patch). Records are compared as records, so only added and changed
+    events are converted to dicts.
+
+    Returns:
+        Dict with 'added' (full events), 'removed' (ids) and 'changed'
+        (id plus only the fields whose values differ; dropped fields are None)
+    """
+    before = {event.get('id'): event for event in previous}
+    after = {
+        event.id if isinstance(event, EventRecord) else event.get('id'): event
+        for event in current
     }
 
+    added = [event_dict(event) for event_id, event in after.items() if event_id not in before]
+    removed = [event_id for event_id in before if event_id not in after]
+
+    changed = []
+    for event_id, event in after.items():
+        old = before.get(event_id)
+        if old is None:
+            continue
+        if isinstance(event, EventRecord):
+            if EventRecord.from_dict(old) == event:
+                continue
+            event = event.to_dict()
+        elif old == event:
+            continue
+
+        fields = {
+            key: event.get(key)
+            for key in set(old) | set(event)
+            if key != 'id' and old.get(key) != event.get(key)
+        }
+        changed.append({'id': event_id, 'fields': fields})
+
+    return {'added': added, 'removed': removed, 'changed': changed}
+
+
+def publish_events(storage: StorageBackend, config: SyncConfig, output: Dict[str, Any],
+                   previous: Optional[Dict[str, Any]]) -> str:
+    """
+    Publish events with a version number and a delta from the previous version.
+
+    events.json is the member artifact with full data; the public artifact
+    (events-public.json) is regenerated from it.
+
+    The version only advances when events actually changed. Each delta is
+    written as deltas/delta-<version>.json and into the rolling deltas.json
+    window before the main file, so a client that sees version M can always
+    fetch deltas N+1..M. Deltas that fall out of the retention window are
+    deleted.
+
+    Args:
+        storage: Storage backend
+        config: Sync configuration (org id and delta retention)
+        output: Events document to publish (gets version fields set)
+        previous: Currently published events document, if any
+
+    Returns:
+        URL of the published events file
+    """
+    org_id = config.org_id
+    retention = config.delta_retention
+    prev_version = previous.get('version', 0) if previous else 0
+
+    if previous is None:
+        delta = None
+        version = prev_version + 1
+    else:
+        with span('diff'):
+            delta = diff_events(previous.get('events', []), output.get('events', []))
+        has_changes = any(delta.values())
+        version = prev_version + 1 if has_changes else prev_version
+        if not has_changes:
+            delta = None
+
+    oldest = previous.get('oldestDeltaVersion') if previous and retention > 0 else None
+
+    if retention > 0 and delta is not None:
+        delta_doc = {
+            'version': version,
+            'previousVersion': prev_version,
+            'generated': datetime.utcnow().isoformat() + 'Z',
+            **delta
+        }
+        storage.save_document(org_id, delta_document_name(version), delta_doc)
+
+        window = storage.load_document(org_id, DELTA_WINDOW_DOCUMENT) or {}
+        deltas = window.get('deltas', [])
+
+        # A gap means earlier deltas were lost (or disabled): start a new window
+        if deltas and deltas[-1].get('version') != prev_version:
+            deltas = []
+
+        deltas.append(delta_doc)
+        expired, deltas = deltas[:-retention], deltas[-retention:]
+
+        storage.save_document(org_id, DELTA_WINDOW_DOCUMENT, {
+            '_orgId': org_id,
+            'version': version,
+            'oldestVersion': deltas[0]['version'],
+            'deltas': deltas
+        })
+
+        for old_delta in expired:
+            storage.delete_document(org_id, delta_document_name(old_delta['version']))
+
+        oldest = deltas[0]['version']
+        logger.info(
+            f"Published delta {version}: {len(delta['added'])} added, "
+            f"{len(delta['removed'])} removed, {len(delta['changed'])} changed"
+        )
+
+    output['version'] = version
+    # Clients at version N can catch up via deltas when N + 1 >= oldestDeltaVersion
+    output['oldestDeltaVersion'] = oldest
+
+    # Records become published dicts only now, as the document is serialized
+    output['events'] = [event_dict(event) for event in output.get('events', [])]
+    url = storage.save_events(org_id, output)
+    publish_public_events(storage, org_id, output)
+    return url
+
 
 # =============================================================================
 # MAIN SYNC FUNCTION
@@ -294,7 +992,7 @@ def sync_events(config: Optional[SyncConfig] = None) -> Dict[str, Any]:
         config: Configuration object (loads from environment if not provided)
 
     Returns:
-        Result dictionary with status and event count
+        Result dictionary with status, event count and per-phase timings
     """
     # Load config if not provided
     if config is None:
@@ -307,54 +1005,215 @@ def sync_events(config: Optional[SyncConfig] = None) -> Dict[str, Any]:
     # Create storage backend
     storage = create_storage_backend(config)
 
-    # Load organization config (for auto-tag rules, etc.)
-    org_config = storage.load_config(config.org_id)
-    logger.info(f"Loaded config for org: {config.org_id}")
+    return run_traced('sync_events', _sync_events, config, storage)
 
-    # Fetch events from Wild Apricot
-    wa_client = WildApricotClient(
-        config.wa_config.account_id,
-        config.wa_config.api_key
-    )
-    raw_events = wa_client.get_events(include_past_days=config.include_past_days)
 
-    # Transform events
-    transformed_events = []
-    for event in raw_events:
-        # Skip cancelled events
-        name = event.get('Name', '')
-        if 'CANCELLED' in name.upper():
-            continue
+def run_traced(name: str, sync_fn: Any, config: SyncConfig, storage: StorageBackend,
+               **kwargs: Any) -> Dict[str, Any]:
+    """
+    Run a sync function under a phase trace (and profiler, if enabled).
 
+    The trace is logged as one JSON line whether or not the run succeeds,
+    and its phases are added to the result. Extra keyword arguments are
+    passed to `sync_fn`.
+    """
+    with start_trace(name, orgId=config.org_id) as trace:
         try:
-            transformed = transform_event(event, org_config)
-            transformed_events.append(transformed)
-        except Exception as e:
-            logger.warning(f"Failed to transform event {event.get('Id')}: {e}")
-            continue
+            with profiled(storage, config.org_id, name):
+                result = sync_fn(config, storage, **kwargs)
+        finally:
+            summary = trace.log()
+
+    result['durationMs'] = summary['durationMs']
+    result['phases'] = summary['phases']
+    return result
 
-    logger.info(f"Transformed {len(transformed_events)} events")
 
-    # Build output
+def _sync_events(config: SyncConfig, storage: StorageBackend,
+                 wa_client: Optional[WildApricotClient] = None,
+                 org_config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    # Load organization config (for auto-tag rules, etc.) unless the caller
+    # already holds it (the daemon keeps it between runs)
+    if org_config is None:
+        with span('load_config'):
+            org_config = storage.load_config(config.org_id)
+        logger.info(f"Loaded config for org: {config.org_id}")
+
+    # Fetch events from Wild Apricot
+    wa_client = wa_client or create_wa_client(config)
+    raw_events = wa_client.get_events(include_past_days=config.include_past_days)
+    # First day the fetch covered; the database only drops events from here on.
+    # Taken after the fetch so it is never earlier than the fetch's own filter.
+    window_start = (datetime.now() - timedelta(days=config.include_past_days)).strftime('%Y-%m-%d')
+
+    # Fetch descriptions the list endpoint left out, reusing cached ones
+    with span('enrich') as attrs:
+        cached = storage.load_state(config.org_id, DETAILS_CACHE_DOCUMENT)
+        if cached is None:
+            # Older syncs kept the cache with the published files; remove that copy
+            storage.delete_document(config.org_id, DETAILS_CACHE_DOCUMENT)
+            cached = {}
+        details_cache, counts = enrich_details(wa_client, raw_events, cached.get('events', {}))
+        attrs.update(counts)
+        if details_cache != cached.get('events'):
+            storage.save_state(config.org_id, DETAILS_CACHE_DOCUMENT, {'events': details_cache})
+    if counts['fetched'] or counts['failed']:
+        logger.info(
+            f"Fetched details for {counts['fetched']} events "
+            f"({counts['cached']} cached, {counts['failed']} failed)"
+        )
+
+    # Transform events into compact records
+    records: List[EventRecord] = []
+    facets = FacetIndex()
+    days = DayIndex(org_config.get('timezone', DEFAULT_TIMEZONE))
+    rule_counts: Counter = Counter()
+    with span('transform', events=len(raw_events)) as attrs:
+        for event in raw_events:
+            # Skip cancelled events
+            if is_cancelled(event):
+                rule_counts['cancelled-skipped'] += 1
+                continue
+
+            try:
+                record = build_event_record(event, org_config, rule_counts)
+                record_days = days.days_for(record.start, record.end)
+            except Exception as e:
+                logger.warning(f"Failed to transform event {event.get('Id')}: {e}")
+                rule_counts['failed'] += 1
+                continue
+
+            # Indexed only once the record is complete, so a failed event
+            # never leaves positions behind in one index but not the other
+            position = len(records)
+            records.append(record)
+            facets.add(position, record.tags)
+            days.add_days(position, record_days)
+
+        attrs['rules'] = dict(rule_counts)
+
+    logger.info(f"Transformed {len(records)} events")
+
+    # Raw payloads are no longer needed; drop them before the published
+    # dicts are built from the records
+    del raw_events
+
+    # Build output; events stay EventRecords through the diff and are
+    # converted by publish_events() when the document is written
     output = {
         '_warning': 'This file is auto-generated. Do not edit manually.',
         '_generated': datetime.utcnow().isoformat() + 'Z',
         '_orgId': config.org_id,
-        'eventCount': len(transformed_events),
-        'events': transformed_events
+        'eventCount': len(records),
+        'windowStart': window_start,
+        'events': records,
+        'facets': facets.to_dict(),
+        'timezone': days.timezone,
+        'days': days.to_dict()
     }
 
-    # Save to storage
-    url = storage.save_events(config.org_id, output)
+    # Save to storage, with a delta against the previously published version
+    with span('load_previous'):
+        previous = storage.load_events(config.org_id)
+    url = publish_events(storage, config, output, previous)
 
     result = {
         'success': True,
-        'eventCount': len(transformed_events),
+        'eventCount': output['eventCount'],
+        'version': output['version'],
         'url': url,
-        'timestamp': output['_generated']
+        'timestamp': output['_generated'],
+        'waScheduler': wa_client.scheduler.metrics()
     }
 
-    logger.info(f"Sync complete: {len(transformed_events)} events saved to {url}")
+    logger.info(f"Sync complete: {output['eventCount']} events saved to {url}")
+
+    return result
+
+
+def sync_availability(config: Optional[SyncConfig] = None) -> Dict[str, Any]:
+    """
+    Fast-lane sync: refresh registration availability only.
+
+    Fetches counts for upcoming events and patches the published events
+    file. Skips the transform and only rewrites the file when something
+    changed. New or removed events are left to the full sync.
+
+    Must not run at the same time as a full sync for the same org (the
+    daemon never overlaps them; from cron, share a flock). As a backstop,
+    the write is skipped if events.json changed since it was read.
+
+    Args:
+        config: Configuration object (loads from environment if not provided)
+
+    Returns:
+        Result dictionary with status, changed-event count and per-phase timings
+    """
+    # Load config if not provided
+    if config is None:
+        config = load_config()
+
+    # Validate config
+    if not config.wa_config.account_id or not config.wa_config.api_key:
+        raise ValueError("Wild Apricot credentials not configured")
+
+    storage = create_storage_backend(config)
+
+    return run_traced('sync_availability', _sync_availability, config, storage)
+
+
+def document_stamp(document: Dict[str, Any]) -> Tuple[Any, ...]:
+    """Fields that change whenever an events document is republished."""
+    return (document.get('version'), document.get('_generated'), document.get('_availabilityUpdated'))
+
+
+def _sync_availability(config: SyncConfig, storage: StorageBackend,
+                       wa_client: Optional[WildApricotClient] = None) -> Dict[str, Any]:
+    with span('load_previous'):
+        previous = storage.load_events(config.org_id)
+    if previous is None:
+        raise ValueError(f"No published events for org {config.org_id}; run a full sync first")
+    events_data = copy.deepcopy(previous)
+
+    wa_client = wa_client or create_wa_client(config)
+    counts = wa_client.get_registration_counts()
+
+    with span('patch') as attrs:
+        changed = patch_availability(events_data.get('events', []), counts)
+        attrs['changed'] = changed
+    timestamp = datetime.utcnow().isoformat() + 'Z'
+
+    url = None
+    skipped = False
+    if changed:
+        # A full sync that published meanwhile has newer events; writing
+        # the patched copy would put the old ones back
+        with span('load_current'):
+            current = storage.load_events(config.org_id) or {}
+        skipped = document_stamp(current) != document_stamp(previous)
+
+    if skipped:
+        logger.warning("events.json changed during the availability sync; skipping the write")
+        changed = 0
+    elif changed:
+        events_data['_availabilityUpdated'] = timestamp
+        # availability:* tags may have moved
+        events_data['facets'] = build_facets(events_data.get('events', []))
+        url = publish_events(storage, config, events_data, previous)
+
+    result = {
+        'success': True,
+        'mode': 'availability',
+        'version': events_data.get('version'),
+        'eventCount': events_data.get('eventCount', len(events_data.get('events', []))),
+        'changedCount': changed,
+        'skipped': skipped,
+        'url': url,
+        'timestamp': timestamp,
+        'waScheduler': wa_client.scheduler.metrics()
+    }
+
+    logger.info(f"Availability sync complete: {changed} events changed")
 
     return result
 
@@ -364,11 +1223,13 @@ def sync_events(config: Optional[SyncConfig] = None) -> Dict[str, Any]:
 # =============================================================================
 
 if __name__ == '__main__':
-    import sys
-
     try:
-        result = sync_events()
-        print(f"Success: Synced {result['eventCount']} events")
+        if '--availability' in sys.argv[1:]:
+            result = sync_availability()
+            print(f"Success: Updated availability for {result['changedCount']} events")
+        else:
+            result = sync_events()
+            print(f"Success: Synced {result['eventCount']} events")
         print(f"Output: {result['url']}")
         sys.exit(0)
     except Exception as e:
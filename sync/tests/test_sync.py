@@ -0,0 +1,843 @@
+#!/usr/bin/env python3
+"""
+ClubCalendar Sync - Unit Tests
+
+Run with: pytest tests/test_sync.py -v --tb=short
+"""
+
+import pytest
+import json
+import signal
+import sqlite3
+import sys
+import os
+from datetime import datetime, timedelta
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import (SyncConfig, DeploymentType, WildApricotConfig, CustomServerConfig,
+                    load_config)
+import daemon
+import scheduler
+from scheduler import RateLimitScheduler
+from storage import LocalFileStorage, SQLiteStorage
+from sync import (EventRecord, FacetIndex, build_facets, details_stamp, enrich_details,
+                  event_days, intern_tags, patch_availability, publish_events, publish_public_events, _sync_events, _sync_availability, delta_document_name,
+                  PUBLIC_EVENTS_DOCUMENT, DETAILS_CACHE_DOCUMENT, DELTA_WINDOW_DOCUMENT)
+from tracing import profiled
+from zoneinfo import ZoneInfo
+
+
+def make_config(tmp_path, **overrides):
+    """SyncConfig for a custom server rooted in tmp_path."""
+    settings = dict(
+        deployment_type=DeploymentType.CUSTOM_SERVER,
+        org_id='test',
+        wa_config=WildApricotConfig(account_id='1', api_key='key'),
+        custom_server=CustomServerConfig(
+            data_directory=str(tmp_path / 'data'),
+            config_file=str(tmp_path / 'config.json'),
+            base_url='',
+            database_path=str(tmp_path / 'events.db')
+        ),
+        state_directory=str(tmp_path / 'state')
+    )
+    settings.update(overrides)
+    return SyncConfig(**settings)
+
+
+def make_event(event_id, start, **fields):
+    """Transformed event as produced by _sync_events."""
+    event = {
+        'id': event_id,
+        'name': f'Event {event_id}',
+        'start': f'{start}T10:00:00',
+        'end': f'{start}T12:00:00',
+        'tags': ['social'],
+    }
+    event.update(fields)
+    return event
+
+
+def make_response(status, **headers):
+    response = requests.Response()
+    response.status_code = status
+    response.headers.update(headers)
+    return response
+
+
+class ScriptedSession:
+    """Session stand-in answering each request with the next scripted outcome."""
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = 0
+
+    def request(self, method, url, **kwargs):
+        self.calls += 1
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+
+class FakeWAClient:
+    """WA client serving a fixed list of raw events."""
+
+    def __init__(self, events):
+        self.events = events
+        self.scheduler = RateLimitScheduler()
+
+    def get_events(self, include_past_days=0):
+        return [dict(event) for event in self.events]
+
+    def get_event_details(self, event_id):
+        return {'Details': {'DescriptionHtml': ''}}
+
+
+def db_ids(storage):
+    conn = sqlite3.connect(storage.database_path)
+    try:
+        return sorted(row[0] for row in conn.execute("SELECT Id FROM events"))
+    finally:
+        conn.close()
+
+
+# =============================================================================
+# SQLiteStorage
+# =============================================================================
+
+class TestSQLiteStorage:
+    """Events table maintained alongside events.json."""
+
+    def test_past_rows_survive_sync(self, tmp_path):
+        storage = SQLiteStorage(make_config(tmp_path))
+        storage.write_events(
+            [make_event(1, '2026-01-05'), make_event(2, '2026-03-01')],
+            window_start='2026-01-01'
+        )
+
+        # Next sync fetches from a later day; event 1 is no longer returned
+        storage.save_events('test', {
+            'windowStart': '2026-02-01',
+            'events': [make_event(2, '2026-03-01')],
+        })
+
+        assert db_ids(storage) == [1, 2]
+
+    def test_stale_rows_in_window_deleted(self, tmp_path):
+        storage = SQLiteStorage(make_config(tmp_path))
+        storage.write_events(
+            [make_event(1, '2026-03-01'), make_event(2, '2026-03-02')],
+            window_start='2026-02-01'
+        )
+
+        upserted, deleted = storage.write_events(
+            [make_event(2, '2026-03-02')], window_start='2026-02-01'
+        )
+
+        assert (upserted, deleted) == (0, 1)
+        assert db_ids(storage) == [2]
+
+    def test_no_window_deletes_nothing(self, tmp_path):
+        storage = SQLiteStorage(make_config(tmp_path))
+        storage.write_events([make_event(1, '2026-03-01')], window_start='2026-02-01')
+
+        _, deleted = storage.write_events([make_event(2, '2026-03-02')])
+
+        assert deleted == 0
+        assert db_ids(storage) == [1, 2]
+
+    def test_public_tags_have_no_availability(self, tmp_path):
+        storage = SQLiteStorage(make_config(tmp_path))
+        storage.write_events([
+            make_event(1, '2026-03-01', accessLevel='Public', tags=['availability:full', 'social']),
+            make_event(2, '2026-03-02', accessLevel='Public', tags=['availability:open']),
+        ], window_start='2026-02-01')
+
+        conn = sqlite3.connect(storage.database_path)
+        try:
+            tags = [row[0] for row in conn.execute(
+                "SELECT Tags FROM events WHERE AccessLevel = 'Public' ORDER BY Id")]
+        finally:
+            conn.close()
+        assert tags == ['social', '']
+
+
+# =============================================================================
+# DayIndex
+# =============================================================================
+
+class TestDayIndex:
+    """Local-day buckets for the published days index."""
+
+    def test_aware_start_with_naive_end(self):
+        tz = ZoneInfo('America/Los_Angeles')
+        days = event_days('2026-03-01T18:00:00Z', '2026-03-03T12:00:00', tz)
+        assert [d.isoformat() for d in days] == ['2026-03-01', '2026-03-02', '2026-03-03']
+
+    def test_aware_start_with_date_only_end(self):
+        tz = ZoneInfo('America/Los_Angeles')
+        # Ends at local midnight, so the following day is not claimed
+        days = event_days('2026-03-01T18:00:00Z', '2026-03-02', tz)
+        assert [d.isoformat() for d in days] == ['2026-03-01']
+
+
+# =============================================================================
+# Public projection
+# =============================================================================
+
+class TestPublicEvents:
+    """events-public.json carries no member-only data."""
+
+    def test_public_document_has_no_availability(self, tmp_path):
+        storage = SQLiteStorage(make_config(tmp_path))
+        output = {
+            'version': 1,
+            'events': [
+                make_event(1, '2026-03-01', accessLevel='Public',
+                           tags=['availability:full', 'social'],
+                           spotsAvailable=0, isFull=True, confirmedRegistrations=20),
+                make_event(2, '2026-03-02', accessLevel='Members',
+                           tags=['availability:open', 'social']),
+            ],
+        }
+
+        publish_public_events(storage, 'test', output)
+        doc = storage.load_document('test', PUBLIC_EVENTS_DOCUMENT)
+
+        assert 'availability' not in json.dumps(doc)
+        assert 'spotsAvailable' not in doc['events'][0]
+        assert doc['events'][0]['tags'] == ['social']
+        assert doc['facets']['counts'] == {'social': 1}
+
+
+# =============================================================================
+# Configuration
+# =============================================================================
+
+class TestLoadConfig:
+    """Sync settings come from config.json, overridden by the environment."""
+
+    @pytest.fixture
+    def config_file(self, tmp_path, monkeypatch):
+        path = tmp_path / 'config.json'
+        path.write_text(json.dumps({
+            'data_directory': str(tmp_path / 'data'),
+            'sync': {'interval_minutes': 30, 'availability_interval_minutes': 5,
+                     'delta_retention': 10, 'include_past_days': 7},
+        }))
+        monkeypatch.setenv('CLUBCAL_CONFIG_FILE', str(path))
+        for name in ('CLUBCAL_DEPLOYMENT', 'SYNC_INTERVAL', 'AVAILABILITY_SYNC_INTERVAL',
+                     'DELTA_RETENTION', 'INCLUDE_PAST_DAYS'):
+            monkeypatch.delenv(name, raising=False)
+        return path
+
+    def test_sync_block_read_from_file(self, config_file):
+        config = load_config()
+        assert config.sync_interval_minutes == 30
+        assert config.include_past_days == 7
+        assert config.availability_interval_minutes == 5
+        assert config.delta_retention == 10
+
+    def test_private_directories(self, config_file, tmp_path, monkeypatch):
+        monkeypatch.setenv('CLUBCAL_STATE_DIR', str(tmp_path / 'state'))
+        config = load_config()
+        assert config.state_directory == str(tmp_path / 'state')
+
+    def test_environment_overrides_file(self, config_file, monkeypatch):
+        monkeypatch.setenv('DELTA_RETENTION', '0')
+        assert load_config().delta_retention == 0
+
+
+# =============================================================================
+# Private state
+# =============================================================================
+
+class TestPrivateState:
+    """Caches and profiles stay out of the published data directory."""
+
+    def test_details_cache_not_published(self, tmp_path):
+        config = make_config(tmp_path)
+        storage = SQLiteStorage(config)
+
+        storage.save_state('test', DETAILS_CACHE_DOCUMENT, {'events': {'1': {}}})
+
+        assert storage.load_state('test', DETAILS_CACHE_DOCUMENT) == {'events': {'1': {}}}
+        assert storage.load_document('test', DETAILS_CACHE_DOCUMENT) is None
+        assert (tmp_path / 'state' / 'test' / DETAILS_CACHE_DOCUMENT).exists()
+
+    def test_profile_saved_as_state(self, tmp_path, monkeypatch):
+        monkeypatch.setenv('CLUBCAL_SYNC_PROFILE', 'cpu')
+        storage = SQLiteStorage(make_config(tmp_path))
+        with profiled(storage, 'test', 'sync_events'):
+            sum(range(1000))
+
+        reports = list((tmp_path / 'state' / 'test' / 'profiles').glob('sync_events-*.json'))
+        assert len(reports) == 1
+        assert 'cpu' in json.loads(reports[0].read_text())
+        assert not (tmp_path / 'data' / 'test' / 'profiles').exists()
+
+    def test_unwritable_state_directory_fails_early(self, tmp_path):
+        (tmp_path / 'state').write_text('')  # a file, so the directory cannot be created
+        with pytest.raises(ValueError, match='state directory'):
+            SQLiteStorage(make_config(tmp_path))
+
+
+# =============================================================================
+# RateLimitScheduler
+# =============================================================================
+
+class TestRateLimitScheduler:
+    """Retries and AIMD backoff for WA calls."""
+
+    @pytest.fixture(autouse=True)
+    def no_sleep(self, monkeypatch):
+        sleeps = []
+        monkeypatch.setattr(scheduler.time, 'sleep', sleeps.append)
+        return sleeps
+
+    def test_throttled_request_retried_after_backoff(self):
+        limiter = RateLimitScheduler(rate_per_minute=600, max_concurrency=4)
+        session = ScriptedSession(make_response(429, **{'Retry-After': '0'}), make_response(200))
+
+        response = limiter.request('GET', 'https://wa.example/events', session=session)
+
+        assert response.status_code == 200
+        assert session.calls == 2
+        metrics = limiter.metrics()
+        assert metrics['throttled'] == 1
+        assert metrics['retries'] == 1
+        assert metrics['concurrency'] == 2
+        assert metrics['ratePerMinute'] < 600
+
+    def test_server_errors_back_off_exponentially(self, no_sleep):
+        limiter = RateLimitScheduler(rate_per_minute=6000)
+        session = ScriptedSession(make_response(503), make_response(502), make_response(200))
+
+        assert limiter.request('GET', 'https://wa.example/events', session=session).status_code == 200
+        assert no_sleep == [scheduler.BACKOFF_SECONDS, scheduler.BACKOFF_SECONDS * 2]
+        assert limiter.metrics()['serverErrors'] == 2
+        # 5xx is not throttling; the limits are left alone
+        assert limiter.metrics()['concurrency'] == 4
+
+    def test_connection_error_retried(self):
+        limiter = RateLimitScheduler(rate_per_minute=6000)
+        session = ScriptedSession(requests.ConnectionError('reset'), make_response(200))
+        assert limiter.request('GET', 'https://wa.example/events', session=session).status_code == 200
+
+    def test_gives_up_after_max_retries(self):
+        limiter = RateLimitScheduler(rate_per_minute=6000, max_retries=2)
+        session = ScriptedSession(*(make_response(500) for _ in range(3)))
+
+        with pytest.raises(requests.HTTPError):
+            limiter.request('GET', 'https://wa.example/events', session=session)
+        assert session.calls == 3
+
+    def test_successes_recover_concurrency(self):
+        limiter = RateLimitScheduler(rate_per_minute=6000, max_concurrency=4)
+        limiter.acquire()
+        limiter.release(success=False, throttled=True, retry_after=0)
+        assert limiter.concurrency == 2
+
+        for _ in range(scheduler.RECOVERY_SUCCESSES):
+            limiter.acquire()
+            limiter.release(success=True)
+        assert limiter.concurrency == 3
+
+
+# =============================================================================
+# Delta publishing
+# =============================================================================
+
+class TestPublishEvents:
+    """Versioned events.json with a bounded window of deltas."""
+
+    def publish(self, storage, config, events):
+        output = {'events': events}
+        publish_events(storage, config, output, storage.load_events(config.org_id))
+        return output
+
+    def test_old_deltas_expire(self, tmp_path):
+        config = make_config(tmp_path, delta_retention=2)
+        storage = LocalFileStorage(config)
+
+        for version in range(1, 6):
+            self.publish(storage, config, [make_event(n, '2026-03-01') for n in range(version)])
+
+        window = storage.load_document('test', DELTA_WINDOW_DOCUMENT)
+        assert [d['version'] for d in window['deltas']] == [4, 5]
+        assert window['oldestVersion'] == 4
+        assert storage.load_events('test')['oldestDeltaVersion'] == 4
+        assert storage.load_document('test', delta_document_name(3)) is None
+        assert storage.load_document('test', delta_document_name(5))['added'][0]['id'] == 4
+
+    def test_unchanged_events_keep_version(self, tmp_path):
+        config = make_config(tmp_path, delta_retention=2)
+        storage = LocalFileStorage(config)
+        events = [make_event(1, '2026-03-01')]
+
+        self.publish(storage, config, events)
+        self.publish(storage, config, [make_event(1, '2026-03-01', name='Renamed')])
+        output = self.publish(storage, config, [make_event(1, '2026-03-01', name='Renamed')])
+
+        assert output['version'] == 2
+        assert len(storage.load_document('test', DELTA_WINDOW_DOCUMENT)['deltas']) == 1
+
+    def test_retention_zero_publishes_no_deltas(self, tmp_path):
+        config = make_config(tmp_path, delta_retention=0)
+        storage = LocalFileStorage(config)
+
+        self.publish(storage, config, [make_event(1, '2026-03-01')])
+        output = self.publish(storage, config, [make_event(2, '2026-03-01')])
+
+        assert output['version'] == 2
+        assert storage.load_document('test', DELTA_WINDOW_DOCUMENT) is None
+
+
+# =============================================================================
+# FacetIndex
+# =============================================================================
+
+class TestFacetIndex:
+    """Tag counts, positions and prefix groups."""
+
+    def test_positions_counts_and_groups(self):
+        index = FacetIndex()
+        index.add(0, ['committee:hikers', 'time:morning', 'social'])
+        index.add(1, ['committee:wine', 'time:morning'])
+        index.add(2, ['committee:hikers', 'time:evening'])
+
+        facets = index.to_dict()
+        assert facets['counts'] == {
+            'committee:hikers': 2, 'time:morning': 2,
+            'committee:wine': 1, 'social': 1, 'time:evening': 1,
+        }
+        assert facets['positions']['committee:hikers'] == [0, 2]
+        # Groups list their tags most used first
+        assert facets['groups'] == {
+            'committee': ['committee:hikers', 'committee:wine'],
+            'time': ['time:morning', 'time:evening'],
+            'other': ['social'],
+        }
+
+    def test_build_facets_matches_incremental_index(self):
+        events = [make_event(1, '2026-03-01', tags=['a', 'b']), make_event(2, '2026-03-02', tags=['b'])]
+        index = FacetIndex()
+        for position, event in enumerate(events):
+            index.add(position, event['tags'])
+        assert build_facets(events) == index.to_dict()
+
+
+# =============================================================================
+# Published indexes
+# =============================================================================
+
+class TestPublishedIndexes:
+    """Facet and day positions always point at the right events."""
+
+    def test_failed_event_leaves_indexes_consistent(self, tmp_path):
+        raw = [
+            {'Id': 1, 'Name': 'Hike', 'StartDate': '2026-03-01T18:00:00Z',
+             'EndDate': '2026-03-02', 'Tags': ['outdoors'],
+             'Details': {'DescriptionHtml': 'x'}},
+            # Tags of the wrong type make the transform fail for this event
+            {'Id': 2, 'Name': 'Broken', 'StartDate': '2026-03-03T10:00:00', 'Tags': 5,
+             'Details': {'DescriptionHtml': 'x'}},
+            {'Id': 3, 'Name': 'Wine', 'StartDate': '2026-03-04T17:00:00',
+             'EndDate': '2026-03-04T19:00:00', 'Tags': ['social'],
+             'Details': {'DescriptionHtml': 'x'}},
+        ]
+        config = make_config(tmp_path, delta_retention=0)
+        storage = LocalFileStorage(config)
+        _sync_events(config, storage, wa_client=FakeWAClient(raw), org_config={})
+
+        doc = storage.load_events('test')
+        events = doc['events']
+        assert [e['id'] for e in events] == [1, 3]
+        for tag, positions in doc['facets']['positions'].items():
+            assert all(tag in events[p]['tags'] for p in positions)
+        assert sum(doc['facets']['counts'].values()) == sum(len(e['tags']) for e in events)
+        assert doc['days'] == {'2026-03-01': [0], '2026-03-04': [1]}
+
+
+# =============================================================================
+# Event records
+# =============================================================================
+
+class TestEventRecord:
+    """Compact records kept until the events document is written."""
+
+    RAW = [
+        {'Id': 1, 'Name': 'Hike', 'StartDate': '2026-03-01T09:00:00',
+         'EndDate': '2026-03-01T12:00:00', 'Tags': ['outdoors'], 'Location': 'Trailhead',
+         'RegistrationsLimit': 10, 'ConfirmedRegistrationsCount': 4,
+         'Details': {'DescriptionHtml': 'Bring water'}},
+        {'Id': 2, 'Name': 'Wine', 'StartDate': '2026-03-04T17:00:00',
+         'EndDate': '2026-03-04T19:00:00', 'Tags': ['social'], 'AccessLevel': 'Restricted',
+         'Details': {'DescriptionHtml': 'x'}},
+    ]
+
+    def test_dict_round_trip(self):
+        record = EventRecord(
+            id=7, name='Hike', start='2026-03-01T09:00:00', end='2026-03-01T12:00:00',
+            location='Trailhead', description='Bring water', url='https://example.org/e7',
+            registration_url='https://example.org/r7', tags=intern_tags(['outdoors', 'availability:open']),
+            spots_available=6, is_full=False, registrations_limit=10,
+            confirmed_registrations=4, registration_enabled=True, access_level='Public'
+        )
+        published = json.loads(json.dumps(record.to_dict()))
+        assert EventRecord.from_dict(published) == record
+        assert EventRecord.from_dict(published).to_dict() == published
+
+    def test_intern_tags(self):
+        tags = intern_tags(['social', ''.join(['out', 'doors']), 'social'])
+        assert tags == ('outdoors', 'social')
+        # Equal tags from different events share one string
+        assert tags[0] is intern_tags(['outdoors'])[0]
+
+    def test_unchanged_sync_keeps_version(self, tmp_path):
+        config = make_config(tmp_path, delta_retention=2)
+        storage = LocalFileStorage(config)
+
+        first = _sync_events(config, storage, wa_client=FakeWAClient(self.RAW), org_config={})
+        second = _sync_events(config, storage, wa_client=FakeWAClient(self.RAW), org_config={})
+
+        assert second['version'] == first['version']
+        assert storage.load_document('test', DELTA_WINDOW_DOCUMENT) is None
+
+    def test_delta_holds_only_changed_fields(self, tmp_path):
+        config = make_config(tmp_path, delta_retention=2)
+        storage = LocalFileStorage(config)
+        _sync_events(config, storage, wa_client=FakeWAClient(self.RAW), org_config={})
+
+        renamed = [dict(self.RAW[0], Name='Long Hike'), self.RAW[1]]
+        result = _sync_events(config, storage, wa_client=FakeWAClient(renamed), org_config={})
+
+        delta = storage.load_document('test', delta_document_name(result['version']))
+        assert delta['added'] == [] and delta['removed'] == []
+        assert delta['changed'] == [{'id': 1, 'fields': {'name': 'Long Hike'}}]
+        events = storage.load_events('test')['events']
+        assert isinstance(events[0], dict) and events[0]['name'] == 'Long Hike'
+
+
+# =============================================================================
+# Sync daemon
+# =============================================================================
+
+class FakeClock:
+    """Stand-in for the time module; runs advance it explicitly."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+class TestSyncDaemon:
+    """Scheduling, overrun handling, triggers and health on a fake clock."""
+
+    @pytest.fixture
+    def clock(self, monkeypatch):
+        clock = FakeClock()
+        monkeypatch.setattr(daemon, 'time', clock)
+        monkeypatch.setattr(daemon, 'JITTER_FRACTION', 0)
+        return clock
+
+    @pytest.fixture
+    def runs(self, clock, monkeypatch):
+        """Record runs; each takes `runs.duration` fake seconds, or raises `runs.error`."""
+        class Runs(list):
+            duration = 5.0
+            error = None
+
+        runs = Runs()
+
+        def run_traced(name, sync_fn, config, storage, **kwargs):
+            runs.append(name)
+            clock.now += runs.duration
+            if runs.error:
+                raise runs.error
+            return {'eventCount': 2, 'version': len(runs)}
+
+        monkeypatch.setattr(daemon, 'run_traced', run_traced)
+        return runs
+
+    @pytest.fixture
+    def sync_daemon(self, tmp_path, clock):
+        config = make_config(tmp_path, sync_interval_minutes=15, availability_interval_minutes=2)
+        return daemon.SyncDaemon(config)
+
+    def test_scheduled_run_keeps_cadence(self, sync_daemon, clock, runs):
+        sync_job = sync_daemon.jobs['sync']
+        sync_job.next_run = clock.now
+
+        sync_daemon.run_job('sync')
+
+        assert runs == ['sync_events']
+        # Next run is an interval after the scheduled start, not after the run ended
+        assert sync_job.next_run == 1000.0 + 900
+        # A full sync refreshes availability, so its next run moves out
+        assert sync_daemon.jobs['availability'].next_run == clock.now + 120
+        assert sync_job.last_duration_ms == 5000.0
+
+    def test_jitter_bounds(self, sync_daemon, monkeypatch):
+        monkeypatch.setattr(daemon, 'JITTER_FRACTION', 0.1)
+        delays = [sync_daemon._jittered(900) for _ in range(200)]
+        assert all(810 <= delay <= 990 for delay in delays)
+
+    def test_overrun_pushes_next_run_back(self, sync_daemon, clock, runs):
+        sync_job = sync_daemon.jobs['sync']
+        sync_job.next_run = clock.now
+        runs.duration = 2000.0
+
+        sync_daemon.run_job('sync')
+
+        assert sync_job.overruns == 1
+        # Missed slots are skipped; the next run is a full interval away
+        assert sync_job.next_run == clock.now + 900
+        assert sync_daemon._next_due().name == 'availability'
+
+    def test_due_job_runs_when_clock_reaches_it(self, sync_daemon, clock):
+        sync_daemon.jobs['sync'].next_run = clock.now + 900
+        sync_daemon.jobs['availability'].next_run = clock.now
+        assert sync_daemon._wait_for_work() == 'availability'
+
+    @pytest.mark.skipif(not hasattr(signal, 'SIGUSR1'), reason='POSIX signals only')
+    def test_signals_trigger_runs(self, sync_daemon):
+        handlers = {signum: signal.getsignal(signum)
+                    for signum in (signal.SIGUSR1, signal.SIGUSR2, signal.SIGHUP,
+                                   signal.SIGTERM, signal.SIGINT)}
+        try:
+            sync_daemon._install_signal_handlers()
+            os.kill(os.getpid(), signal.SIGUSR2)
+            os.kill(os.getpid(), signal.SIGUSR1)
+            os.kill(os.getpid(), signal.SIGUSR1)  # coalesces with the first
+        finally:
+            for signum, handler in handlers.items():
+                signal.signal(signum, handler)
+
+        assert sync_daemon._wait_for_work() == 'availability'
+        assert sync_daemon._wait_for_work() == 'sync'
+        assert sync_daemon._triggers.empty()
+
+    def test_repeated_failures_unhealthy(self, sync_daemon, clock, runs):
+        runs.error = RuntimeError('WA down')
+        for _ in range(daemon.MAX_CONSECUTIVE_FAILURES):
+            assert sync_daemon.healthy()
+            sync_daemon.run_job('availability')
+
+        status = sync_daemon.status()
+        assert not status['healthy']
+        assert status['jobs']['availability']['consecutive_failures'] == daemon.MAX_CONSECUTIVE_FAILURES
+        assert status['jobs']['availability']['last_error'] == 'WA down'
+
+        runs.error = None
+        sync_daemon.run_job('availability')
+        assert sync_daemon.healthy()
+
+    def test_stale_data_unhealthy(self, sync_daemon, clock, runs):
+        # Healthy while waiting for the first full sync, until it is overdue
+        assert sync_daemon.healthy()
+        clock.now += daemon.STALE_INTERVALS * 900
+        assert not sync_daemon.healthy()
+
+        sync_daemon.run_job('sync')
+        status = sync_daemon.status()
+        assert status['healthy']
+        assert status['jobs']['sync']['last_result'] == {'eventCount': 2, 'version': 1}
+
+        stale = datetime.utcnow() - timedelta(seconds=daemon.STALE_INTERVALS * 900 + 60)
+        sync_daemon.jobs['sync'].last_success = stale.isoformat() + 'Z'
+        assert not sync_daemon.healthy()
+
+
+# =============================================================================
+# Description cache
+# =============================================================================
+
+class DetailsClient:
+    """WA client answering detail calls from a dict; ids in `failing` raise."""
+
+    def __init__(self, descriptions, failing=()):
+        self.descriptions = descriptions
+        self.failing = set(failing)
+        self.fetched = []
+        self.scheduler = RateLimitScheduler()
+
+    def get_event_details(self, event_id):
+        self.fetched.append(event_id)
+        if event_id in self.failing:
+            raise requests.ConnectionError('timed out')
+        return {'Details': {'DescriptionHtml': self.descriptions[event_id]}}
+
+
+class TestEnrichDetails:
+    """Descriptions come from the cache unless edited, stale or missing."""
+
+    NOW = datetime(2026, 3, 1, 12, 0)
+
+    def listed(self, **fields):
+        return {'Id': 1, 'Name': 'Hike', 'StartDate': '2026-03-05T09:00:00',
+                'LastModifiedDate': '2026-02-01T08:00:00', **fields}
+
+    def cached(self, event, description='Old text', age=timedelta(hours=1)):
+        return {'1': {'stamp': details_stamp(event), 'fetched': (self.NOW - age).isoformat(),
+                      'description': description}}
+
+    def test_cache_hit_skips_fetch(self):
+        event = self.listed()
+        client = DetailsClient({1: 'New text'})
+
+        cache, counts = enrich_details(client, [event], self.cached(event), now=self.NOW)
+
+        assert client.fetched == []
+        assert counts == {'cached': 1, 'fetched': 0, 'failed': 0}
+        assert event['Details'] == {'DescriptionHtml': 'Old text'}
+        assert cache['1']['description'] == 'Old text'
+
+    def test_stamp_change_refetches(self):
+        old_cache = self.cached(self.listed())
+        event = self.listed(LastModifiedDate='2026-02-20T08:00:00')
+        client = DetailsClient({1: 'New text'})
+
+        cache, counts = enrich_details(client, [event], old_cache, now=self.NOW)
+
+        assert client.fetched == [1]
+        assert counts['fetched'] == 1
+        assert event['Details'] == {'DescriptionHtml': 'New text'}
+        assert cache['1']['stamp'] == '2026-02-20T08:00:00'
+
+    def test_stamp_without_modified_date_ignores_registrations(self):
+        event = {'Id': 1, 'Name': 'Hike', 'ConfirmedRegistrationsCount': 3}
+        assert details_stamp(event) == details_stamp(dict(event, ConfirmedRegistrationsCount=4))
+        assert details_stamp(event) != details_stamp(dict(event, Name='Long Hike'))
+
+    def test_old_entry_refreshed(self):
+        event = self.listed()
+        old_cache = self.cached(event, age=timedelta(hours=25))
+        client = DetailsClient({1: 'New text'})
+
+        cache, counts = enrich_details(client, [event], old_cache, now=self.NOW)
+
+        assert client.fetched == [1]
+        assert counts['fetched'] == 1
+        assert cache['1']['fetched'] == self.NOW.isoformat()
+
+    def test_failed_fetch_keeps_previous_details(self):
+        event = self.listed(LastModifiedDate='2026-02-20T08:00:00')
+        old_cache = self.cached(self.listed())
+        client = DetailsClient({}, failing={1})
+
+        cache, counts = enrich_details(client, [event], old_cache, now=self.NOW)
+
+        assert counts == {'cached': 0, 'fetched': 0, 'failed': 1}
+        assert event['Details'] == {'DescriptionHtml': 'Old text'}
+        # The old entry (and stamp) is kept, so the next run tries again
+        assert cache == old_cache
+
+    def test_failed_fetch_without_cache_leaves_description_empty(self):
+        event = self.listed()
+        cache, counts = enrich_details(DetailsClient({}, failing={1}), [event], {}, now=self.NOW)
+
+        assert counts['failed'] == 1
+        assert 'Details' not in event
+        assert cache == {}
+
+
+# =============================================================================
+# Availability sync
+# =============================================================================
+
+class CountsClient:
+    """WA client serving registration counts; `during` runs inside the fetch."""
+
+    def __init__(self, counts, during=None):
+        self.counts = counts
+        self.during = during
+        self.scheduler = RateLimitScheduler()
+
+    def get_registration_counts(self):
+        if self.during:
+            self.during()
+        return self.counts
+
+
+class TestAvailabilitySync:
+    """Fast-lane patches of registration counts in the published events."""
+
+    def published(self, tmp_path):
+        config = make_config(tmp_path, delta_retention=2)
+        storage = LocalFileStorage(config)
+        events = [
+            make_event(1, '2026-03-01', tags=['availability:open', 'social'], spotsAvailable=6,
+                       isFull=False, registrationsLimit=10, confirmedRegistrations=4),
+            make_event(2, '2026-03-02', tags=['availability:open'], spotsAvailable=None,
+                       isFull=False, registrationsLimit=None, confirmedRegistrations=0),
+        ]
+        publish_events(storage, config, {'events': events}, None)
+        return config, storage
+
+    def test_patch_updates_counts_and_tag(self):
+        events = [make_event(1, '2026-03-01', tags=['availability:open', 'social'], spotsAvailable=6,
+                             isFull=False, registrationsLimit=10, confirmedRegistrations=4)]
+
+        changed = patch_availability(events, {1: {'RegistrationsLimit': 10, 'ConfirmedRegistrationsCount': 10}})
+
+        assert changed == 1
+        assert events[0]['spotsAvailable'] == 0
+        assert events[0]['isFull'] is True
+        assert events[0]['confirmedRegistrations'] == 10
+        assert events[0]['tags'] == ['availability:full', 'social']
+
+    def test_unchanged_counts_not_counted(self):
+        events = [make_event(1, '2026-03-01', tags=['availability:open'], spotsAvailable=6,
+                             isFull=False, registrationsLimit=10, confirmedRegistrations=4)]
+        counts = {1: {'RegistrationsLimit': 10, 'ConfirmedRegistrationsCount': 4}}
+        assert patch_availability(events, counts) == 0
+
+    def test_rewrites_only_when_changed(self, tmp_path):
+        config, storage = self.published(tmp_path)
+        before = storage.load_events('test')
+
+        same = {1: {'RegistrationsLimit': 10, 'ConfirmedRegistrationsCount': 4},
+                2: {'RegistrationsLimit': None, 'ConfirmedRegistrationsCount': 0}}
+        result = _sync_availability(config, storage, wa_client=CountsClient(same))
+        assert result['changedCount'] == 0 and result['url'] is None
+        assert storage.load_events('test') == before
+
+        busier = {**same, 1: {'RegistrationsLimit': 10, 'ConfirmedRegistrationsCount': 7}}
+        result = _sync_availability(config, storage, wa_client=CountsClient(busier))
+        after = storage.load_events('test')
+        assert result['changedCount'] == 1
+        assert after['version'] == before['version'] + 1
+        assert after['events'][0]['spotsAvailable'] == 3
+        assert after['facets']['counts']['availability:limited'] == 1
+
+    def test_new_and_removed_events_left_to_full_sync(self, tmp_path):
+        config, storage = self.published(tmp_path)
+
+        # Event 2 is gone from WA and event 3 is new; neither is touched here
+        counts = {1: {'RegistrationsLimit': 10, 'ConfirmedRegistrationsCount': 5},
+                  3: {'RegistrationsLimit': 20, 'ConfirmedRegistrationsCount': 1}}
+        _sync_availability(config, storage, wa_client=CountsClient(counts))
+
+        events = storage.load_events('test')['events']
+        assert [event['id'] for event in events] == [1, 2]
+        assert events[1]['tags'] == ['availability:open']
+
+    def test_skips_write_when_full_sync_published_meanwhile(self, tmp_path):
+        config, storage = self.published(tmp_path)
+
+        def full_sync():
+            publish_events(storage, config, {'events': [make_event(4, '2026-03-05')]},
+                           storage.load_events('test'))
+
+        counts = {1: {'RegistrationsLimit': 10, 'ConfirmedRegistrationsCount': 9}}
+        result = _sync_availability(config, storage, wa_client=CountsClient(counts, during=full_sync))
+
+        assert result['skipped'] is True
+        assert result['url'] is None
+        assert [event['id'] for event in storage.load_events('test')['events']] == [4]
@@ -0,0 +1,182 @@
+"""
+ClubCalendar Sync Tracing
+=========================
+Per-phase timing spans and optional profiling for sync runs.
+
+Spans are recorded into the trace started for the current run, so storage
+backends and the WA client can time their own phases without being handed
+a trace object. Outside a run, span() is a no-op.
+
+Profiling is enabled with CLUBCAL_SYNC_PROFILE=cpu, memory or cpu,memory;
+reports are saved as private state through the storage backend, never
+published.
+"""
+
+import os
+import json
+import time
+import logging
+import cProfile
+import pstats
+import threading
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Rows kept in profile reports (slowest functions / largest allocation sites)
+PROFILE_TOP_N = 40
+
+
+class SyncTrace:
+    """Flat list of timed phases for one sync run."""
+
+    def __init__(self, name: str, **fields: Any):
+        self.name = name
+        self.fields = fields
+        self.spans: List[Dict[str, Any]] = []
+        self._started = time.perf_counter()
+
+    def add(self, name: str, started: float, attrs: Dict[str, Any]) -> None:
+        self.spans.append({
+            'name': name,
+            'startMs': round((started - self._started) * 1000, 2),
+            'ms': round((time.perf_counter() - started) * 1000, 2),
+            **attrs
+        })
+
+    def summary(self) -> Dict[str, Any]:
+        """Trace as a JSON-serializable dict."""
+        return {
+            'trace': self.name,
+            **self.fields,
+            'durationMs': round((time.perf_counter() - self._started) * 1000, 2),
+            'phases': self.spans
+        }
+
+    def log(self) -> Dict[str, Any]:
+        """Emit the trace as a single JSON log line; returns the summary."""
+        summary = self.summary()
+        logger.info(json.dumps(summary, default=str))
+        return summary
+
+
+_local = threading.local()
+
+
+def current_trace() -> Optional[SyncTrace]:
+    return getattr(_local, 'trace', None)
+
+
+@contextmanager
+def start_trace(name: str, **fields: Any) -> Iterator[SyncTrace]:
+    """Make a new trace active for the duration of a sync run."""
+    previous = current_trace()
+    trace = SyncTrace(name, **fields)
+    _local.trace = trace
+    try:
+        yield trace
+    finally:
+        _local.trace = previous
+
+
+@contextmanager
+def span(name: str, **attrs: Any) -> Iterator[Dict[str, Any]]:
+    """
+    Time a phase of the active trace.
+
+    Yields the span's attribute dict so callers can add counts discovered
+    while the phase runs.
+    """
+    trace = current_trace()
+    started = time.perf_counter()
+    try:
+        yield attrs
+    finally:
+        if trace is not None:
+            trace.add(name, started, attrs)
+
+
+# =============================================================================
+# PROFILING
+# =============================================================================
+
+def profile_modes() -> List[str]:
+    """Profilers requested via CLUBCAL_SYNC_PROFILE (e.g. "cpu,memory")."""
+    value = os.environ.get('CLUBCAL_SYNC_PROFILE', '')
+    return [mode.strip() for mode in value.lower().split(',') if mode.strip() in ('cpu', 'memory')]
+
+
+@contextmanager
+def profiled(storage: Any, org_id: str, label: str) -> Iterator[None]:
+    """
+    Capture cProfile and/or tracemalloc stats for the enclosed block and
+    save them with storage.save_state() as profiles/<label>-<timestamp>.json.
+    """
+    modes = profile_modes()
+    if not modes:
+        yield
+        return
+
+    profiler = cProfile.Profile() if 'cpu' in modes else None
+    if 'memory' in modes:
+        tracemalloc.start()
+    if profiler:
+        profiler.enable()
+
+    try:
+        yield
+    finally:
+        report: Dict[str, Any] = {'label': label, 'generated': datetime.utcnow().isoformat() + 'Z'}
+
+        if profiler:
+            profiler.disable()
+            report['cpu'] = cpu_report(profiler)
+
+        if 'memory' in modes:
+            report['memory'] = memory_report(tracemalloc.take_snapshot(), tracemalloc.get_traced_memory())
+            tracemalloc.stop()
+
+        name = f"profiles/{label}-{datetime.utcnow().strftime('%Y%m%dT%H%M%SZ')}.json"
+        try:
+            storage.save_state(org_id, name, report)
+            logger.info(f"Saved profile {name}")
+        except Exception as e:
+            # Never let a profiling dump fail the sync itself
+            logger.warning(f"Failed to save profile {name}: {e}")
+
+
+def cpu_report(profiler: cProfile.Profile) -> List[Dict[str, Any]]:
+    """Top functions by cumulative time."""
+    stats = pstats.Stats(profiler).stats
+    rows = sorted(stats.items(), key=lambda item: item[1][3], reverse=True)[:PROFILE_TOP_N]
+
+    return [
+        {
+            'function': f'{filename}:{line}({func})',
+            'calls': calls,
+            'totalMs': round(total * 1000, 3),
+            'cumulativeMs': round(cumulative * 1000, 3)
+        }
+        for (filename, line, func), (_, calls, total, cumulative, _) in rows
+    ]
+
+
+def memory_report(snapshot: tracemalloc.Snapshot, traced: tuple) -> Dict[str, Any]:
+    """Peak traced memory and the largest allocation sites still live."""
+    current, peak = traced
+
+    return {
+        'currentKb': round(current / 1024, 1),
+        'peakKb': round(peak / 1024, 1),
+        'top': [
+            {
+                'location': f'{stat.traceback[0].filename}:{stat.traceback[0].lineno}',
+                'sizeKb': round(stat.size / 1024, 1),
+                'count': stat.count
+            }
+            for stat in snapshot.statistics('lineno')[:PROFILE_TOP_N]
+        ]
+    }
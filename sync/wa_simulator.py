@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+Wild Apricot API Simulator
+==========================
+A local stand-in for the WA OAuth and events endpoints, for measuring and
+testing the sync offline without touching the real account or its quotas.
+
+Implements:
+    POST /auth/token                        client_credentials token
+    GET  /v2.2/accounts/<id>/events         paginated via ResultNextPageUrl,
+                                            honouring $filter=StartDate ge ...;
+                                            Details omitted unless list_details
+    GET  /v2.2/accounts/<id>/events/<id>    single event with Details
+    GET  /_stats                            request/error counters (JSON)
+
+Latency, page size, dataset size and 429/5xx injection are configurable;
+injected errors are drawn from a seeded RNG so runs are repeatable.
+
+Usage:
+    python wa_simulator.py --events 5000 --page-size 100 --latency 0.05 --rate-429 0.05
+
+    # then, in another shell
+    WA_API_URL=http://127.0.0.1:8090/v2.2 WA_AUTH_URL=http://127.0.0.1:8090/auth/token \\
+        WA_ACCOUNT_ID=1 WA_API_KEY=sim python sync.py
+"""
+
+import re
+import json
+import time
+import random
+import argparse
+import threading
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlsplit, parse_qs, urlencode
+
+from benchmark import generate_events
+
+EVENTS_PATH = re.compile(r'^/v2\.2/accounts/(?P<account>[^/]+)/events$')
+EVENT_PATH = re.compile(r'^/v2\.2/accounts/(?P<account>[^/]+)/events/(?P<event>[^/]+)$')
+FILTER_START = re.compile(r"StartDate\s+ge\s+'?(?P<date>\d{4}-\d{2}-\d{2})")
+
+
+class WASimulator:
+    """
+    Threaded HTTP server serving a generated WA dataset.
+
+    Use as a context manager, or call start()/stop(). `api_url` and
+    `auth_url` are what WildApricotClient should be pointed at.
+    """
+
+    def __init__(self, events: Optional[List[Dict[str, Any]]] = None, event_count: int = 1000,
+                 page_size: int = 100, latency: float = 0.0, rate_429: float = 0.0,
+                 rate_5xx: float = 0.0, retry_after: int = 1, token_ttl: int = 1800,
+                 list_details: bool = False, host: str = '127.0.0.1', port: int = 0,
+                 seed: int = 1):
+        today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        self.events = events if events is not None else generate_events(event_count, epoch=today)
+        self.page_size = page_size
+        self.latency = latency
+        self.rate_429 = rate_429
+        self.rate_5xx = rate_5xx
+        self.retry_after = retry_after
+        self.token_ttl = token_ttl
+        self.list_details = list_details
+        self.stats = {'token': 0, 'events': 0, 'details': 0, '429': 0, '5xx': 0, '401': 0}
+        self._by_id = {str(e.get('Id')): e for e in self.events}
+
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._tokens: Dict[str, float] = {}
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    @property
+    def api_url(self) -> str:
+        return f'{self.base_url}/v2.2'
+
+    @property
+    def auth_url(self) -> str:
+        return f'{self.base_url}/auth/token'
+
+    def start(self) -> 'WASimulator':
+        """Serve on a background thread."""
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def serve_forever(self) -> None:
+        """Serve on the calling thread until interrupted."""
+        try:
+            self._server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self._server.server_close()
+
+    def __enter__(self) -> 'WASimulator':
+        return self.start()
+
+    def __exit__(self, *exc: Any) -> None:
+        self.stop()
+
+    # -------------------------------------------------------------------------
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self.stats[key] += 1
+
+    def _injected_error(self) -> Optional[int]:
+        """429, 503 or None, drawn from the seeded RNG."""
+        with self._lock:
+            roll = self._rng.random()
+        if roll < self.rate_429:
+            return 429
+        if roll < self.rate_429 + self.rate_5xx:
+            return 503
+        return None
+
+    def _issue_token(self) -> Dict[str, Any]:
+        with self._lock:
+            token = f'sim-{len(self._tokens) + 1}'
+            self._tokens[token] = time.monotonic() + self.token_ttl
+        return {'access_token': token, 'token_type': 'Bearer', 'expires_in': self.token_ttl}
+
+    def _token_valid(self, header: Optional[str]) -> bool:
+        if not header or not header.startswith('Bearer '):
+            return False
+        with self._lock:
+            expires = self._tokens.get(header[len('Bearer '):])
+        return expires is not None and time.monotonic() < expires
+
+    def _events_page(self, account: str, query: Dict[str, List[str]]) -> Dict[str, Any]:
+        since = None
+        match = FILTER_START.search(query.get('$filter', [''])[0])
+        if match:
+            since = match.group('date')
+
+        events = self.events
+        if since:
+            events = [e for e in events if e.get('StartDate', '')[:10] >= since]
+        if query.get('$sort', [''])[0].startswith('StartDate'):
+            events = sorted(events, key=lambda e: (e.get('StartDate', ''), e.get('Id')))
+
+        skip = int(query.get('$skip', ['0'])[0])
+        top = int(query.get('$top', [str(self.page_size)])[0])
+        page = events[skip:skip + top]
+        if not self.list_details:
+            # Like WA, the list endpoint leaves out descriptions
+            page = [{k: v for k, v in e.items() if k != 'Details'} for e in page]
+
+        result: Dict[str, Any] = {'Events': page}
+        if skip + top < len(events):
+            next_query = {k: v[0] for k, v in query.items()}
+            next_query.update({'$skip': skip + top, '$top': top})
+            result['ResultNextPageUrl'] = (
+                f'{self.api_url}/accounts/{account}/events?{urlencode(next_query)}'
+            )
+        return result
+
+    def _handler_class(self) -> type:
+        simulator = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+
+            def _send(self, status: int, body: Any, headers: Optional[Dict[str, str]] = None) -> None:
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _simulate(self) -> bool:
+                """Apply latency and error injection; True if a response was sent."""
+                if simulator.latency:
+                    time.sleep(simulator.latency)
+                status = simulator._injected_error()
+                if status == 429:
+                    simulator._count('429')
+                    self._send(429, {'message': 'Too many requests'},
+                               {'Retry-After': str(simulator.retry_after)})
+                    return True
+                if status:
+                    simulator._count('5xx')
+                    self._send(status, {'message': 'Service unavailable'})
+                    return True
+                return False
+
+            def do_POST(self) -> None:
+                self.rfile.read(int(self.headers.get('Content-Length') or 0))
+                if urlsplit(self.path).path != '/auth/token':
+                    self._send(404, {'message': 'Not found'})
+                    return
+                if self._simulate():
+                    return
+                simulator._count('token')
+                self._send(200, simulator._issue_token())
+
+            def do_GET(self) -> None:
+                url = urlsplit(self.path)
+                if url.path == '/_stats':
+                    with simulator._lock:
+                        self._send(200, dict(simulator.stats))
+                    return
+
+                match = EVENTS_PATH.match(url.path)
+                detail = EVENT_PATH.match(url.path)
+                if not match and not detail:
+                    self._send(404, {'message': 'Not found'})
+                    return
+                if not simulator._token_valid(self.headers.get('Authorization')):
+                    simulator._count('401')
+                    self._send(401, {'message': 'Invalid token'})
+                    return
+                if self._simulate():
+                    return
+
+                if detail:
+                    event = simulator._by_id.get(detail.group('event'))
+                    if event is None:
+                        self._send(404, {'message': 'Event not found'})
+                        return
+                    simulator._count('details')
+                    self._send(200, event)
+                    return
+
+                simulator._count('events')
+                self._send(200, simulator._events_page(match.group('account'), parse_qs(url.query)))
+
+        return Handler
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Local Wild Apricot API simulator')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8090)
+    parser.add_argument('--events', type=int, default=1000, help='dataset size')
+    parser.add_argument('--page-size', type=int, default=100)
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds added per request')
+    parser.add_argument('--rate-429', type=float, default=0.0, help='fraction of requests answered 429')
+    parser.add_argument('--rate-5xx', type=float, default=0.0, help='fraction of requests answered 503')
+    parser.add_argument('--retry-after', type=int, default=1, help='Retry-After seconds on 429')
+    parser.add_argument('--list-details', action='store_true',
+                        help='include Details in list pages (WA omits them)')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    simulator = WASimulator(
+        event_count=args.events, page_size=args.page_size, latency=args.latency,
+        rate_429=args.rate_429, rate_5xx=args.rate_5xx, retry_after=args.retry_after,
+        list_details=args.list_details, host=args.host, port=args.port, seed=args.seed
+    )
+    print(f'WA simulator: {len(simulator.events)} events')
+    print(f'  WA_API_URL={simulator.api_url}')
+    print(f'  WA_AUTH_URL={simulator.auth_url}')
+    simulator.serve_forever()
+
+
+if __name__ == '__main__':
+    main()